@@ -1,11 +1,25 @@
 from fastapi import APIRouter
 from api.metrics.v1.cpu import cpu_router as cpu_v1_router
 from api.metrics.v1.ram import ram_router as ram_v1_router
+from api.metrics.v1.disk import disk_router
+from api.metrics.v1.net import net_router
+from api.metrics.v1.processes import process_router
+from api.metrics.v1.pressure import pressure_router
 from api.metrics.v1.logs import log_router
+from api.metrics.v1.collectors import collector_router
+from api.metrics.v1.openmetrics import openmetrics_router
+from api.metrics.v1.stream import stream_router
 
 router = APIRouter()
 router.include_router(cpu_v1_router, prefix="/metrics/v1/cpu")
 router.include_router(ram_v1_router, prefix="/metrics/v1/ram")
+router.include_router(disk_router, prefix="/metrics/v1/disk")
+router.include_router(net_router, prefix="/metrics/v1/net")
+router.include_router(process_router, prefix="/metrics/v1/processes")
+router.include_router(pressure_router, prefix="/metrics/v1/pressure")
 router.include_router(log_router, prefix="/metrics/v1/logs")
+router.include_router(collector_router, prefix="/metrics/v1/collectors")
+router.include_router(openmetrics_router, prefix="/metrics")
+router.include_router(stream_router, prefix="/metrics/v1/stream")
 
 __all__ = ["router"]
\ No newline at end of file
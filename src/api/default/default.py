@@ -1,7 +1,8 @@
 """
 This module defines API default routes for a router.
 
-These routes handle health checks and basic information requests.
+These routes handle health checks and basic information requests. `/health` only tells that
+the process is serving requests, `/health/ready` also that the metrics have been collected.
 """
 from fastapi import APIRouter, Response, Request
 
@@ -19,6 +20,22 @@ async def health() -> Response:
     return Response(status_code=200)
 
 
+@default_router.get("/health/ready")
+async def ready(request: Request) -> Response:
+    """
+    Readiness check route to indicate every metric collector has taken its first sample.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A response with a 200 status code once ready, 503 before.
+    """
+    if request.app.state.monitortask.ready:
+        return Response(content='{"status": "ready"}', status_code=200)
+    return Response(content='{"status": "starting"}', status_code=503)
+
+
 @default_router.get("/")
 async def home() -> Response:
     """
@@ -0,0 +1,72 @@
+"""
+This module defines API routes for inspecting the metric collectors.
+"""
+from typing import List
+from fastapi import APIRouter, Request
+from domain.schemas import CollectorStatsSchema, SamplingSchema
+
+collector_router = APIRouter()
+
+
+@collector_router.get(
+    "/stats",
+    response_model=List[CollectorStatsSchema],
+)
+async def get_collector_stats(request: Request) -> List[CollectorStatsSchema]:
+    """
+    Route to get the timing statistics of every collector.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        List[CollectorStatsSchema]: Statistics of the collectors, in registration order.
+    """
+    registry = request.app.state.monitortask.registry
+    result = []
+    for collector in registry.collectors():
+        stats = registry.stats(collector.name)
+        result.append(CollectorStatsSchema(
+            name=collector.name,
+            interval=collector.interval,
+            runs=stats.runs,
+            failures=stats.failures,
+            overruns=stats.overruns,
+            last_duration=stats.last_duration,
+            mean_duration=stats.mean_duration,
+            max_duration=stats.max_duration,
+            last_error=stats.last_error,
+        ))
+    return result
+
+
+@collector_router.get(
+    "/sampling",
+    response_model=SamplingSchema,
+)
+async def get_sampling(request: Request) -> SamplingSchema:
+    """
+    Route to get the current sampling rate of the collectors.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        SamplingSchema: Current interval and rate, with the bounds of the adaptive sampling,
+                        both equal to the interval when sampling at a fixed interval.
+    """
+    monitortask = request.app.state.monitortask
+    sampling = monitortask.sampling
+    if sampling is None:
+        interval = monitortask.interval
+        return SamplingSchema(
+            adaptive=False, interval=interval, rate=1.0 / interval, floor=interval,
+            ceiling=interval,
+        )
+    return SamplingSchema(
+        adaptive=sampling.ceiling > sampling.floor,
+        interval=sampling.interval,
+        rate=sampling.rate,
+        floor=sampling.floor,
+        ceiling=sampling.ceiling,
+    )
@@ -1,12 +1,16 @@
 """CPU monitoring routes module with proper data handling."""
-from typing import List, Dict, Union
-from fastapi import APIRouter, Request, HTTPException, status
+from datetime import datetime
+from typing import List, Dict, Optional, Union
+from fastapi import APIRouter, Query, Request, Response, HTTPException, status
+from api.responses import MetricsView, resolve_view, snapshot_response
 from domain.schemas import (
     ExceptionResponseSchema,
     GetCpuResponseSchema,
-    GetCpuCoreResponseSchema,
+    GetCpuTimesResponseSchema,
+    GetHistoryResponseSchema,
 )
-from statistics import mean
+from domain.services import HistoryService, SnapshotService
+from monitor.history import HISTORY_MAX_POINTS
 
 cpu_router = APIRouter()
 
@@ -14,57 +18,107 @@ cpu_router = APIRouter()
     "/usage",
     response_model=Dict[str, Union[List[GetCpuResponseSchema], float]],
     responses={
-        200: {"description": "Successfully retrieved CPU usage data"}
+        200: {"description": "Successfully retrieved CPU usage data"},
+        404: {"model": ExceptionResponseSchema},
     }
 )
-async def get_cpu(request: Request) -> Dict[str, Union[List[GetCpuResponseSchema], float]]:
-    """Get CPU usage data for all cores and system average."""
-    try:
-        monitor_task = request.app.state.monitortask
-        
-        # Get the CPU percentages
-        cpu_percentages = monitor_task.cpu_percent
-        
-        if not cpu_percentages or not isinstance(cpu_percentages, list):
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="No CPU data available"
-            )
-        
-        # Create the CPU usage data
-        cpu_data = []
-        for i, usage in enumerate(cpu_percentages):
-            # Ensure the usage is a float and not None or zero when it shouldn't be
-            if usage is None:
-                usage = 0.0
-            try:
-                usage_float = float(usage)
-                cpu_data.append(GetCpuResponseSchema(
-                    core=i,
-                    usage=round(usage_float, 2)
-                ))
-            except (TypeError, ValueError) as e:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Invalid CPU usage value for core {i}: {str(e)}"
-                )
-        
-        # Calculate average only from valid, non-zero values
-        valid_usages = [core.usage for core in cpu_data if core.usage is not None and core.usage > 0]
-        average_usage = round(mean(valid_usages), 2) if valid_usages else 0.0
-        
-        # Add some debug information if average is 0
-        if average_usage == 0:
-            print(f"Debug - CPU percentages: {cpu_percentages}")
-            print(f"Debug - Valid usages: {valid_usages}")
-        
-        return {
-            "cpu_usage": cpu_data,
-            "average": average_usage
-        }
+async def get_cpu(request: Request, view: Optional[MetricsView] = None) -> Response:
+    """
+    Get CPU usage data for all cores and system average.
 
+    The response is encoded once per CPU collection and tagged with an `ETag`, a request
+    with a matching `If-None-Match` header gets an empty 304 response. The "container" view
+    has a single core, the usage of the container relative to its CPU quota.
+    """
+    view = resolve_view(request, view)
+    try:
+        encoded = await SnapshotService().get_cpu_usage(request.app.state.monitortask, view)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve CPU data: {str(e)}"
-        )
\ No newline at end of file
+        )
+    if not encoded.body:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="No CPU data available"
+        )
+    return snapshot_response(request, encoded)
+
+
+@cpu_router.get(
+    "/history",
+    response_model=GetHistoryResponseSchema,
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+async def get_cpu_history(
+    request: Request,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    points: int = Query(300, ge=1, le=HISTORY_MAX_POINTS),
+) -> GetHistoryResponseSchema:
+    """
+    Route to get the downsampled history of the CPU usage percentages, one series per core.
+
+    Args:
+        request (Request): The incoming request.
+        since (Optional[datetime]): Start of the time range, the oldest sample by default.
+        until (Optional[datetime]): End of the time range, the newest sample by default.
+        points (int): Maximum number of min/max/avg/p95 buckets.
+
+    Returns:
+        GetHistoryResponseSchema: Series names and buckets, oldest first.
+    """
+    return await HistoryService().get_history(
+        request.app.state.monitortask.cpu_history, since, until, points
+    )
+
+
+@cpu_router.get(
+    "/times",
+    response_model=GetCpuTimesResponseSchema,
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+async def get_cpu_times(request: Request) -> Response:
+    """
+    Route to get the share of each state in the CPU time of each core, such as user, system,
+    iowait and the steal time taken by the hypervisor.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: CPU time breakdown of each core and of all the cores, encoded once per
+                  collection, or an empty 304 response if `If-None-Match` matches its `ETag`.
+    """
+    encoded = await SnapshotService().get_cpu_times(request.app.state.monitortask)
+    return snapshot_response(request, encoded)
+
+
+@cpu_router.get(
+    "/times/history",
+    response_model=GetHistoryResponseSchema,
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+async def get_cpu_times_history(
+    request: Request,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    points: int = Query(300, ge=1, le=HISTORY_MAX_POINTS),
+) -> GetHistoryResponseSchema:
+    """
+    Route to get the downsampled history of the CPU time breakdown over all the cores, one
+    series per state.
+
+    Args:
+        request (Request): The incoming request.
+        since (Optional[datetime]): Start of the time range, the oldest sample by default.
+        until (Optional[datetime]): End of the time range, the newest sample by default.
+        points (int): Maximum number of min/max/avg/p95 buckets.
+
+    Returns:
+        GetHistoryResponseSchema: Series names and buckets, oldest first.
+    """
+    return await HistoryService().get_history(
+        request.app.state.monitortask.cpu_times_history, since, until, points
+    )
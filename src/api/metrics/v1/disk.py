@@ -0,0 +1,58 @@
+"""
+This module defines API routes for handling disk-related data.
+"""
+from typing import List
+from fastapi import APIRouter, Request, Response
+from api.responses import snapshot_response
+from domain.schemas import (
+    ExceptionResponseSchema,
+    GetDiskIoResponseSchema,
+    GetDiskUsageResponseSchema,
+)
+from domain.services import SnapshotService
+
+disk_router = APIRouter()
+
+
+@disk_router.get(
+    "/io",
+    response_model=List[GetDiskIoResponseSchema],
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+async def get_disk_io(request: Request) -> Response:
+    """
+    Route to get the read and write rates of each disk device.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A list of disk activity data as per the response model, encoded once per
+                  disk collection, or an empty 304 response if `If-None-Match` matches its
+                  `ETag`.
+    """
+    encoded = await SnapshotService().get_disk_io(request.app.state.monitortask)
+    return snapshot_response(request, encoded)
+
+
+@disk_router.get(
+    "/usage",
+    response_model=GetDiskUsageResponseSchema,
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+async def get_disk_usage(request: Request) -> Response:
+    """
+    Route to get the usage of the mounted filesystems.
+
+    Mounts whose filesystem did not answer in time, such as a stale network mount, are
+    listed as unavailable instead of delaying the response.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: Filesystem usage details, encoded once per disk collection, or an empty 304
+                  response if `If-None-Match` matches its `ETag`.
+    """
+    encoded = await SnapshotService().get_disk_usage(request.app.state.monitortask)
+    return snapshot_response(request, encoded)
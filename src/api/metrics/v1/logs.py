@@ -1,16 +1,20 @@
 """Module defining API routes for log metrics collection and analysis."""
 import os
-from typing import Dict
+from datetime import datetime
+from typing import Dict, Optional
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from domain.schemas import LogMetricsSchema, ExceptionResponseSchema
-from domain.services import LogService
+from monitor.log_index import to_log_time
 
 log_router = APIRouter()
 
 # Environment configuration with defaults
 ACCESS_LOG_PATH = os.getenv("ACCESS_LOG_PATH", "/app/logs/access.log")
 ERROR_LOG_PATH = os.getenv("ERROR_LOG_PATH", "/app/logs/error.log")
+# Glob of the rotated access log segments, e.g. "/app/logs/access.log.*"
+ACCESS_LOG_GLOB = os.getenv("ACCESS_LOG_GLOB")
 
 
 @log_router.get(
@@ -18,28 +22,88 @@ ERROR_LOG_PATH = os.getenv("ERROR_LOG_PATH", "/app/logs/error.log")
     response_model=LogMetricsSchema,
     responses={
         200: {"description": "Successfully retrieved log metrics"},
+        400: {"model": ExceptionResponseSchema},
         500: {"model": ExceptionResponseSchema},
     },
 )
-async def get_log_metrics() -> LogMetricsSchema:
+async def get_log_metrics(
+    request: Request,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> LogMetricsSchema:
     """
     Retrieve and analyze metrics from server log files.
 
+    Args:
+        request (Request): The incoming request.
+        since (Optional[datetime]): Only count requests received at or after this time.
+        until (Optional[datetime]): Only count requests received at or before this time.
+
     Returns:
         LogMetricsSchema: Aggregated metrics including request counts,
                          status codes, and recent errors
 
     Raises:
-        HTTPException: If log analysis fails
+        HTTPException: If the time range is invalid or log analysis fails
     """
+    since, until = to_log_time(since), to_log_time(until)
+    if since is not None and until is not None and since > until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since must not be after until",
+        )
     try:
-        service = LogService()
+        service = request.app.state.logservice
         return await service.get_log_metrics(
             access_log_path=ACCESS_LOG_PATH,
             error_log_path=ERROR_LOG_PATH,
+            since=since,
+            until=until,
+            segments_glob=ACCESS_LOG_GLOB,
         )
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to analyze logs: {str(exc)}",
-        ) from exc
\ No newline at end of file
+        ) from exc
+
+@log_router.get(
+    "/entries",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Parsed log entries, one JSON object per line",
+            "content": {"application/x-ndjson": {}},
+        },
+    },
+)
+async def stream_log_entries(
+    request: Request,
+    status_class: Optional[int] = Query(None, ge=1, le=5),
+    ip: Optional[str] = None,
+    url_prefix: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Stream the parsed entries of the access log as newline-delimited JSON.
+
+    Args:
+        request (Request): The incoming request.
+        status_class (Optional[int]): Only stream entries with a status code in this
+                                      class, 4 for 4xx.
+        ip (Optional[str]): Only stream entries of this client IP.
+        url_prefix (Optional[str]): Only stream entries whose URL starts with this prefix.
+
+    Returns:
+        StreamingResponse: `LogEntrySchema` entries in file order, one per line
+    """
+    service = request.app.state.logservice
+    return StreamingResponse(
+        service.stream_log_entries(
+            ACCESS_LOG_PATH,
+            status_class=status_class,
+            ip=ip,
+            url_prefix=url_prefix,
+            segments_glob=ACCESS_LOG_GLOB,
+        ),
+        media_type="application/x-ndjson",
+    )
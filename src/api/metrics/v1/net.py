@@ -0,0 +1,31 @@
+"""
+This module defines API routes for handling network-related data.
+"""
+from typing import List
+from fastapi import APIRouter, Request, Response
+from api.responses import snapshot_response
+from domain.schemas import ExceptionResponseSchema, GetNetResponseSchema
+from domain.services import SnapshotService
+
+net_router = APIRouter()
+
+
+@net_router.get(
+    "/io",
+    response_model=List[GetNetResponseSchema],
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+async def get_net_io(request: Request) -> Response:
+    """
+    Route to get the throughput, errors and drops of each network interface.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: A list of network throughput data as per the response model, encoded once
+                  per network collection, or an empty 304 response if `If-None-Match`
+                  matches its `ETag`.
+    """
+    encoded = await SnapshotService().get_net_io(request.app.state.monitortask)
+    return snapshot_response(request, encoded)
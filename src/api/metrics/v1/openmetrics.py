@@ -0,0 +1,41 @@
+"""
+This module defines the route exposing the metrics to Prometheus, in the OpenMetrics format.
+"""
+from fastapi import APIRouter, Request, Response
+
+from api.metrics.v1 import logs
+from api.responses import accepts_gzip
+from domain.services import OpenMetricsService
+from monitor.openmetrics import OPENMETRICS_CONTENT_TYPE
+
+openmetrics_router = APIRouter()
+
+
+@openmetrics_router.get(
+    "",
+    response_class=Response,
+    responses={200: {"content": {OPENMETRICS_CONTENT_TYPE: {}}}},
+)
+async def get_openmetrics(request: Request) -> Response:
+    """
+    Route to get the CPU, RAM, access log and agent metrics in the OpenMetrics text format.
+
+    The text is rendered once per sample and sent gzip-encoded to the clients accepting it.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: The exposition text.
+    """
+    exposition = await OpenMetricsService().get_exposition(
+        request.app.state.monitortask,
+        request.app.state.logservice,
+        logs.ACCESS_LOG_PATH,
+        request.app.state.version,
+    )
+    headers = {"Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(exposition.gzipped, media_type=OPENMETRICS_CONTENT_TYPE, headers=headers)
+    return Response(exposition.text, media_type=OPENMETRICS_CONTENT_TYPE, headers=headers)
@@ -0,0 +1,35 @@
+"""
+This module defines API routes for handling pressure-related data.
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Request, Response
+from api.responses import MetricsView, resolve_view, snapshot_response
+from domain.schemas import ExceptionResponseSchema, GetPressureResponseSchema
+from domain.services import SnapshotService
+
+pressure_router = APIRouter()
+
+
+@pressure_router.get(
+    "",
+    response_model=List[GetPressureResponseSchema],
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+async def get_pressure(request: Request, view: Optional[MetricsView] = None) -> Response:
+    """
+    Route to get the Pressure Stall Information of the CPU, memory and I/O, the share of time
+    the tasks were stalled waiting for each resource.
+
+    Args:
+        request (Request): The incoming request.
+        view (Optional[MetricsView]): View of the metrics, the application default if None.
+
+    Returns:
+        Response: A list of resource pressures as per the response model, empty if the kernel
+                  has no PSI, encoded once per collection, or an empty 304 response if
+                  `If-None-Match` matches its `ETag`.
+    """
+    encoded = await SnapshotService().get_pressure(
+        request.app.state.monitortask, resolve_view(request, view)
+    )
+    return snapshot_response(request, encoded)
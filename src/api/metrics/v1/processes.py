@@ -0,0 +1,29 @@
+"""
+This module defines API routes for handling process-related data.
+"""
+from fastapi import APIRouter, Request, Response
+from api.responses import snapshot_response
+from domain.schemas import ExceptionResponseSchema, GetTopProcessesResponseSchema
+from domain.services import SnapshotService
+
+process_router = APIRouter()
+
+
+@process_router.get(
+    "/top",
+    response_model=GetTopProcessesResponseSchema,
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+async def get_top_processes(request: Request) -> Response:
+    """
+    Route to get the processes using the most CPU and resident memory.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        Response: Top processes by CPU and by memory, encoded once per process collection,
+                  or an empty 304 response if `If-None-Match` matches its `ETag`.
+    """
+    encoded = await SnapshotService().get_top_processes(request.app.state.monitortask)
+    return snapshot_response(request, encoded)
@@ -1,14 +1,18 @@
 """
 This module defines API routes for handling RAM-related data.
 """
-from typing import List
-from fastapi import APIRouter, Request
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Query, Request, Response
+from api.responses import MetricsView, resolve_view, snapshot_response
 from domain.schemas import (
     ExceptionResponseSchema,
+    GetHistoryResponseSchema,
     GetRamResponseSchema,
     GetRamInfoResponseSchema,
 )
-from domain.services import RamService
+from domain.services import HistoryService, SnapshotService
+from monitor.history import HISTORY_MAX_POINTS
 
 ram_router = APIRouter()
 
@@ -16,40 +20,78 @@ ram_router = APIRouter()
 @ram_router.get(
     "/usage",
     response_model=List[GetRamResponseSchema],
-    responses={"400": {"model": ExceptionResponseSchema}},
+    responses={
+        "400": {"model": ExceptionResponseSchema},
+        "404": {"model": ExceptionResponseSchema},
+    },
 )
-async def get_ram(request: Request) -> List[GetRamResponseSchema]:
+async def get_ram(request: Request, view: Optional[MetricsView] = None) -> Response:
     """
     Route to get a list of RAM usage data.
 
     Args:
         request (Request): The incoming request.
+        view (Optional[MetricsView]): "host", or "container" for the usage relative to the
+                                      memory limit of the container, the default view if None.
 
     Returns:
-        List[GetRamResponseSchema]: A list of RAM usage data as per the response model.
+        Response: A list of RAM usage data as per the response model, encoded once per RAM
+                  collection, or an empty 304 response if `If-None-Match` matches its `ETag`.
     """
-    return await RamService().get_ram(request.app.state.monitortask)
+    view = resolve_view(request, view)
+    encoded = await SnapshotService().get_ram_usage(request.app.state.monitortask, view)
+    return snapshot_response(request, encoded)
 
 
 @ram_router.get(
     "/info",
     response_model=GetRamInfoResponseSchema,
-    responses={"400": {"model": ExceptionResponseSchema}},
+    responses={
+        "400": {"model": ExceptionResponseSchema},
+        "404": {"model": ExceptionResponseSchema},
+    },
 )
-async def get_ram_info(request: Request) -> GetRamInfoResponseSchema:
+async def get_ram_info(request: Request, view: Optional[MetricsView] = None) -> Response:
     """
     Route to get RAM information.
 
     Args:
         request (Request): The incoming request.
+        view (Optional[MetricsView]): "host", or "container" for the memory limit and usage of
+                                      the container, the default view if None.
+
+    Returns:
+        Response: RAM information details, encoded once per RAM collection, or an empty 304
+                  response if `If-None-Match` matches its `ETag`.
+    """
+    view = resolve_view(request, view)
+    encoded = await SnapshotService().get_ram_info(request.app.state.monitortask, view)
+    return snapshot_response(request, encoded)
+
+
+@ram_router.get(
+    "/history",
+    response_model=GetHistoryResponseSchema,
+    responses={"400": {"model": ExceptionResponseSchema}},
+)
+async def get_ram_history(
+    request: Request,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    points: int = Query(300, ge=1, le=HISTORY_MAX_POINTS),
+) -> GetHistoryResponseSchema:
+    """
+    Route to get the downsampled history of the RAM usage percentage, used and available RAM in MB.
+
+    Args:
+        request (Request): The incoming request.
+        since (Optional[datetime]): Start of the time range, the oldest sample by default.
+        until (Optional[datetime]): End of the time range, the newest sample by default.
+        points (int): Maximum number of min/max/avg/p95 buckets.
 
     Returns:
-        GetRamInfoResponseSchema: RAM information details.
+        GetHistoryResponseSchema: Series names and buckets, oldest first.
     """
-    monitortask = request.app.state.monitortask
-    return GetRamInfoResponseSchema(
-        total=monitortask.total_ram,
-        available=monitortask.available_ram,
-        used=monitortask.used_ram,
-        free=monitortask.free_ram
-    )
\ No newline at end of file
+    return await HistoryService().get_history(
+        request.app.state.monitortask.ram_history, since, until, points
+    )
@@ -0,0 +1,133 @@
+"""
+This module defines the routes pushing the new metric snapshots to the clients.
+
+Clients subscribe to topics, "cpu" and "ram", over Server-Sent Events or a WebSocket and
+receive each new snapshot once per collection, instead of polling the metric routes.
+"""
+import asyncio
+from typing import AsyncIterator, List
+
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import StreamingResponse
+
+from domain.schemas import ExceptionResponseSchema
+from domain.services import SnapshotService
+from domain.services.snapshotservice import STREAM_TOPICS
+from monitor import MonitorTask
+
+stream_router = APIRouter()
+
+# Time without message after which a comment keeps idle event streams open, in seconds
+SSE_KEEPALIVE = 15.0
+
+
+def _check_topics(topics: List[str]) -> List[str]:
+    """Return the unknown topics."""
+    return [topic for topic in topics if topic not in STREAM_TOPICS]
+
+
+async def _events(monitor_task: MonitorTask, topics: List[str]) -> AsyncIterator[bytes]:
+    """Yield the server-sent events of the topics until the client disconnects."""
+    service = SnapshotService()
+    subscription = service.subscribe(monitor_task, topics)
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield message.event
+    finally:
+        service.unsubscribe(monitor_task, subscription)
+
+
+@stream_router.get(
+    "/sse",
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        400: {"model": ExceptionResponseSchema},
+    },
+)
+async def stream_events(
+    request: Request,
+    topics: List[str] = Query(list(STREAM_TOPICS)),
+) -> StreamingResponse:
+    """
+    Route to stream the new snapshots of some topics as Server-Sent Events.
+
+    Each event is named after its topic and carries the JSON of the matching polling route.
+
+    Args:
+        request (Request): The incoming request.
+        topics (List[str]): Subscribed topics, all of them by default.
+
+    Returns:
+        StreamingResponse: Endless stream of events.
+
+    Raises:
+        HTTPException: If a topic is unknown.
+    """
+    unknown = _check_topics(topics)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown topics: {', '.join(unknown)}",
+        )
+    return StreamingResponse(
+        _events(request.app.state.monitortask, topics),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@stream_router.websocket("/ws")
+async def stream_websocket(
+    websocket: WebSocket,
+    topics: List[str] = Query(list(STREAM_TOPICS)),
+) -> None:
+    """
+    Route to stream the new snapshots of some topics over a WebSocket.
+
+    Each text message is a JSON object with the topic and the JSON of the matching polling
+    route, as {"topic": ..., "data": ...}.
+
+    Args:
+        websocket (WebSocket): The incoming WebSocket connection.
+        topics (List[str]): Subscribed topics, all of them by default.
+    """
+    if _check_topics(topics):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    monitor_task = websocket.app.state.monitortask
+    service = SnapshotService()
+    subscription = service.subscribe(monitor_task, topics)
+    # Messages from the client are ignored, receiving only detects the disconnection
+    receiver = asyncio.ensure_future(websocket.receive())
+    # Kept until it completes, a message it took from the subscription is always sent
+    getter = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                if receiver.result()["type"] == "websocket.disconnect":
+                    return
+                receiver = asyncio.ensure_future(websocket.receive())
+            if getter.done():
+                await websocket.send_text(getter.result().text)
+                getter = asyncio.ensure_future(subscription.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        getter.cancel()
+        service.unsubscribe(monitor_task, subscription)
@@ -0,0 +1,100 @@
+"""
+This module defines the responses built from pre-encoded metric snapshots.
+
+Responses carry the entity tag of their body, so that a client polling with `If-None-Match`
+gets an empty 304 response until the metrics change.
+"""
+from typing import Literal, Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+from monitor.snapshots import EncodedSnapshot
+
+# Views of the CPU and RAM metrics a request can choose
+MetricsView = Literal["host", "container"]
+
+
+def resolve_view(request: Request, view: Optional[str]) -> str:
+    """
+    Resolve the view of the CPU and RAM metrics requested, the application default if None.
+
+    Args:
+        request (Request): The incoming request.
+        view (Optional[str]): The requested view.
+
+    Returns:
+        str: The view to serve.
+
+    Raises:
+        HTTPException: If the view is not collected, as the container view without cgroup v2.
+    """
+    view = view or request.app.state.metrics_view
+    if not request.app.state.monitortask.has_view(view):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Metrics view not available: {view}",
+        )
+    return view
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Tell whether an `If-None-Match` header matches an entity tag, with a weak comparison.
+
+    Args:
+        if_none_match: Value of the header, None if it is missing
+        etag: Quoted entity tag of the current response
+
+    Returns:
+        bool: Whether the client already has the current response
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    Tell whether an `Accept-Encoding` header accepts the gzip encoding.
+
+    Args:
+        accept_encoding: Value of the header, None if it is missing
+
+    Returns:
+        bool: Whether gzip is listed without a zero quality
+    """
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip().lower().replace(" ", "")
+        if not quality.startswith("q="):
+            return True
+        try:
+            return float(quality[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def snapshot_response(request: Request, encoded: EncodedSnapshot) -> Response:
+    """
+    Build the response of a pre-encoded snapshot, empty if the client already has it.
+
+    Args:
+        request (Request): The incoming request.
+        encoded (EncodedSnapshot): The encoded snapshot.
+
+    Returns:
+        Response: A 304 response if `If-None-Match` matches the snapshot, a JSON response
+                  with the encoded body otherwise.
+    """
+    # Clients must revalidate, the metrics change at every collection
+    headers = {"ETag": encoded.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), encoded.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=encoded.body, media_type="application/json", headers=headers)
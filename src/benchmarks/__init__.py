@@ -0,0 +1,57 @@
+"""
+Micro benchmarks for the agent, run from the `src` directory, e.g.:
+
+    python -m benchmarks.log_parser
+
+They are not part of the test suite and only print their measurements.
+"""
+import random
+import time
+from typing import Callable, List, Tuple
+
+_URLS = ["/", "/index.html", "/api/data", "/api/data?page=2", "/static/app.js", "/login"]
+_AGENTS = ["curl/8.0", "Mozilla/5.0 (X11; Linux x86_64)", "Wget/1.21"]
+_STATUSES = [200, 200, 200, 200, 301, 304, 404, 500]
+
+
+def combined_lines(count: int, seed: int = 42) -> List[str]:
+    """
+    Generate synthetic combined log format lines, with one timestamp per 10 lines.
+
+    Args:
+        count: Number of lines to generate
+        seed: Seed of the random generator
+
+    Returns:
+        List[str]: Generated lines, without line terminators
+    """
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        second = i // 10
+        lines.append(
+            f"10.0.{rng.randint(0, 9)}.{rng.randint(1, 254)} - - "
+            f"[10/Jan/2024:{second // 3600 % 24:02d}:{second // 60 % 60:02d}:"
+            f"{second % 60:02d} +0000] \"GET {rng.choice(_URLS)} HTTP/1.1\" "
+            f"{rng.choice(_STATUSES)} {rng.randint(100, 9999)} \"-\" \"{rng.choice(_AGENTS)}\""
+        )
+    return lines
+
+
+def timed(func: Callable[[], object], repeat: int = 3) -> Tuple[float, object]:
+    """
+    Run `func` several times and keep the best wall clock time.
+
+    Args:
+        func: Function to measure
+        repeat: Number of runs
+
+    Returns:
+        Tuple[float, object]: Best duration in seconds and the result of the last run
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
@@ -0,0 +1,42 @@
+"""Benchmark the CPU used by the collectors on an idle host, with adaptive sampling."""
+import threading
+import time
+
+from monitor import MonitorTask
+from monitor.adaptive import AdaptiveSampling
+
+# Intervals 20 times shorter than the defaults, so that the policy reaches its ceiling soon
+FLOOR = 0.05
+CEILING = 0.5
+# Duration of each run, in seconds
+DURATION = 10.0
+
+
+def _run(sampling) -> tuple:
+    """Run the collectors of a monitor, return the CPU time used and the number of runs."""
+    monitortask = MonitorTask(history_size=16, interval=FLOOR, sampling=sampling)
+    stop = threading.Event()
+    timer = threading.Timer(DURATION, stop.set)
+    start = time.process_time()
+    timer.start()
+    monitortask.scheduler.run(stop)
+    cpu = time.process_time() - start
+    registry = monitortask.registry
+    runs = sum(registry.stats(collector.name).runs for collector in registry.collectors())
+    return cpu, runs
+
+
+def main() -> None:
+    """Print the CPU load of the collectors at a fixed interval and with adaptive sampling."""
+    fixed, fixed_runs = _run(None)
+    sampling = AdaptiveSampling(floor=FLOOR, ceiling=CEILING)
+    adaptive, adaptive_runs = _run(sampling)
+    print(f"fixed {FLOOR * 1000:.0f} ms: {fixed / DURATION * 100:5.2f}% of a core, "
+          f"{fixed_runs} collections")
+    print(f"adaptive {FLOOR * 1000:.0f}-{CEILING * 1000:.0f} ms: "
+          f"{adaptive / DURATION * 100:5.2f}% of a core, {adaptive_runs} collections, "
+          f"final interval {sampling.interval * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
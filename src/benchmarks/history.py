@@ -0,0 +1,39 @@
+"""Benchmark recording and downsampling the metric history, raw and rolled up."""
+import random
+
+from benchmarks import timed
+from monitor.history import HISTORY_MAX_POINTS, HISTORY_SIZE, MetricHistory
+
+CORES = 16
+# Samples recorded at the 1 second interval, a week
+WEEK = 7 * 24 * 60 * 60
+
+
+def main() -> None:
+    """Print the duration of appends and queries over a week of 16-core history."""
+    rng = random.Random(42)
+    history = MetricHistory([f"core{core}" for core in range(CORES)])
+    samples = [[rng.uniform(0, 100) for _ in range(CORES)] for _ in range(1000)]
+
+    def record() -> None:
+        for i in range(WEEK):
+            history.append(float(i), samples[i % 1000])
+
+    duration, _ = timed(record, repeat=1)
+    print(f"append {CORES} cores: {duration / WEEK * 1e6:.2f} us per sample")
+    ranges = (("hour", 3600), ("day", HISTORY_SIZE), ("week", WEEK))
+    for label, span in ranges:
+        for points in (100, 300, HISTORY_MAX_POINTS):
+            duration, (tier, _) = timed(
+                lambda: history.query(since=float(WEEK - span), points=points)
+            )
+            print(f"last {label:<4} -> {points:>4} points from {tier:>3}: "
+                  f"{duration * 1000:>7.2f} ms")
+    # What a full day query would cost if it were summarized from the raw samples
+    for points in (300, HISTORY_MAX_POINTS):
+        duration, _ = timed(lambda: history.downsample(points=points))
+        print(f"raw day  -> {points:>4} points:          {duration * 1000:>7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
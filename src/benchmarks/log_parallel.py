@@ -0,0 +1,43 @@
+"""Benchmark the cold analysis of a large access log, serially and with worker processes."""
+import os
+import tempfile
+
+from benchmarks import combined_lines, timed
+from monitor.log_ingest import LogIngestor
+from monitor.log_parallel import ParallelLogAnalyzer
+from monitor.log_parser import COMBINED_FORMAT, LogParser
+
+LINES = 2_000_000
+
+
+def _cold_poll(path, analyzer=None):
+    bulk = analyzer.analyze if analyzer else None
+    return LogIngestor(path, LogParser(COMBINED_FORMAT).parse, bulk=bulk).poll()
+
+
+def main() -> None:
+    """Print the throughput of a cold analysis for several worker counts."""
+    with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as file:
+        file.write("\n".join(combined_lines(LINES)) + "\n")
+    try:
+        serial, expected = timed(lambda: _cold_poll(file.name), repeat=1)
+        print(f"serial:     {LINES / serial:>12,.0f} lines/s")
+        for workers in sorted({2, 4, max(2, os.cpu_count() or 1)}):
+            analyzer = ParallelLogAnalyzer(COMBINED_FORMAT, workers, min_size=0)
+            try:
+                # The first run pays for the worker processes start up
+                _cold_poll(file.name, analyzer)
+                duration, result = timed(lambda: _cold_poll(file.name, analyzer))
+            finally:
+                analyzer.close()
+            assert result.total == expected.total
+            print(
+                f"{workers:>2} workers: {LINES / duration:>12,.0f} lines/s "
+                f"({serial / duration:.1f}x)"
+            )
+    finally:
+        os.unlink(file.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Benchmark the precompiled access log parser against apache_log_parser + pydantic."""
+import apache_log_parser
+
+from benchmarks import combined_lines, timed
+from domain.schemas import LogEntrySchema
+from monitor.log_parser import COMBINED_FORMAT, LogParser
+
+LINES = 200_000
+
+
+def _reference(lines):
+    parser = apache_log_parser.make_parser(COMBINED_FORMAT)
+    for line in lines:
+        parsed = parser(line)
+        LogEntrySchema(
+            timestamp=parsed["time_received_datetimeobj"],
+            ip=parsed["remote_host"],
+            url=parsed["request_url"],
+            status_code=int(parsed["status"]),
+            user_agent=parsed["request_header_user_agent"],
+        )
+
+
+def _fast(lines):
+    parse = LogParser(COMBINED_FORMAT).parse
+    for line in lines:
+        parse(line)
+
+
+def main() -> None:
+    """Print the throughput of both parsers."""
+    lines = combined_lines(LINES)
+    fast, _ = timed(lambda: _fast(lines))
+    reference, _ = timed(lambda: _reference(lines[: LINES // 10]), repeat=1)
+    reference *= 10
+    print(f"apache_log_parser + pydantic: {LINES / reference:>12,.0f} lines/s")
+    print(f"LogParser:                    {LINES / fast:>12,.0f} lines/s")
+    print(f"speedup:                      {reference / fast:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
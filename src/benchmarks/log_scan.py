@@ -0,0 +1,44 @@
+"""Benchmark the text and mmap scan modes on a cold access log analysis."""
+import os
+import tempfile
+import tracemalloc
+
+from benchmarks import combined_lines, timed
+from monitor.log_ingest import LogIngestor
+from monitor.log_parser import COMBINED_FORMAT, LogParser
+from monitor.log_scan import RANGE_READERS
+
+LINES = 1_000_000
+
+
+def _cold_poll(path, mode):
+    return LogIngestor(path, LogParser(COMBINED_FORMAT), reader=RANGE_READERS[mode]).poll()
+
+
+def _peak_memory(path, mode):
+    tracemalloc.start()
+    try:
+        _cold_poll(path, mode)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    """Print the throughput and the peak Python allocations of each scan mode."""
+    with tempfile.NamedTemporaryFile("w", suffix=".log", delete=False) as file:
+        file.write("\n".join(combined_lines(LINES)) + "\n")
+    try:
+        for mode in RANGE_READERS:
+            duration, _ = timed(lambda: _cold_poll(file.name, mode))
+            peak = _peak_memory(file.name, mode)
+            print(
+                f"{mode:>5}: {LINES / duration:>12,.0f} lines/s, "
+                f"peak allocations {peak / 1024 / 1024:>7.1f} MiB"
+            )
+    finally:
+        os.unlink(file.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Benchmark the CPU time of a top processes collection on a host running many processes."""
+import statistics
+import subprocess
+import time
+
+from monitor.collectors import ProcessCollector
+
+# Idle processes started on top of the host processes
+PROCESSES = 2000
+CYCLES = 10
+# CPU time allowed to a collection of 2000 processes, 3% of a core at the 5 s interval
+BUDGET = 0.15
+
+
+def main() -> None:
+    """Print the CPU time of a collection and check it against the budget."""
+    children = [
+        subprocess.Popen(["sleep", "600"], stdin=subprocess.DEVNULL) for _ in range(PROCESSES)
+    ]
+    try:
+        collector = ProcessCollector()
+        collector.collect()
+        durations = []
+        for _ in range(CYCLES):
+            start = time.process_time()
+            snapshot = collector.collect()
+            durations.append(time.process_time() - start)
+        median = statistics.median(durations)
+        print(f"processes: {snapshot.count}")
+        print(f"collection CPU time: {median * 1000:7.1f} ms, "
+              f"{median / snapshot.count * 1e6:5.1f} us per process")
+        status = "within" if median * PROCESSES / snapshot.count <= BUDGET else "OVER"
+        print(f"{status} the budget of {BUDGET * 1000:.0f} ms per {PROCESSES} processes")
+    finally:
+        for child in children:
+            child.kill()
+        for child in children:
+            child.wait()
+
+
+if __name__ == "__main__":
+    main()
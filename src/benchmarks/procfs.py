@@ -0,0 +1,62 @@
+"""Benchmark the /proc fast-path CPU and RAM collectors against the psutil collectors."""
+import time
+
+from benchmarks import timed
+from monitor.collectors import CpuCollector, ProcCpuCollector, ProcRamCollector, RamCollector
+
+# Sampling frequencies compared, in Hz
+RATES = (10, 100)
+# Duration of the sampling at each frequency, in seconds
+DURATION = 3.0
+# Back-to-back samples timed with hot caches
+HOT_SAMPLES = 1000
+
+
+def _sample(collectors, rate: float) -> tuple:
+    """Run the collectors at a frequency, return the CPU time per sample and the CPU load."""
+    period = 1 / rate
+    samples = int(DURATION * rate)
+    cpu = 0.0
+    deadline = time.monotonic()
+    for _ in range(samples):
+        start = time.thread_time()
+        for collector in collectors:
+            collector.collect()
+        cpu += time.thread_time() - start
+        deadline += period
+        time.sleep(max(deadline - time.monotonic(), 0))
+    return cpu / samples, cpu / DURATION
+
+
+def _sample_hot(collectors) -> float:
+    """Return the duration of a sample taken right after the previous one."""
+
+    def run() -> None:
+        for _ in range(HOT_SAMPLES):
+            for collector in collectors:
+                collector.collect()
+
+    duration, _ = timed(run)
+    return duration / HOT_SAMPLES
+
+
+def main() -> None:
+    """Print the CPU time of a CPU and RAM sample and the sampler load of both paths."""
+    for label, collectors in (
+        ("psutil", (CpuCollector(), RamCollector())),
+        ("/proc ", (ProcCpuCollector(), ProcRamCollector())),
+    ):
+        print(f"back-to-back {label}: {_sample_hot(collectors) * 1e6:6.1f} us per sample")
+    # Sleeping between samples leaves cold caches, as in the sampler thread
+    for rate in RATES:
+        for label, collectors in (
+            ("psutil", (CpuCollector(), RamCollector())),
+            ("/proc ", (ProcCpuCollector(), ProcRamCollector())),
+        ):
+            per_sample, load = _sample(collectors, rate)
+            print(f"{rate:3d} Hz {label}: {per_sample * 1e6:6.1f} us per sample, "
+                  f"{load * 100:5.2f}% of a core")
+
+
+if __name__ == "__main__":
+    main()
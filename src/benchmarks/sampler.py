@@ -0,0 +1,44 @@
+"""Benchmark the request latency impact of the metric sampler thread."""
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+from server import app
+
+REQUESTS = 2000
+# Sampling 100 times faster than the default interval exaggerates the sampler load
+INTERVAL = 0.03
+
+
+def _latencies(client):
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        client.get("/metrics/v1/ram/info")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _report(label, latencies):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{label}: p50 {quantiles[49] * 1000:6.3f} ms, p99 {quantiles[98] * 1000:6.3f} ms")
+
+
+def main() -> None:
+    """Print the latency percentiles of a metrics route with and without the sampler."""
+    monitortask = app.state.monitortask
+    client = TestClient(app)
+    _latencies(client)
+    _report("sampler stopped", _latencies(client))
+    monitortask.interval = INTERVAL
+    monitortask.start()
+    try:
+        _report(f"sampler every {INTERVAL * 1000:.0f} ms", _latencies(client))
+    finally:
+        monitortask.stop()
+    print(f"samples taken: {len(monitortask.cpu_history)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark the time from launching the server to its first answered and ready requests."""
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+RUNS = 5
+# Time given to the server to answer before the run is considered failed
+TIMEOUT = 30.0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+    except OSError:
+        return 0
+
+
+def _wait_for(url: str, start: float) -> float:
+    while time.perf_counter() - start < TIMEOUT:
+        if _status(url) == 200:
+            return time.perf_counter() - start
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} did not answer within {TIMEOUT} s")
+
+
+def _run() -> tuple:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "error"],
+    )
+    try:
+        first = _wait_for(f"{base}/health", start)
+        ready = _wait_for(f"{base}/health/ready", start)
+    finally:
+        server.terminate()
+        server.wait()
+    return first, ready
+
+
+def main() -> None:
+    """Print the median time to the first 200 of /health and of /health/ready."""
+    results = [_run() for _ in range(RUNS)]
+    first = sorted(result[0] for result in results)[RUNS // 2]
+    ready = sorted(result[1] for result in results)[RUNS // 2]
+    print(f"time to first 200: {first * 1000:7.1f} ms")
+    print(f"time to ready:     {ready * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ a `get_config` function to retrieve the appropriate configuration based on the e
 import os
 import contextvars
 from dataclasses import dataclass
+from typing import Optional
 
 config = contextvars.ContextVar("configuration", default=None)
 
@@ -23,6 +24,18 @@ class Config:
     debug: bool = False
     app_host: str = "0.0.0.0"
     app_port: int = 8000
+    log_workers: int = 0
+    log_scan_mode: str = "text"
+    log_index_dir: Optional[str] = None
+    workers: int = 1
+    metrics_shm: Optional[str] = None
+    cgroup_root: str = "/sys/fs/cgroup"
+    metrics_view: str = "host"
+    sampling_floor: float = 1.0
+    sampling_ceiling: float = 10.0
+    sampling_cpu_threshold: float = 80.0
+    sampling_ram_threshold: float = 90.0
+    sampling_change_threshold: float = 10.0
 
 
 @dataclass
@@ -41,6 +54,17 @@ class ProductionConfig(Config):
     debug: str = False
 
 
+def default_log_index_dir() -> str:
+    """
+    Get the default directory of the saved log indexes, in the cache of the user.
+
+    Returns:
+        str: The directory, under $XDG_CACHE_HOME or ~/.cache.
+    """
+    cache_dir = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "agent", "log-index")
+
+
 def get_config() -> Config:
     """
     Get the appropriate configuration based on the environment.
@@ -52,11 +76,53 @@ def get_config() -> Config:
     version = os.getenv("AGENT_VERSION", "1.0.0")
     description = os.getenv("AGENT_DESCRIPTION", "api for python agent")
     debug = bool(os.getenv("AGENT_DEBUG", "False"))
+    log_workers = int(os.getenv("AGENT_LOG_WORKERS", "0"))
+    log_scan_mode = os.getenv("AGENT_LOG_SCAN_MODE", "text")
+    log_index_dir = os.getenv("AGENT_LOG_INDEX_DIR") or default_log_index_dir()
+    workers = int(os.getenv("AGENT_WORKERS", "1"))
+    metrics_shm = os.getenv("AGENT_METRICS_SHM")
+    cgroup_root = os.getenv("AGENT_CGROUP_ROOT", "/sys/fs/cgroup")
+    metrics_view = os.getenv("AGENT_METRICS_VIEW", "host")
+    # A ceiling equal to the floor samples at a fixed interval
+    sampling_floor = float(os.getenv("AGENT_SAMPLING_FLOOR", "1.0"))
+    sampling_ceiling = float(os.getenv("AGENT_SAMPLING_CEILING", "10.0"))
+    sampling_cpu_threshold = float(os.getenv("AGENT_SAMPLING_CPU_THRESHOLD", "80.0"))
+    sampling_ram_threshold = float(os.getenv("AGENT_SAMPLING_RAM_THRESHOLD", "90.0"))
+    sampling_change_threshold = float(os.getenv("AGENT_SAMPLING_CHANGE_THRESHOLD", "10.0"))
     match env:
         case "local":
-            cfg = LocalConfig(version=version, description=description)
+            cfg = LocalConfig(
+                version=version,
+                description=description,
+                log_workers=log_workers,
+                log_scan_mode=log_scan_mode,
+                log_index_dir=log_index_dir,
+                workers=workers,
+                metrics_shm=metrics_shm,
+                cgroup_root=cgroup_root,
+                metrics_view=metrics_view,
+                sampling_floor=sampling_floor,
+                sampling_ceiling=sampling_ceiling,
+                sampling_cpu_threshold=sampling_cpu_threshold,
+                sampling_ram_threshold=sampling_ram_threshold,
+                sampling_change_threshold=sampling_change_threshold,
+            )
         case _:
             cfg = ProductionConfig(
-                version=version, description=description, debug=debug
+                version=version,
+                description=description,
+                debug=debug,
+                log_workers=log_workers,
+                log_scan_mode=log_scan_mode,
+                log_index_dir=log_index_dir,
+                workers=workers,
+                metrics_shm=metrics_shm,
+                cgroup_root=cgroup_root,
+                metrics_view=metrics_view,
+                sampling_floor=sampling_floor,
+                sampling_ceiling=sampling_ceiling,
+                sampling_cpu_threshold=sampling_cpu_threshold,
+                sampling_ram_threshold=sampling_ram_threshold,
+                sampling_change_threshold=sampling_change_threshold,
             )
     return cfg
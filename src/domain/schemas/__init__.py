@@ -1,7 +1,23 @@
 from pydantic import BaseModel
-from .cpu import GetCpuResponseSchema, GetCpuCoreResponseSchema
+from .cpu import (
+    CpuCoreTimesSchema,
+    GetCpuCoreResponseSchema,
+    GetCpuResponseSchema,
+    GetCpuTimesResponseSchema,
+)
 from .ram import GetRamResponseSchema, GetRamInfoResponseSchema
-from .logs import LogEntrySchema, LogMetricsSchema
+from .collectors import CollectorStatsSchema, SamplingSchema
+from .disk import GetDiskIoResponseSchema, GetDiskUsageResponseSchema, MountUsageSchema
+from .net import GetNetResponseSchema
+from .pressure import GetPressureResponseSchema, PressureStallSchema
+from .processes import GetTopProcessesResponseSchema, ProcessUsageSchema
+from .history import GetHistoryResponseSchema, HistoryBucketSchema
+from .logs import (
+    ErrorLogEntrySchema,
+    ErrorLogMetricsSchema,
+    LogEntrySchema,
+    LogMetricsSchema,
+)
 
 class ExceptionResponseSchema(BaseModel):
     error: str
@@ -10,9 +26,25 @@ class ExceptionResponseSchema(BaseModel):
 __all__ = [
     "GetCpuResponseSchema",
     "GetCpuCoreResponseSchema",
+    "CpuCoreTimesSchema",
+    "GetCpuTimesResponseSchema",
     "GetRamResponseSchema",
     "GetRamInfoResponseSchema",
+    "GetHistoryResponseSchema",
+    "CollectorStatsSchema",
+    "SamplingSchema",
+    "GetDiskIoResponseSchema",
+    "GetDiskUsageResponseSchema",
+    "MountUsageSchema",
+    "GetNetResponseSchema",
+    "GetPressureResponseSchema",
+    "PressureStallSchema",
+    "GetTopProcessesResponseSchema",
+    "ProcessUsageSchema",
+    "HistoryBucketSchema",
     "LogEntrySchema",
     "LogMetricsSchema",
+    "ErrorLogEntrySchema",
+    "ErrorLogMetricsSchema",
     "ExceptionResponseSchema",
 ]
\ No newline at end of file
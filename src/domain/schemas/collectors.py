@@ -0,0 +1,52 @@
+"""
+This module defines response schemas for the metric collectors.
+"""
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class CollectorStatsSchema(BaseModel):
+    """
+    Pydantic data model for the timing statistics of a collector.
+
+    Attributes:
+        name (str): Name of the collector.
+        interval (float): Time between two collections, in seconds.
+        runs (int): Number of collections.
+        failures (int): Number of failed collections.
+        overruns (int): Number of collections that ended after the next one was due.
+        last_duration (float): Duration of the last collection, in seconds.
+        mean_duration (float): Mean duration of the collections, in seconds.
+        max_duration (float): Duration of the longest collection, in seconds.
+        last_error (Optional[str]): Error of the last failed collection.
+    """
+
+    name: str
+    interval: float
+    runs: int
+    failures: int
+    overruns: int
+    last_duration: float
+    mean_duration: float
+    max_duration: float
+    last_error: Optional[str]
+
+
+class SamplingSchema(BaseModel):
+    """
+    Pydantic data model for the sampling rate of the collectors.
+
+    Attributes:
+        adaptive (bool): Whether the interval adapts to the activity of the host.
+        interval (float): Current interval of the CPU and RAM collectors, in seconds.
+        rate (float): Current number of CPU and RAM collections per second.
+        floor (float): Interval under load, in seconds.
+        ceiling (float): Interval on a stable host, in seconds.
+    """
+
+    adaptive: bool
+    interval: float
+    rate: float
+    floor: float
+    ceiling: float
@@ -1,12 +1,39 @@
 """
 This module defines a data transfer model for a GetCpuResponseSchema.
 """
+from typing import Dict, List
+
 from pydantic import BaseModel, Field
 
 class GetCpuResponseSchema(BaseModel):
     core: int = Field(..., ge=0)
     usage: float = Field(..., ge=0, le=100)
 
+class CpuCoreTimesSchema(BaseModel):
+    """
+    Pydantic data model for the CPU time breakdown of a core.
+
+    Attributes:
+        core (int): The index of the logical core.
+        times (Dict[str, float]): Percentage of the time spent in each state, such as user,
+                                  system, iowait and steal.
+    """
+
+    core: int = Field(..., ge=0)
+    times: Dict[str, float]
+
+class GetCpuTimesResponseSchema(BaseModel):
+    """
+    Pydantic data model for the response schema representing the CPU time breakdown.
+
+    Attributes:
+        cpu_times (List[CpuCoreTimesSchema]): Breakdown of each logical core.
+        average (Dict[str, float]): Breakdown over all the cores.
+    """
+
+    cpu_times: List[CpuCoreTimesSchema]
+    average: Dict[str, float]
+
 class GetCpuCoreResponseSchema(BaseModel):
     number: int = Field(..., gt=0)
 
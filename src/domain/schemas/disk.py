@@ -0,0 +1,61 @@
+"""
+This module defines data transfer models for disk-related response schemas.
+"""
+from typing import List
+
+from pydantic import BaseModel
+
+
+class GetDiskIoResponseSchema(BaseModel):
+    """
+    Pydantic data model for the response schema representing the activity of a disk device.
+
+    Attributes:
+        device (str): The name of the device.
+        read_bytes (float): Bytes read per second.
+        write_bytes (float): Bytes written per second.
+        read_ops (float): Read operations per second.
+        write_ops (float): Write operations per second.
+    """
+
+    device: str
+    read_bytes: float
+    write_bytes: float
+    read_ops: float
+    write_ops: float
+
+
+class MountUsageSchema(BaseModel):
+    """
+    Pydantic data model for the usage of a mounted filesystem, sizes in bytes.
+
+    Attributes:
+        mountpoint (str): The path the filesystem is mounted on.
+        device (str): The mounted device.
+        fstype (str): The filesystem type.
+        total (int): Total size.
+        used (int): Used size.
+        free (int): Size available to unprivileged users.
+        percent (float): Usage percentage.
+    """
+
+    mountpoint: str
+    device: str
+    fstype: str
+    total: int
+    used: int
+    free: int
+    percent: float
+
+
+class GetDiskUsageResponseSchema(BaseModel):
+    """
+    Pydantic data model for the response schema representing the filesystem usage.
+
+    Attributes:
+        mounts (List[MountUsageSchema]): Usage of each filesystem that answered in time.
+        unavailable (List[str]): Mount points that did not answer in time or failed.
+    """
+
+    mounts: List[MountUsageSchema]
+    unavailable: List[str]
@@ -0,0 +1,43 @@
+"""
+This module defines response schemas for metric histories.
+"""
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel
+
+
+class HistoryBucketSchema(BaseModel):
+    """
+    Pydantic data model for downsampled samples of a metric history.
+
+    Attributes:
+        timestamp (datetime): Time of the first sample of the bucket.
+        min (List[float]): Smallest value of each series.
+        max (List[float]): Largest value of each series.
+        avg (List[float]): Mean value of each series.
+        p95 (List[float]): 95th percentile of each series, for buckets merging several
+                           rollup buckets the largest of their percentiles.
+    """
+
+    timestamp: datetime
+    min: List[float]
+    max: List[float]
+    avg: List[float]
+    p95: List[float]
+
+
+class GetHistoryResponseSchema(BaseModel):
+    """
+    Pydantic data model for the response schema representing a metric history.
+
+    Attributes:
+        series (List[str]): Names of the series, in the order of the bucket values.
+        tier (str): Tier the buckets were computed from, "raw" for the raw samples, "1m" or
+                    "1h" for the rollups.
+        buckets (List[HistoryBucketSchema]): Downsampled samples, oldest first.
+    """
+
+    series: List[str]
+    tier: str
+    buckets: List[HistoryBucketSchema]
@@ -3,7 +3,7 @@ This module defines response schemas for log-related data.
 """
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 
 class LogEntrySchema(BaseModel):
@@ -15,6 +15,25 @@ class LogEntrySchema(BaseModel):
     user_agent: str
 
 
+class ErrorLogEntrySchema(BaseModel):
+    """Schema for individual error log entries."""
+    timestamp: datetime
+    severity: str
+    module: str
+    pid: Optional[int]
+    client: str
+    message: str
+
+
+class ErrorLogMetricsSchema(BaseModel):
+    """Schema for aggregated error log metrics."""
+    total_entries: int
+    severities: Dict[str, int]
+    modules: Dict[str, int]
+    top_messages: List[Dict[str, str | int]]
+    recent_entries: List[ErrorLogEntrySchema]
+
+
 class LogMetricsSchema(BaseModel):
     """Schema for aggregated log metrics."""
     total_requests: int
@@ -22,4 +41,5 @@ class LogMetricsSchema(BaseModel):
     error_count: int
     status_codes: Dict[str, int]
     top_urls: List[Dict[str, str | int]]
-    recent_errors: List[LogEntrySchema]
\ No newline at end of file
+    recent_errors: List[LogEntrySchema]
+    error_log: Optional[ErrorLogMetricsSchema] = None
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""
+This module defines data transfer models for network-related response schemas.
+"""
+from pydantic import BaseModel
+
+
+class GetNetResponseSchema(BaseModel):
+    """
+    Pydantic data model for the response schema representing the throughput of a network
+    interface, per second.
+
+    Attributes:
+        interface (str): The name of the interface.
+        rx_bytes (float): Bytes received per second.
+        tx_bytes (float): Bytes sent per second.
+        rx_packets (float): Packets received per second.
+        tx_packets (float): Packets sent per second.
+        rx_errors (float): Receive errors per second.
+        tx_errors (float): Transmit errors per second.
+        rx_drops (float): Incoming packets dropped per second.
+        tx_drops (float): Outgoing packets dropped per second.
+    """
+
+    interface: str
+    rx_bytes: float
+    tx_bytes: float
+    rx_packets: float
+    tx_packets: float
+    rx_errors: float
+    tx_errors: float
+    rx_drops: float
+    tx_drops: float
@@ -0,0 +1,39 @@
+"""
+This module defines data transfer models for pressure-related response schemas.
+"""
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PressureStallSchema(BaseModel):
+    """
+    Pydantic data model for the stall of the tasks on a resource.
+
+    Attributes:
+        avg10 (float): Percentage of the time stalled over the last 10 seconds.
+        avg60 (float): Percentage of the time stalled over the last 60 seconds.
+        avg300 (float): Percentage of the time stalled over the last 300 seconds.
+        stall_usec (int): Time stalled since the previous collection, in microseconds.
+    """
+
+    avg10: float
+    avg60: float
+    avg300: float
+    stall_usec: int
+
+
+class GetPressureResponseSchema(BaseModel):
+    """
+    Pydantic data model for the response schema representing the pressure of a resource.
+
+    Attributes:
+        resource (str): The name of the resource, "cpu", "memory" or "io".
+        some (PressureStallSchema): Stall of at least one task.
+        full (Optional[PressureStallSchema]): Stall of all the non-idle tasks at once, null
+                                              for the CPU on kernels older than 5.13.
+    """
+
+    resource: str
+    some: PressureStallSchema
+    full: Optional[PressureStallSchema]
@@ -0,0 +1,40 @@
+"""
+This module defines data transfer models for process-related response schemas.
+"""
+from typing import List
+
+from pydantic import BaseModel
+
+
+class ProcessUsageSchema(BaseModel):
+    """
+    Pydantic data model for the resource usage of a process.
+
+    Attributes:
+        pid (int): The process ID.
+        name (str): The process name.
+        cpu_percent (float): CPU usage since the previous collection, over 100 when the
+                             process uses more than one core.
+        rss (int): Resident memory in bytes.
+    """
+
+    pid: int
+    name: str
+    cpu_percent: float
+    rss: int
+
+
+class GetTopProcessesResponseSchema(BaseModel):
+    """
+    Pydantic data model for the response schema representing the top processes.
+
+    Attributes:
+        count (int): Number of processes read.
+        by_cpu (List[ProcessUsageSchema]): Processes using the most CPU, highest first.
+        by_memory (List[ProcessUsageSchema]): Processes using the most resident memory,
+                                              highest first.
+    """
+
+    count: int
+    by_cpu: List[ProcessUsageSchema]
+    by_memory: List[ProcessUsageSchema]
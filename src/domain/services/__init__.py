@@ -1,9 +1,15 @@
 from .cpuservice import CpuService
 from .ramservice import RamService
 from .logservice import LogService
+from .historyservice import HistoryService
+from .snapshotservice import SnapshotService
+from .openmetricsservice import OpenMetricsService
 
 __all__ = [
     "CpuService",
     "RamService",
     "LogService",
+    "HistoryService",
+    "SnapshotService",
+    "OpenMetricsService",
 ]
\ No newline at end of file
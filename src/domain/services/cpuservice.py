@@ -4,6 +4,7 @@ This module defines a controller class for fetching CPU values from a monitoring
 from typing import List
 from domain.models import Cpu
 from monitor import MonitorTask
+from monitor.monitor import HOST_VIEW, VIEW_COLLECTORS
 
 
 # Controller class to fetch cpu values from monitoring task
@@ -15,18 +16,26 @@ class CpuService:
     def __init__(self):
         ...
 
-    async def get_cpu(self, monitor_task: MonitorTask) -> List[Cpu]:
+    async def get_cpu(self, monitor_task: MonitorTask, view: str = HOST_VIEW) -> List[Cpu]:
         """
         Get CPU values from the provided monitoring task and return them as a list of Cpu objects.
 
+        Values are read from the latest snapshot of the CPU collector of the view, the list is
+        empty until its first collection. The host view has one value per core, the container
+        view a single value relative to the CPU quota of the container.
+
         Args:
             monitor_task (MonitorTask): The monitoring task to fetch CPU data from.
+            view (str): View of the metrics, "host" or "container".
 
         Returns:
             List[Cpu]: A list of Cpu objects containing CPU values.
         """
+        snapshot = monitor_task.registry.latest(VIEW_COLLECTORS[view][0])
         cpulist = []
-        for core, usage in enumerate(monitor_task.cpu_percent):
+        if snapshot is None:
+            return cpulist
+        for core, usage in enumerate(snapshot.percent):
             cpulist.append(Cpu(id=core, usage=str(usage)))
         return cpulist
 
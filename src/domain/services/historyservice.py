@@ -0,0 +1,65 @@
+"""
+This module defines a service class for querying the metric histories of a monitoring task.
+"""
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from domain.schemas import GetHistoryResponseSchema, HistoryBucketSchema
+from monitor.history import MetricHistory
+
+
+class HistoryService:
+    """
+    Service class to downsample a metric history over a time range.
+    """
+
+    def __init__(self):
+        ...
+
+    async def get_history(
+        self,
+        history: MetricHistory,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        points: int = 300,
+    ) -> GetHistoryResponseSchema:
+        """
+        Summarize the samples of a time range into min/max/avg/p95 buckets, from the
+        coarsest tier of the history with a bucket per point. The samples are summarized
+        in a thread, not to block the event loop.
+
+        Args:
+            history (MetricHistory): The history to query.
+            since (Optional[datetime]): Start of the range, None for the oldest sample.
+            until (Optional[datetime]): End of the range, None for the newest sample.
+            points (int): Maximum number of buckets.
+
+        Returns:
+            GetHistoryResponseSchema: Series names and buckets, oldest first.
+        """
+        # Naive times are local times, as for datetime.timestamp()
+        tier, buckets = await asyncio.to_thread(
+            history.query,
+            None if since is None else since.timestamp(),
+            None if until is None else until.timestamp(),
+            points,
+        )
+        return GetHistoryResponseSchema(
+            series=history.series,
+            tier=tier,
+            buckets=[
+                HistoryBucketSchema(
+                    timestamp=bucket.timestamp,
+                    min=bucket.minimum,
+                    max=bucket.maximum,
+                    avg=bucket.average,
+                    p95=bucket.p95,
+                )
+                for bucket in buckets
+            ],
+        )
+
+    def __str__(self):
+        return self.__class__.__name__
+
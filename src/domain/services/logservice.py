@@ -1,21 +1,82 @@
 """Module providing log analysis and metrics collection functionality."""
+import asyncio
+import logging
 import os
-from collections import Counter
+import threading
 from datetime import datetime
-from typing import Dict, List
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional
 
-import apache_log_parser
-from domain.schemas import LogEntrySchema, LogMetricsSchema
+from domain.schemas import (
+    ErrorLogEntrySchema,
+    ErrorLogMetricsSchema,
+    LogEntrySchema,
+    LogMetricsSchema,
+)
+from monitor.log_errors import ErrorLogAggregate, parse_error_line
+from monitor.log_index import INDEX_STRIDE, TimestampIndex, private_index_dir, to_log_time
+from monitor.log_ingest import LogAggregate, LogIngestor, add_line, ingest_range
+from monitor.log_parallel import PARALLEL_MIN_SIZE, ParallelLogAnalyzer
+from monitor.log_parser import COMBINED_FORMAT, LogParser, LogRecord
+from monitor.log_scan import RANGE_READERS, TEXT_MODE
+from monitor.log_segments import SegmentCache, analyze_segment, find_segments, open_segment
+
+# Number of bytes read per step of an entry stream
+STREAM_READ_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
 
 
 class LogService:
-    """Service class for analyzing log data and generating metrics."""
+    """
+    Service class for analyzing log data and generating metrics.
 
-    def __init__(self) -> None:
-        """Initialize the log service with configured parser."""
-        self.line_parser = apache_log_parser.make_parser(
-            "%h %l %u %t \"%r\" %>s %b \"%{Referer}i\" \"%{User-agent}i\""
-        )
+    The service keeps one `LogIngestor` per log file, so a long-lived instance only parses
+    the lines appended between two calls. With several workers, the first analysis of a
+    large log file is split across worker processes. Log files are read as text, or
+    memory-mapped and scanned as bytes in the "mmap" scan mode. A sparse timestamp index is
+    kept along each log file so that time-range queries only read the relevant bytes.
+    Rotated segments of a log file are analyzed once and their aggregates cached. The error
+    log is tailed the same way as the access log.
+    """
+
+    def __init__(
+        self,
+        workers: int = 0,
+        parallel_min_size: int = PARALLEL_MIN_SIZE,
+        scan_mode: str = TEXT_MODE,
+        index_dir: Optional[str] = None,
+        index_stride: int = INDEX_STRIDE,
+    ) -> None:
+        """
+        Initialize the log service with configured parser.
+
+        Args:
+            workers: Number of worker processes for cold analyses, 0 or 1 to stay serial
+            parallel_min_size: Smaller log files are always analyzed serially
+            scan_mode: How log files are read, "text" or "mmap"
+            index_dir: Directory the timestamp indexes are saved in, created private to the
+                       user running the agent on first use, None to keep them in memory only
+            index_stride: Distance in bytes between two samples of a timestamp index
+
+        Raises:
+            ValueError: If the scan mode is unknown
+        """
+        if scan_mode not in RANGE_READERS:
+            raise ValueError(f"Unknown log scan mode: {scan_mode}")
+        self.scan_mode = scan_mode
+        self.index_dir = index_dir
+        self._index_dir_checked = False
+        self.index_stride = index_stride
+        self.line_parser = LogParser(COMBINED_FORMAT)
+        self._ingestors: Dict[str, LogIngestor] = {}
+        self._error_ingestors: Dict[str, LogIngestor] = {}
+        self._ingestors_lock = threading.Lock()
+        self._segments = SegmentCache(self.line_parser)
+        self._parallel: Optional[ParallelLogAnalyzer] = None
+        if workers > 1:
+            self._parallel = ParallelLogAnalyzer(
+                COMBINED_FORMAT, workers, parallel_min_size, scan_mode
+            )
 
     def parse_log_entry(self, line: str) -> LogEntrySchema:
         """
@@ -31,26 +92,50 @@ class LogService:
             Exception: If parsing fails
         """
         try:
-            parsed = self.line_parser(line)
-            return LogEntrySchema(
-                timestamp=parsed["time_received_datetimeobj"],
-                ip=parsed["remote_host"],
-                url=parsed["request_url"],
-                status_code=int(parsed["status"]),
-                user_agent=parsed["request_header_user_agent"],
-            )
+            return self._to_schema(self.line_parser.parse(line))
         except Exception as exc:
             raise ValueError(f"Error parsing log line: {exc}") from exc
 
+    @staticmethod
+    def _to_schema(record: LogRecord) -> LogEntrySchema:
+        """
+        Convert a parsed log record into its response schema.
+
+        Args:
+            record: Parsed log record
+
+        Returns:
+            LogEntrySchema: Structured log entry data
+        """
+        return LogEntrySchema(
+            timestamp=record.timestamp,
+            ip=record.ip,
+            url=record.url,
+            status_code=record.status_code,
+            user_agent=record.user_agent,
+        )
+
     async def get_log_metrics(
-        self, access_log_path: str, error_log_path: str
+        self,
+        access_log_path: str,
+        error_log_path: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        segments_glob: Optional[str] = None,
     ) -> LogMetricsSchema:
         """
         Analyze log files and generate comprehensive metrics.
 
+        Times are compared with the timestamps as written in the log, timezone-aware
+        times being converted to UTC first.
+
         Args:
             access_log_path: Path to the access log file
             error_log_path: Path to the error log file
+            since: Only count requests received at or after this time
+            until: Only count requests received at or before this time
+            segments_glob: Glob matching the rotated segments of the access log, which are
+                           analyzed before the access log itself
 
         Returns:
             LogMetricsSchema: Aggregated metrics including request counts,
@@ -60,19 +145,276 @@ class LogService:
             FileNotFoundError: If log file is not accessible
             IOError: If reading log file fails
         """
-        entries: List[LogEntrySchema] = []
-        status_counter = Counter()
-        url_counter: Counter = Counter()
-
-        if not os.path.exists(access_log_path):
+        has_access_log = bool(segments_glob) or os.path.exists(access_log_path)
+        has_error_log = bool(error_log_path) and os.path.exists(error_log_path)
+        if not has_access_log and not has_error_log:
             return self._create_empty_metrics()
 
+        since, until = to_log_time(since), to_log_time(until)
         try:
-            entries = self._process_log_file(access_log_path, status_counter, url_counter)
-            return self._calculate_metrics(entries, status_counter, url_counter)
+            aggregate = LogAggregate()
+            if has_access_log:
+                aggregate = await asyncio.to_thread(
+                    self._get_aggregate, access_log_path, segments_glob, since, until
+                )
+            error_aggregate = None
+            if has_error_log:
+                error_aggregate = await asyncio.to_thread(
+                    self._get_error_aggregate, error_log_path, since, until
+                )
+            return self._calculate_metrics(aggregate, error_aggregate)
         except Exception as exc:
             raise IOError(f"Error analyzing logs: {exc}") from exc
 
+    def _private_index_dir(self) -> Optional[str]:
+        """
+        Get the directory of the saved indexes, created private on first use.
+
+        The indexes are only an optimization: when the directory cannot be created or is
+        not private to the user running the agent, they are kept in memory only.
+
+        Returns:
+            Optional[str]: Absolute path of the directory, None to keep the indexes in memory
+        """
+        if not self._index_dir_checked and self.index_dir is not None:
+            self._index_dir_checked = True
+            try:
+                self.index_dir = private_index_dir(self.index_dir)
+            except OSError as exc:
+                logger.warning("Log indexes kept in memory only: %s", exc)
+                self.index_dir = None
+        return self.index_dir
+
+    def get_ingestor(self, log_path: str) -> LogIngestor:
+        """
+        Get the ingestor tailing a log file, creating it on first use.
+
+        Args:
+            log_path: Path to the log file
+
+        Returns:
+            LogIngestor: Ingestor keeping the aggregates of the log file
+        """
+        with self._ingestors_lock:
+            ingestor = self._ingestors.get(log_path)
+            if ingestor is None:
+                ingestor = LogIngestor(
+                    log_path,
+                    self.line_parser,
+                    bulk=self._parallel.analyze if self._parallel else None,
+                    reader=RANGE_READERS[self.scan_mode],
+                    index=TimestampIndex.for_log(
+                        self._private_index_dir(), log_path, stride=self.index_stride
+                    ),
+                )
+                self._ingestors[log_path] = ingestor
+            return ingestor
+
+    def get_error_ingestor(self, log_path: str) -> LogIngestor:
+        """
+        Get the ingestor tailing an error log file, creating it on first use.
+
+        Args:
+            log_path: Path to the error log file
+
+        Returns:
+            LogIngestor: Ingestor of the error log file
+        """
+        with self._ingestors_lock:
+            ingestor = self._error_ingestors.get(log_path)
+            if ingestor is None:
+                ingestor = LogIngestor(
+                    log_path, parse_error_line, aggregate_factory=ErrorLogAggregate
+                )
+                self._error_ingestors[log_path] = ingestor
+            return ingestor
+
+    def _get_error_aggregate(
+        self, log_path: str, since: Optional[datetime], until: Optional[datetime]
+    ) -> ErrorLogAggregate:
+        """
+        Aggregate the entries of an error log file logged in a time range.
+
+        Without time range the file is tailed, otherwise it is read entirely.
+
+        Args:
+            log_path: Path to the error log file
+            since: Naive start time as written in the log, None for no lower bound
+            until: Naive end time as written in the log, None for no upper bound
+
+        Returns:
+            ErrorLogAggregate: Aggregates over the entries of the time range
+        """
+        if since is None and until is None:
+            return self.get_error_ingestor(log_path).poll()
+        aggregate = ErrorLogAggregate()
+        parse = _time_filter(parse_error_line, since, until)
+        with open(log_path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            offset, partial = ingest_range(file, 0, size, parse, aggregate)
+            if partial.strip():
+                add_line(aggregate, parse, partial, offset - len(partial))
+        return aggregate
+
+    def _get_aggregate(
+        self,
+        log_path: str,
+        segments_glob: Optional[str],
+        since: Optional[datetime],
+        until: Optional[datetime],
+    ) -> LogAggregate:
+        """
+        Aggregate the requests of a log file and of its rotated segments.
+
+        Cached segment aggregates are used for the segments entirely inside the time range,
+        and segments entirely outside of it are skipped.
+
+        Args:
+            log_path: Path to the live log file
+            segments_glob: Glob matching the rotated segments, None for the live file only
+            since: Naive start time as written in the log, None for no lower bound
+            until: Naive end time as written in the log, None for no upper bound
+
+        Returns:
+            LogAggregate: Aggregates over the requests of the time range
+        """
+        aggregate = LogAggregate()
+        length = 0
+        segments = find_segments(segments_glob, log_path) if segments_glob else []
+        if segments:
+            self._segments.prune()
+        for path in segments:
+            try:
+                summary = self._segments.get(path)
+            except FileNotFoundError:
+                continue
+            if summary.first is None or (since is not None and summary.last < since) or (
+                until is not None and summary.first > until
+            ):
+                pass
+            elif (since is None or summary.first >= since) and (
+                until is None or summary.last <= until
+            ):
+                aggregate.merge(summary.aggregate, length)
+            else:
+                parse = _time_filter(self.line_parser, since, until)
+                aggregate.merge(analyze_segment(path, parse).aggregate, length)
+            length += summary.length
+        if not os.path.exists(log_path):
+            return aggregate
+        if since is None and until is None:
+            live = self.get_ingestor(log_path).poll()
+        else:
+            live = self._get_window(log_path, since, until)
+        if not segments:
+            return live
+        aggregate.merge(live, length)
+        return aggregate
+
+    def _get_window(
+        self, log_path: str, since: Optional[datetime], until: Optional[datetime]
+    ) -> LogAggregate:
+        """
+        Aggregate the requests of a log file received in a time range.
+
+        Only the byte range the timestamp index points to is read.
+
+        Args:
+            log_path: Path to the log file
+            since: Naive start time as written in the log, None for no lower bound
+            until: Naive end time as written in the log, None for no upper bound
+
+        Returns:
+            LogAggregate: Aggregates over the requests of the time range
+        """
+        ingestor = self.get_ingestor(log_path)
+        # Polling brings the index up to date with the appended bytes
+        ingestor.poll()
+        start, end = ingestor.index.window(since, until)
+        aggregate = LogAggregate()
+        parse = _time_filter(self.line_parser, since, until)
+        with open(log_path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            offset, partial = ingest_range(
+                file, start, size if end is None else min(end, size), parse, aggregate
+            )
+            if offset == size and partial.strip():
+                add_line(aggregate, parse, partial, offset - len(partial))
+        return aggregate
+
+    def stream_log_entries(
+        self,
+        access_log_path: str,
+        status_class: Optional[int] = None,
+        ip: Optional[str] = None,
+        url_prefix: Optional[str] = None,
+        segments_glob: Optional[str] = None,
+    ) -> Iterator[bytes]:
+        """
+        Stream the parsed entries of a log file as NDJSON, in file order.
+
+        The file is read in blocks of `STREAM_READ_SIZE` bytes and each block yields the
+        matching entries it holds, possibly none. Memory use does not depend on the file
+        size, and a consumer that stops iterating stops the reading of the file.
+
+        Args:
+            access_log_path: Path to the access log file
+            status_class: Only stream entries with a status code in this class, 4 for 4xx
+            ip: Only stream entries of this client IP
+            url_prefix: Only stream entries whose URL starts with this prefix
+            segments_glob: Glob matching the rotated segments of the access log, which are
+                           streamed before the access log itself
+
+        Yields:
+            bytes: JSON encoded `LogEntrySchema` entries, one per line
+        """
+        paths = find_segments(segments_glob, access_log_path) if segments_glob else []
+        if os.path.exists(access_log_path):
+            paths.append(access_log_path)
+        for path in paths:
+            try:
+                file = open_segment(path)
+            except FileNotFoundError:
+                continue
+            with file:
+                yield from self._stream_file(file, status_class, ip, url_prefix)
+
+    def _stream_file(
+        self,
+        file: BinaryIO,
+        status_class: Optional[int],
+        ip: Optional[str],
+        url_prefix: Optional[str],
+    ) -> Iterator[bytes]:
+        """Stream the matching entries of an open log file, see `stream_log_entries`."""
+        parse = self.line_parser.parse
+        partial = b""
+        while True:
+            block = file.read(STREAM_READ_SIZE)
+            lines = (partial + block).split(b"\n")
+            partial = lines.pop() if block else b""
+            entries = []
+            for line in lines:
+                try:
+                    record = parse(line.decode("utf-8", errors="replace").strip())
+                except ValueError:
+                    continue
+                if (
+                    (status_class is None or record.status_code // 100 == status_class)
+                    and (ip is None or record.ip == ip)
+                    and (url_prefix is None or record.url.startswith(url_prefix))
+                ):
+                    entries.append(self._to_schema(record).model_dump_json() + "\n")
+            # Yielding empty blocks too gives the consumer a chance to stop early
+            yield "".join(entries).encode()
+            if not block:
+                return
+
+    def close(self) -> None:
+        """Release the worker processes, if any."""
+        if self._parallel is not None:
+            self._parallel.close()
+
     def _create_empty_metrics(self) -> LogMetricsSchema:
         """
         Create empty metrics when no log file is available.
@@ -89,62 +431,71 @@ class LogService:
             recent_errors=[],
         )
 
-    def _process_log_file(
-        self, log_path: str, status_counter: Counter, url_counter: Counter
-    ) -> List[LogEntrySchema]:
+    def _calculate_metrics(
+        self, aggregate: LogAggregate, error_aggregate: Optional[ErrorLogAggregate] = None
+    ) -> LogMetricsSchema:
         """
-        Process log file and update counters.
+        Calculate final metrics from aggregated log data.
 
         Args:
-            log_path: Path to the log file
-            status_counter: Counter for HTTP status codes
-            url_counter: Counter for URLs
+            aggregate: Aggregates over the processed log entries
+            error_aggregate: Aggregates over the processed error log entries, if any
 
         Returns:
-            List[LogEntrySchema]: List of processed log entries
+            LogMetricsSchema: Calculated metrics
         """
-        entries = []
-        with open(log_path, "r", encoding="utf-8") as file:
-            for line in file:
-                try:
-                    entry = self.parse_log_entry(line.strip())
-                    entries.append(entry)
-                    status_counter[str(entry.status_code)] += 1
-                    url_counter[entry.url] += 1
-                except ValueError:
-                    continue
-        return entries
+        return LogMetricsSchema(
+            total_requests=aggregate.total,
+            success_count=aggregate.success_count,
+            error_count=aggregate.error_count,
+            status_codes=dict(aggregate.status_counter),
+            top_urls=[
+                {"url": url, "count": count}
+                for url, count in aggregate.top_urls(5)
+            ],
+            recent_errors=[self._to_schema(e) for e in aggregate.recent_errors()],
+            error_log=(
+                None if error_aggregate is None
+                else self._calculate_error_metrics(error_aggregate)
+            ),
+        )
 
-    def _calculate_metrics(
-        self,
-        entries: List[LogEntrySchema],
-        status_counter: Counter,
-        url_counter: Counter,
-    ) -> LogMetricsSchema:
+    @staticmethod
+    def _calculate_error_metrics(aggregate: ErrorLogAggregate) -> ErrorLogMetricsSchema:
         """
-        Calculate final metrics from processed log data.
+        Calculate final metrics from aggregated error log data.
 
         Args:
-            entries: List of processed log entries
-            status_counter: Counter with status code frequencies
-            url_counter: Counter with URL frequencies
+            aggregate: Aggregates over the processed error log entries
 
         Returns:
-            LogMetricsSchema: Calculated metrics
+            ErrorLogMetricsSchema: Calculated metrics
         """
-        error_entries = [e for e in entries if e.status_code >= 400]
-        recent_errors = sorted(
-            error_entries, key=lambda x: x.timestamp, reverse=True
-        )[:10]
-
-        return LogMetricsSchema(
-            total_requests=len(entries),
-            success_count=sum(1 for e in entries if e.status_code < 400),
-            error_count=len(error_entries),
-            status_codes=dict(status_counter),
-            top_urls=[
-                {"url": url, "count": count}
-                for url, count in url_counter.most_common(5)
+        return ErrorLogMetricsSchema(
+            total_entries=aggregate.total,
+            severities=dict(aggregate.severity_counter),
+            modules=dict(aggregate.module_counter),
+            top_messages=[
+                {"message": message, "count": count}
+                for message, count in aggregate.top_messages(5)
+            ],
+            recent_entries=[
+                ErrorLogEntrySchema(**entry._asdict()) for entry in aggregate.recent_entries()
             ],
-            recent_errors=recent_errors,
-        )
\ No newline at end of file
+        )
+
+
+def _time_filter(
+    parse: Callable[[str], Any], since: Optional[datetime], until: Optional[datetime]
+) -> Callable[[str], Any]:
+    """Wrap a line parser so that it rejects records outside of a time range."""
+
+    def parse_in_range(line: str) -> Any:
+        record = parse(line)
+        if (since is not None and record.timestamp < since) or (
+            until is not None and record.timestamp > until
+        ):
+            raise ValueError("Log record out of the time range")
+        return record
+
+    return parse_in_range
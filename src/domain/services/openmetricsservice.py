@@ -0,0 +1,132 @@
+"""
+This module defines a service class for exposing the metrics in the OpenMetrics format.
+"""
+import asyncio
+from typing import List, Optional
+
+import psutil
+
+from domain.services.logservice import LogService
+from monitor import MonitorTask
+from monitor.collectors import CPU_COLLECTOR, RAM_COLLECTOR
+from monitor.log_ingest import LogAggregate
+from monitor.openmetrics import Exposition, MetricFamily, render_openmetrics
+
+# Bytes per MB, the unit of the RAM snapshots
+_MB = 1024 * 1024
+
+
+class OpenMetricsService:
+    """
+    Service class to render the system, log and agent metrics for Prometheus.
+    """
+
+    def __init__(self):
+        ...
+
+    async def get_exposition(
+        self,
+        monitor_task: MonitorTask,
+        log_service: LogService,
+        access_log_path: str,
+        version: str,
+    ) -> Exposition:
+        """
+        Get the exposition text of the latest metrics.
+
+        The text is rendered again only when a collector published a new snapshot or when
+        requests were appended to the access log. The access log is polled in a thread, as
+        the first poll ingests the whole log.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch system metrics from.
+            log_service (LogService): The service tailing the access log.
+            access_log_path (str): Path to the access log file.
+            version (str): Version of the agent.
+
+        Returns:
+            Exposition: The exposition text and its gzip encoding.
+        """
+        aggregate = await asyncio.to_thread(self._poll, log_service, access_log_path)
+        key = (monitor_task.registry.version, None if aggregate is None else aggregate.total)
+        return monitor_task.exposition.get(
+            key, lambda: render_openmetrics(self._families(monitor_task, aggregate, version))
+        )
+
+    @staticmethod
+    def _poll(log_service: LogService, access_log_path: str) -> Optional[LogAggregate]:
+        """Ingest the requests appended to the access log, None if there is no log."""
+        try:
+            return log_service.get_ingestor(access_log_path).poll()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _families(
+        monitor_task: MonitorTask, aggregate: Optional[LogAggregate], version: str
+    ) -> List[MetricFamily]:
+        """Build the metrics of the latest snapshots, log aggregate and agent process."""
+        families = [MetricFamily("agent_build", "info", "Agent build information.").add(
+            1, version=version
+        )]
+        cpu = monitor_task.registry.latest(CPU_COLLECTOR)
+        if cpu is not None:
+            usage = MetricFamily("agent_cpu_usage_percent", "gauge", "CPU usage per logical core.")
+            for core, percent in enumerate(cpu.percent):
+                usage.add(float(percent), core=str(core))
+            families.append(usage)
+        ram = monitor_task.registry.latest(RAM_COLLECTOR)
+        if ram is not None:
+            families.append(MetricFamily(
+                "agent_memory_usage_percent", "gauge", "Total RAM usage percentage."
+            ).add(float(ram.percent)))
+            for field in ("total", "available", "used", "free"):
+                families.append(MetricFamily(
+                    f"agent_memory_{field}_bytes", "gauge", f"{field.capitalize()} RAM.", "bytes"
+                ).add(getattr(ram, field) * _MB))
+        if aggregate is not None:
+            requests = MetricFamily(
+                "agent_http_requests", "counter", "Requests of the access log per status code."
+            )
+            for status_code, count in sorted(aggregate.status_counter.items()):
+                requests.add(count, code=status_code)
+            families.append(requests)
+        families.extend(OpenMetricsService._collector_families(monitor_task))
+        process = psutil.Process()
+        with process.oneshot():
+            cpu_times = process.cpu_times()
+            families.append(MetricFamily(
+                "agent_process_cpu_seconds", "counter", "CPU time of the agent process.",
+                "seconds",
+            ).add(cpu_times.user + cpu_times.system))
+            families.append(MetricFamily(
+                "agent_process_resident_memory_bytes", "gauge",
+                "Resident memory of the agent process.", "bytes",
+            ).add(process.memory_info().rss))
+        return families
+
+    @staticmethod
+    def _collector_families(monitor_task: MonitorTask) -> List[MetricFamily]:
+        """Build the timing metrics of the collectors."""
+        runs = MetricFamily("agent_collector_runs", "counter", "Collections per collector.")
+        failures = MetricFamily(
+            "agent_collector_failures", "counter", "Failed collections per collector."
+        )
+        overruns = MetricFamily(
+            "agent_collector_overruns", "counter",
+            "Collections ending after the next one was due, per collector.",
+        )
+        duration = MetricFamily(
+            "agent_collector_duration_seconds", "counter",
+            "Time spent collecting, per collector.", "seconds",
+        )
+        for collector in monitor_task.registry.collectors():
+            stats = monitor_task.registry.stats(collector.name)
+            runs.add(stats.runs, collector=collector.name)
+            failures.add(stats.failures, collector=collector.name)
+            overruns.add(stats.overruns, collector=collector.name)
+            duration.add(stats.total_duration, collector=collector.name)
+        return [runs, failures, overruns, duration]
+
+    def __str__(self):
+        return self.__class__.__name__
@@ -4,6 +4,7 @@ This module defines a service class for fetching RAM values from a monitoring ta
 from typing import List
 from domain.models import Ram
 from monitor import MonitorTask
+from monitor.monitor import HOST_VIEW, VIEW_COLLECTORS
 
 
 class RamService:
@@ -14,18 +15,25 @@ class RamService:
     def __init__(self):
         ...
 
-    async def get_ram(self, monitor_task: MonitorTask) -> List[Ram]:
+    async def get_ram(self, monitor_task: MonitorTask, view: str = HOST_VIEW) -> List[Ram]:
         """
         Get RAM values from the provided monitoring task and return them as a list of Ram objects.
 
+        Values are read from the latest snapshot of the RAM collector of the view, the list is
+        empty until its first collection. The container view is relative to the memory limit
+        of the container.
+
         Args:
             monitor_task (MonitorTask): The monitoring task to fetch RAM data from.
+            view (str): View of the metrics, "host" or "container".
 
         Returns:
             List[Ram]: A list of Ram objects containing RAM values.
         """
+        snapshot = monitor_task.registry.latest(VIEW_COLLECTORS[view][1])
         ramlist = []
-        ramlist.append(Ram(id=0, usage=str(monitor_task.ram_percent)))
+        if snapshot is not None:
+            ramlist.append(Ram(id=0, usage=str(snapshot.percent)))
         return ramlist
 
     def __str__(self):
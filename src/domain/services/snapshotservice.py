@@ -0,0 +1,433 @@
+"""
+This module defines a service class for fetching pre-encoded metric responses from a
+monitoring task.
+"""
+import json
+from statistics import mean
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from domain.schemas import (
+    GetCpuResponseSchema,
+    GetCpuTimesResponseSchema,
+    GetDiskIoResponseSchema,
+    GetDiskUsageResponseSchema,
+    GetNetResponseSchema,
+    GetPressureResponseSchema,
+    GetRamInfoResponseSchema,
+    GetRamResponseSchema,
+    GetTopProcessesResponseSchema,
+)
+from monitor import MonitorTask
+from monitor.broadcast import Subscription
+from monitor.collectors import (
+    CPU_COLLECTOR,
+    CPU_TIMES_COLLECTOR,
+    DISK_IO_COLLECTOR,
+    DISK_USAGE_COLLECTOR,
+    NET_COLLECTOR,
+    PROCESS_COLLECTOR,
+    RAM_COLLECTOR,
+)
+from monitor.monitor import (
+    EMPTY_RAM_SNAPSHOT,
+    HOST_VIEW,
+    PRESSURE_VIEW_COLLECTORS,
+    VIEW_COLLECTORS,
+)
+from monitor.snapshots import EncodedSnapshot
+
+
+def _dumps(content: Any) -> bytes:
+    """Encode JSON content as FastAPI's JSONResponse does."""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def encode_cpu_usage(snapshot: Any) -> bytes:
+    """
+    Encode the usage of each CPU core and their average usage.
+
+    The average only counts the cores with a non-zero usage.
+
+    Args:
+        snapshot: Latest CPU snapshot, None before the first collection
+
+    Returns:
+        bytes: JSON response, empty if there is no CPU data
+    """
+    if snapshot is None or not snapshot.percent:
+        return b""
+    cpu_data = [
+        GetCpuResponseSchema(core=core, usage=round(float(usage or 0.0), 2))
+        for core, usage in enumerate(snapshot.percent)
+    ]
+    valid_usages = [core.usage for core in cpu_data if core.usage > 0]
+    average_usage = round(mean(valid_usages), 2) if valid_usages else 0.0
+    return _dumps({
+        "cpu_usage": [core.model_dump() for core in cpu_data],
+        "average": average_usage,
+    })
+
+
+def encode_cpu_times(snapshot: Any) -> bytes:
+    """
+    Encode the share of each state in the CPU time of each core and of all the cores.
+
+    Args:
+        snapshot: Latest CPU times snapshot, None before the second collection
+
+    Returns:
+        bytes: JSON response, without any core before the second collection
+    """
+    if snapshot is None:
+        return _dumps(GetCpuTimesResponseSchema(cpu_times=[], average={}).model_dump())
+    return _dumps(GetCpuTimesResponseSchema(
+        cpu_times=[
+            {"core": core, "times": dict(zip(snapshot.states, percent))}
+            for core, percent in enumerate(snapshot.percent)
+        ],
+        average=dict(zip(snapshot.states, snapshot.average)),
+    ).model_dump())
+
+
+def encode_ram_usage(snapshot: Any) -> bytes:
+    """
+    Encode the RAM usage percentage.
+
+    Args:
+        snapshot: Latest RAM snapshot, None before the first collection
+
+    Returns:
+        bytes: JSON response, an empty list before the first collection
+    """
+    if snapshot is None:
+        return _dumps([])
+    return _dumps([GetRamResponseSchema(id=0, usage=str(snapshot.percent)).model_dump()])
+
+
+def encode_ram_info(snapshot: Any) -> bytes:
+    """
+    Encode the RAM sizes.
+
+    Args:
+        snapshot: Latest RAM snapshot, None before the first collection
+
+    Returns:
+        bytes: JSON response, zero sizes before the first collection
+    """
+    snapshot = snapshot or EMPTY_RAM_SNAPSHOT
+    return _dumps(GetRamInfoResponseSchema(
+        total=snapshot.total,
+        available=snapshot.available,
+        used=snapshot.used,
+        free=snapshot.free,
+    ).model_dump())
+
+
+def encode_disk_io(snapshot: Any) -> bytes:
+    """
+    Encode the activity of each disk device, sorted by device name.
+
+    Args:
+        snapshot: Latest disk activity snapshot, None before the second collection
+
+    Returns:
+        bytes: JSON response, an empty list before the second collection
+    """
+    if snapshot is None:
+        return _dumps([])
+    return _dumps([
+        GetDiskIoResponseSchema(
+            device=device,
+            read_bytes=round(rates.read_bytes, 2),
+            write_bytes=round(rates.write_bytes, 2),
+            read_ops=round(rates.read_ops, 2),
+            write_ops=round(rates.write_ops, 2),
+        ).model_dump()
+        for device, rates in sorted(snapshot.devices.items())
+    ])
+
+
+def encode_disk_usage(snapshot: Any) -> bytes:
+    """
+    Encode the usage of the mounted filesystems.
+
+    Args:
+        snapshot: Latest filesystem usage snapshot, None before the first collection
+
+    Returns:
+        bytes: JSON response, without any mount before the first collection
+    """
+    if snapshot is None:
+        return _dumps(GetDiskUsageResponseSchema(mounts=[], unavailable=[]).model_dump())
+    return _dumps(GetDiskUsageResponseSchema(
+        mounts=[mount._asdict() for mount in snapshot.mounts],
+        unavailable=snapshot.unavailable,
+    ).model_dump())
+
+
+def encode_net_io(snapshot: Any) -> bytes:
+    """
+    Encode the throughput of each network interface, sorted by interface name.
+
+    Args:
+        snapshot: Latest network throughput snapshot, None before the second collection
+
+    Returns:
+        bytes: JSON response, an empty list before the second collection
+    """
+    if snapshot is None:
+        return _dumps([])
+    return _dumps([
+        GetNetResponseSchema(
+            interface=interface,
+            **{field: round(rate, 2) for field, rate in rates._asdict().items()},
+        ).model_dump()
+        for interface, rates in sorted(snapshot.interfaces.items())
+    ])
+
+
+def encode_pressure(snapshot: Any) -> bytes:
+    """
+    Encode the pressure of each resource.
+
+    Args:
+        snapshot: Latest pressure snapshot, None before the second collection
+
+    Returns:
+        bytes: JSON response, an empty list before the second collection
+    """
+    if snapshot is None:
+        return _dumps([])
+    return _dumps([
+        GetPressureResponseSchema(
+            resource=resource,
+            some=pressure.some._asdict(),
+            full=None if pressure.full is None else pressure.full._asdict(),
+        ).model_dump()
+        for resource, pressure in snapshot.resources.items()
+    ])
+
+
+def encode_top_processes(snapshot: Any) -> bytes:
+    """
+    Encode the processes using the most CPU and resident memory.
+
+    Args:
+        snapshot: Latest top processes snapshot, None before the second collection
+
+    Returns:
+        bytes: JSON response, without any process before the second collection
+    """
+    if snapshot is None:
+        return _dumps(
+            GetTopProcessesResponseSchema(count=0, by_cpu=[], by_memory=[]).model_dump()
+        )
+    return _dumps(GetTopProcessesResponseSchema(
+        count=snapshot.count,
+        by_cpu=[usage._asdict() for usage in snapshot.by_cpu],
+        by_memory=[usage._asdict() for usage in snapshot.by_memory],
+    ).model_dump())
+
+
+def _view_key(view: str, key: str) -> str:
+    """Return the cache key of a response in a view of the metrics."""
+    return key if view == HOST_VIEW else f"{view}/{key}"
+
+
+# Streamed topics, with the key, collector and encoder of their response
+STREAM_TOPICS: Dict[str, Tuple[str, str, Callable[[Any], bytes]]] = {
+    CPU_COLLECTOR: ("cpu/usage", CPU_COLLECTOR, encode_cpu_usage),
+    RAM_COLLECTOR: ("ram/info", RAM_COLLECTOR, encode_ram_info),
+}
+
+
+def _topic_encoder(monitor_task: MonitorTask, topic: str) -> Callable[[], Optional[bytes]]:
+    """Create the encoder of a streamed topic, sharing the encoded responses."""
+    key, collector, encoder = STREAM_TOPICS[topic]
+
+    def encode() -> Optional[bytes]:
+        encoded = monitor_task.snapshots.get(key, collector, encoder)
+        return encoded.body if encoded.version and encoded.body else None
+
+    return encode
+
+
+class SnapshotService:
+    """
+    Service class to fetch metric responses encoded once per collection.
+    """
+
+    def __init__(self):
+        ...
+
+    async def get_cpu_usage(
+        self, monitor_task: MonitorTask, view: str = HOST_VIEW
+    ) -> EncodedSnapshot:
+        """
+        Get the encoded CPU usage of each core and their average usage.
+
+        The container view has a single core, its usage relative to the CPU quota.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch CPU data from.
+            view (str): View of the metrics, "host" or "container".
+
+        Returns:
+            EncodedSnapshot: JSON response, with an empty body if there is no CPU data.
+        """
+        return monitor_task.snapshots.get(
+            _view_key(view, "cpu/usage"), VIEW_COLLECTORS[view][0], encode_cpu_usage
+        )
+
+    async def get_cpu_times(self, monitor_task: MonitorTask) -> EncodedSnapshot:
+        """
+        Get the encoded CPU time breakdown of each core and of all the cores.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch CPU data from.
+
+        Returns:
+            EncodedSnapshot: JSON response.
+        """
+        return monitor_task.snapshots.get("cpu/times", CPU_TIMES_COLLECTOR, encode_cpu_times)
+
+    async def get_ram_usage(
+        self, monitor_task: MonitorTask, view: str = HOST_VIEW
+    ) -> EncodedSnapshot:
+        """
+        Get the encoded RAM usage percentage.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch RAM data from.
+            view (str): View of the metrics, "host" or "container".
+
+        Returns:
+            EncodedSnapshot: JSON response.
+        """
+        return monitor_task.snapshots.get(
+            _view_key(view, "ram/usage"), VIEW_COLLECTORS[view][1], encode_ram_usage
+        )
+
+    async def get_ram_info(
+        self, monitor_task: MonitorTask, view: str = HOST_VIEW
+    ) -> EncodedSnapshot:
+        """
+        Get the encoded RAM sizes.
+
+        The container view reports the memory limit of the container as its total RAM.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch RAM data from.
+            view (str): View of the metrics, "host" or "container".
+
+        Returns:
+            EncodedSnapshot: JSON response.
+        """
+        return monitor_task.snapshots.get(
+            _view_key(view, "ram/info"), VIEW_COLLECTORS[view][1], encode_ram_info
+        )
+
+    async def get_disk_io(self, monitor_task: MonitorTask) -> EncodedSnapshot:
+        """
+        Get the encoded activity of each disk device.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch disk data from.
+
+        Returns:
+            EncodedSnapshot: JSON response.
+        """
+        return monitor_task.snapshots.get("disk/io", DISK_IO_COLLECTOR, encode_disk_io)
+
+    async def get_disk_usage(self, monitor_task: MonitorTask) -> EncodedSnapshot:
+        """
+        Get the encoded usage of the mounted filesystems.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch disk data from.
+
+        Returns:
+            EncodedSnapshot: JSON response.
+        """
+        return monitor_task.snapshots.get(
+            "disk/usage", DISK_USAGE_COLLECTOR, encode_disk_usage
+        )
+
+    async def get_net_io(self, monitor_task: MonitorTask) -> EncodedSnapshot:
+        """
+        Get the encoded throughput of each network interface.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch network data from.
+
+        Returns:
+            EncodedSnapshot: JSON response.
+        """
+        return monitor_task.snapshots.get("net/io", NET_COLLECTOR, encode_net_io)
+
+    async def get_pressure(
+        self, monitor_task: MonitorTask, view: str = HOST_VIEW
+    ) -> EncodedSnapshot:
+        """
+        Get the encoded pressure of the CPU, memory and I/O.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch pressure data from.
+            view (str): View of the metrics, "host" or "container".
+
+        Returns:
+            EncodedSnapshot: JSON response, an empty list without PSI.
+        """
+        return monitor_task.snapshots.get(
+            _view_key(view, "pressure"), PRESSURE_VIEW_COLLECTORS[view], encode_pressure
+        )
+
+    async def get_top_processes(self, monitor_task: MonitorTask) -> EncodedSnapshot:
+        """
+        Get the encoded processes using the most CPU and resident memory.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to fetch process data from.
+
+        Returns:
+            EncodedSnapshot: JSON response.
+        """
+        return monitor_task.snapshots.get(
+            "processes/top", PROCESS_COLLECTOR, encode_top_processes
+        )
+
+    def subscribe(self, monitor_task: MonitorTask, topics: Iterable[str]) -> Subscription:
+        """
+        Subscribe to the new snapshots of some topics, from the event loop of the client.
+
+        Each message carries the same JSON as the matching polling route: "cpu" as
+        /metrics/v1/cpu/usage and "ram" as /metrics/v1/ram/info.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task to stream the snapshots of.
+            topics (Iterable[str]): Topics among `STREAM_TOPICS`.
+
+        Returns:
+            Subscription: Queue of the messages of the topics.
+
+        Raises:
+            KeyError: If a topic is unknown.
+        """
+        return monitor_task.broadcaster.subscribe(
+            {topic: _topic_encoder(monitor_task, topic) for topic in topics}
+        )
+
+    def unsubscribe(self, monitor_task: MonitorTask, subscription: Subscription) -> None:
+        """
+        Stop streaming the snapshots to a subscriber.
+
+        Args:
+            monitor_task (MonitorTask): The monitoring task streaming the snapshots.
+            subscription (Subscription): The subscription to cancel.
+        """
+        monitor_task.broadcaster.unsubscribe(subscription)
+
+    def __str__(self):
+        return self.__class__.__name__
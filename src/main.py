@@ -3,6 +3,8 @@ import os
 import click
 import uvicorn
 from core.config import get_config
+from monitor.adaptive import AdaptiveSampling
+from monitor.shared import SharedSampler
 
 
 # Setup cli parameter for main command (main.py --debug --env local)
@@ -31,13 +33,41 @@ def main(env: str, debug: bool):
     os.environ["AGENT_DEBUG"] = str(debug)
 
     config = get_config()
-    # Start Webserver
+    # The reloader only runs a single worker
+    workers = 1 if config.env == "local" else config.workers
+    if workers > 1:
+        # A single sampler process shares the metrics with all the workers
+        sampling = AdaptiveSampling(
+            floor=config.sampling_floor,
+            ceiling=config.sampling_ceiling,
+            cpu_threshold=config.sampling_cpu_threshold,
+            ram_threshold=config.sampling_ram_threshold,
+            change_threshold=config.sampling_change_threshold,
+        )
+        sampler = SharedSampler(f"agent-metrics-{os.getpid()}", sampling, config.cgroup_root)
+        with sampler:
+            os.environ["AGENT_METRICS_SHM"] = sampler.name
+            run_server(config.app_host, config.app_port, workers)
+    else:
+        run_server(config.app_host, config.app_port, 1, reload=config.env == "local")
+
+
+def run_server(host: str, port: int, workers: int, reload: bool = False) -> None:
+    """
+    Start the webserver.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+        workers (int): The number of worker processes.
+        reload (bool): Whether to restart the server when the code changes.
+    """
     uvicorn.run(
         app="server:app",
-        host=config.app_host,
-        port=config.app_port,
-        reload=config.env == "local",
-        workers=1,
+        host=host,
+        port=port,
+        reload=reload,
+        workers=workers,
     )
 
 
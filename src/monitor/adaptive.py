@@ -0,0 +1,155 @@
+"""
+This module defines the adaptive sampling policy of the collectors.
+
+A fixed interval is either too coarse during an incident or wasteful on an idle host. The
+policy listens to the CPU and RAM snapshots: when the usage crosses a threshold, or moves by
+more than a given amount between two snapshots, the collectors are brought back to their
+floor interval at once. While the usage stays stable, their interval is multiplied by a
+backoff factor after each stable collection, up to a ceiling.
+
+Every governed collector is slowed down by the same factor, its interval at the floor times
+the ratio of the current interval to the floor, without exceeding the ceiling. Collectors
+slower than the ceiling, such as the filesystem usage, keep their own interval.
+"""
+from statistics import mean
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from monitor.collectors import (
+    CONTAINER_CPU_COLLECTOR,
+    CONTAINER_RAM_COLLECTOR,
+    CPU_COLLECTOR,
+    RAM_COLLECTOR,
+    Collector,
+)
+from monitor.scheduler import CollectorScheduler
+
+# Interval of the collectors on a stable host, in seconds
+SAMPLING_CEILING = 10.0
+# Factor multiplying the interval after each stable collection
+SAMPLING_BACKOFF = 2.0
+# CPU and RAM usage percentages sampled at the floor interval
+SAMPLING_CPU_THRESHOLD = 80.0
+SAMPLING_RAM_THRESHOLD = 90.0
+# Change of the CPU or RAM usage percentage between two snapshots sampled at the floor
+SAMPLING_CHANGE_THRESHOLD = 10.0
+
+# Collectors whose snapshots drive the policy, CPU or RAM
+_CPU_COLLECTORS = (CPU_COLLECTOR, CONTAINER_CPU_COLLECTOR)
+_RAM_COLLECTORS = (RAM_COLLECTOR, CONTAINER_RAM_COLLECTOR)
+
+
+class AdaptiveSampling:
+    """
+    Registry listener adapting the interval of the collectors to the activity of the host.
+
+    Attributes:
+        floor (float): Interval of the collectors under load, in seconds
+        ceiling (float): Interval of the collectors on a stable host, in seconds
+        backoff (float): Factor multiplying the interval after each stable collection
+        cpu_threshold (float): CPU usage percentage sampled at the floor interval
+        ram_threshold (float): RAM usage percentage sampled at the floor interval
+        change_threshold (float): Change of the CPU or RAM usage percentage between two
+                                  snapshots sampled at the floor interval
+        interval (float): Current interval of the collectors, between the floor and the
+                          ceiling
+    """
+
+    def __init__(
+        self,
+        floor: float = 1.0,
+        ceiling: float = SAMPLING_CEILING,
+        backoff: float = SAMPLING_BACKOFF,
+        cpu_threshold: float = SAMPLING_CPU_THRESHOLD,
+        ram_threshold: float = SAMPLING_RAM_THRESHOLD,
+        change_threshold: float = SAMPLING_CHANGE_THRESHOLD,
+    ) -> None:
+        """
+        Initialize the policy at the floor interval, it governs no collector until `govern`.
+
+        Args:
+            floor: Interval of the collectors under load, in seconds
+            ceiling: Interval of the collectors on a stable host, in seconds
+            backoff: Factor multiplying the interval after each stable collection
+            cpu_threshold: CPU usage percentage sampled at the floor interval
+            ram_threshold: RAM usage percentage sampled at the floor interval
+            change_threshold: Change of the CPU or RAM usage percentage between two
+                              snapshots sampled at the floor interval
+
+        Raises:
+            ValueError: If the floor is not positive, the ceiling is lower than the floor, or
+                        the backoff factor is not greater than 1
+        """
+        if floor <= 0 or ceiling < floor:
+            raise ValueError(f"Invalid sampling intervals: floor {floor}, ceiling {ceiling}")
+        if backoff <= 1:
+            raise ValueError(f"Invalid sampling backoff: {backoff}")
+        self.floor = floor
+        self.ceiling = ceiling
+        self.backoff = backoff
+        self.cpu_threshold = cpu_threshold
+        self.ram_threshold = ram_threshold
+        self.change_threshold = change_threshold
+        self.interval = floor
+        # Governed collectors with their interval at the floor
+        self._collectors: List[Tuple[Collector, float]] = []
+        self._scheduler: Optional[CollectorScheduler] = None
+        # Latest usage percentage of each collector driving the policy
+        self._usage: Dict[str, float] = {}
+        # Time of the latest busy or stable snapshot
+        self._changed_at: Optional[float] = None
+
+    @property
+    def rate(self) -> float:
+        """Current number of collections per second of the collectors at the floor."""
+        return 1.0 / self.interval
+
+    def govern(
+        self, collectors: Iterable[Collector], scheduler: Optional[CollectorScheduler] = None
+    ) -> None:
+        """
+        Adapt the interval of collectors, their current interval being their floor interval.
+
+        Args:
+            collectors: Collectors to govern
+            scheduler: Scheduler running the collectors, rescheduled when they speed up
+        """
+        self._collectors.extend((collector, collector.interval) for collector in collectors)
+        self._scheduler = scheduler
+        self._apply()
+
+    def __call__(self, name: str, timestamp: float, snapshot: Any) -> None:
+        """Adapt the interval to a published CPU or RAM snapshot."""
+        if name in _CPU_COLLECTORS:
+            if not snapshot.percent:
+                return
+            usage, threshold = mean(snapshot.percent), self.cpu_threshold
+        elif name in _RAM_COLLECTORS:
+            usage, threshold = snapshot.percent, self.ram_threshold
+        else:
+            return
+        previous = self._usage.get(name)
+        self._usage[name] = usage
+        if usage >= threshold or (
+            previous is not None and abs(usage - previous) >= self.change_threshold
+        ):
+            self._changed_at = timestamp
+            if self.interval > self.floor:
+                self.interval = self.floor
+                self._apply()
+                if self._scheduler is not None:
+                    self._scheduler.reschedule()
+        elif self._changed_at is None:
+            self._changed_at = timestamp
+        # One stable collection at the current interval, whatever the jitter of its runs,
+        # the other snapshots of the same collection fall within half an interval
+        elif timestamp - self._changed_at >= self.interval / 2:
+            self._changed_at = timestamp
+            if self.interval < self.ceiling:
+                self.interval = min(self.interval * self.backoff, self.ceiling)
+                self._apply()
+
+    def _apply(self) -> None:
+        """Set the interval of the governed collectors from the current interval."""
+        scale = self.interval / self.floor
+        for collector, interval in self._collectors:
+            collector.interval = min(interval * scale, max(interval, self.ceiling))
@@ -0,0 +1,185 @@
+"""
+This module defines a broadcaster pushing new metric snapshots to subscribed clients.
+
+The sampler thread only notifies the broadcaster that a topic has a new snapshot, with one
+thread-safe callback per event loop however many clients are subscribed. The event loop then
+encodes the message once and appends it to the bounded queue of each subscriber: a slow
+client loses its oldest messages instead of holding back the sampler or the other clients,
+and notifications arriving before the previous one was handled are coalesced.
+"""
+import asyncio
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+# Messages kept per subscriber, older messages are dropped
+SUBSCRIBER_QUEUE_SIZE = 8
+
+# Encoder of the message of a topic, None if the topic has no snapshot yet
+TopicEncoder = Callable[[], Optional[bytes]]
+
+
+class Message(NamedTuple):
+    """
+    Message of a topic, framed once for every transport.
+
+    Attributes:
+        topic (str): Topic of the message
+        data (bytes): JSON encoded snapshot
+        event (bytes): Server-sent event carrying the snapshot
+        text (str): WebSocket text frame carrying the topic and the snapshot
+    """
+
+    topic: str
+    data: bytes
+    event: bytes
+    text: str
+
+
+def make_message(topic: str, data: bytes) -> Message:
+    """
+    Frame the message of a topic for every transport.
+
+    Args:
+        topic: Topic of the message
+        data: JSON encoded snapshot, on a single line
+
+    Returns:
+        Message: The framed message
+    """
+    event = b"event: " + topic.encode() + b"\ndata: " + data + b"\n\n"
+    text = '{"topic":"' + topic + '","data":' + data.decode() + "}"
+    return Message(topic, data, event, text)
+
+
+class Subscription:
+    """
+    Bounded queue of the messages of some topics for a single client.
+
+    Attributes:
+        topics (Set[str]): Subscribed topics
+        dropped (int): Number of messages dropped because the client was too slow
+    """
+
+    def __init__(self, topics: Iterable[str], maxsize: int = SUBSCRIBER_QUEUE_SIZE) -> None:
+        """
+        Initialize an empty subscription, to be created in the event loop of the client.
+
+        Args:
+            topics: Subscribed topics
+            maxsize: Number of messages kept, older messages are dropped
+        """
+        self.topics = set(topics)
+        self.dropped = 0
+        self.loop = asyncio.get_running_loop()
+        self._messages: Deque[Message] = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+
+    def push(self, message: Message) -> None:
+        """Queue a message, dropping the oldest one if the queue is full."""
+        if len(self._messages) == self._messages.maxlen:
+            self.dropped += 1
+        self._messages.append(message)
+        self._ready.set()
+
+    async def get(self) -> Message:
+        """Wait for the next message."""
+        while not self._messages:
+            self._ready.clear()
+            await self._ready.wait()
+        return self._messages.popleft()
+
+
+class Broadcaster:
+    """
+    Fan-out of the topic messages to their subscribers.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a broadcaster without subscribers."""
+        self._encoders: Dict[str, TopicEncoder] = {}
+        self._subscribers: Dict[asyncio.AbstractEventLoop, List[Subscription]] = {}
+        # Topics notified to an event loop and not broadcast yet
+        self._pending: Set[Tuple[asyncio.AbstractEventLoop, str]] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(
+        self, encoders: Dict[str, TopicEncoder], maxsize: int = SUBSCRIBER_QUEUE_SIZE
+    ) -> Subscription:
+        """
+        Subscribe to topics, from the event loop of the client.
+
+        The current message of each topic is queued right away.
+
+        Args:
+            encoders: Encoder of each subscribed topic, only the first encoder of a topic
+                      is kept
+            maxsize: Number of messages kept for the client
+
+        Returns:
+            Subscription: Queue of the messages of the topics
+        """
+        subscription = Subscription(encoders, maxsize)
+        with self._lock:
+            for topic, encoder in encoders.items():
+                self._encoders.setdefault(topic, encoder)
+            self._subscribers.setdefault(subscription.loop, []).append(subscription)
+        for topic in encoders:
+            data = self._encoders[topic]()
+            if data is not None:
+                subscription.push(make_message(topic, data))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop queueing messages for a subscription."""
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.loop, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.loop, None)
+
+    def subscribers(self) -> int:
+        """Return the number of subscriptions."""
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def notify(self, topic: str) -> None:
+        """
+        Schedule the broadcast of the new message of a topic, from any thread.
+
+        Args:
+            topic: Topic with a new snapshot
+        """
+        with self._lock:
+            loops = [
+                loop for loop, subscribers in self._subscribers.items()
+                if (loop, topic) not in self._pending
+                and any(topic in subscription.topics for subscription in subscribers)
+            ]
+            self._pending.update((loop, topic) for loop in loops)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._broadcast, loop, topic)
+            except RuntimeError:
+                # The event loop is closed, its subscriptions are gone with it
+                with self._lock:
+                    self._pending.discard((loop, topic))
+                    self._subscribers.pop(loop, None)
+
+    def _broadcast(self, loop: asyncio.AbstractEventLoop, topic: str) -> None:
+        """Encode the message of a topic once and queue it for its subscribers in a loop."""
+        with self._lock:
+            self._pending.discard((loop, topic))
+            subscribers = [
+                subscription for subscription in self._subscribers.get(loop, ())
+                if topic in subscription.topics
+            ]
+        if not subscribers:
+            return
+        data = self._encoders[topic]()
+        if data is None:
+            return
+        message = make_message(topic, data)
+        for subscription in subscribers:
+            subscription.push(message)
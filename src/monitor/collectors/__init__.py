@@ -0,0 +1,102 @@
+from .base import Collector, CollectorRegistry, CollectorStats, TimedSnapshot
+from .cgroup import (
+    CONTAINER_CPU_COLLECTOR,
+    CONTAINER_RAM_COLLECTOR,
+    Cgroup,
+    ContainerCpuCollector,
+    ContainerCpuSnapshot,
+    ContainerRamCollector,
+)
+from .disk import (
+    DISK_IO_COLLECTOR,
+    DISK_USAGE_COLLECTOR,
+    DiskIoCollector,
+    DiskIoRates,
+    DiskIoSnapshot,
+    DiskUsageCollector,
+    DiskUsageSnapshot,
+    MountUsage,
+)
+from .net import NET_COLLECTOR, NetIoCollector, NetIoRates, NetIoSnapshot
+from .pressure import (
+    CONTAINER_PRESSURE_COLLECTOR,
+    PRESSURE_COLLECTOR,
+    ContainerPressureCollector,
+    PressureCollector,
+    PressureSnapshot,
+    PressureStall,
+    ResourcePressure,
+    make_pressure_collector,
+)
+from .processes import PROCESS_COLLECTOR, ProcessCollector, ProcessSnapshot, ProcessUsage
+from .procfs import (
+    ProcCpuCollector,
+    ProcRamCollector,
+    make_cpu_collector,
+    make_ram_collector,
+)
+from .system import (
+    CPU_COLLECTOR,
+    CPU_STATES,
+    CPU_TIMES_COLLECTOR,
+    RAM_COLLECTOR,
+    CpuCollector,
+    CpuSnapshot,
+    CpuTimesCollector,
+    CpuTimesSnapshot,
+    RamCollector,
+    RamSnapshot,
+    cpu_time_states,
+)
+
+__all__ = [
+    "Collector",
+    "CollectorRegistry",
+    "CollectorStats",
+    "TimedSnapshot",
+    "CPU_COLLECTOR",
+    "RAM_COLLECTOR",
+    "CpuCollector",
+    "CpuSnapshot",
+    "CPU_STATES",
+    "CPU_TIMES_COLLECTOR",
+    "CpuTimesCollector",
+    "CpuTimesSnapshot",
+    "cpu_time_states",
+    "RamCollector",
+    "RamSnapshot",
+    "DISK_IO_COLLECTOR",
+    "DISK_USAGE_COLLECTOR",
+    "DiskIoCollector",
+    "DiskIoRates",
+    "DiskIoSnapshot",
+    "DiskUsageCollector",
+    "DiskUsageSnapshot",
+    "MountUsage",
+    "NET_COLLECTOR",
+    "NetIoCollector",
+    "NetIoRates",
+    "NetIoSnapshot",
+    "PRESSURE_COLLECTOR",
+    "CONTAINER_PRESSURE_COLLECTOR",
+    "PressureCollector",
+    "ContainerPressureCollector",
+    "PressureSnapshot",
+    "PressureStall",
+    "ResourcePressure",
+    "make_pressure_collector",
+    "PROCESS_COLLECTOR",
+    "ProcessCollector",
+    "ProcessSnapshot",
+    "ProcessUsage",
+    "CONTAINER_CPU_COLLECTOR",
+    "CONTAINER_RAM_COLLECTOR",
+    "Cgroup",
+    "ContainerCpuCollector",
+    "ContainerCpuSnapshot",
+    "ContainerRamCollector",
+    "ProcCpuCollector",
+    "ProcRamCollector",
+    "make_cpu_collector",
+    "make_ram_collector",
+]
@@ -0,0 +1,230 @@
+"""
+This module defines the collector interface and the registry of collectors.
+
+A collector takes one snapshot of some system metrics each time `collect` is called, at its
+own `interval`. The registry keeps the latest snapshot and the timing statistics of every
+collector, and notifies listeners of each new snapshot. Each stored snapshot gets a new
+version, a sequence number shared by all the collectors, so that anything derived from a
+snapshot can tell whether it is outdated.
+"""
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Listener of new snapshots, called with the collector name, the time and the snapshot
+Listener = Callable[[str, float, Any], None]
+
+
+class TimedSnapshot(NamedTuple):
+    """
+    Snapshot returned by a collector along with the time it was taken, for snapshots
+    taken earlier than they are collected.
+
+    Attributes:
+        timestamp (float): Time of the snapshot in seconds since the epoch
+        snapshot (Any): Snapshot of the metrics
+    """
+
+    timestamp: float
+    snapshot: Any
+
+
+class Collector:
+    """
+    Base class of the metric collectors.
+
+    Subclasses set `name` and implement `collect`.
+
+    Attributes:
+        name (str): Unique name of the collector
+        interval (float): Time between two collections, in seconds
+    """
+
+    name: str = ""
+    interval: float = 1.0
+
+    def __init__(self, interval: Optional[float] = None) -> None:
+        """
+        Initialize the collector.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+
+        Raises:
+            ValueError: If the interval is not positive
+        """
+        if interval is not None:
+            self.interval = interval
+        if self.interval <= 0:
+            raise ValueError(f"Invalid interval for collector {self.name}: {self.interval}")
+
+    def collect(self) -> Any:
+        """
+        Take a snapshot of the metrics, without blocking.
+
+        Returns:
+            Any: Snapshot of the metrics, None if no snapshot is available yet, for instance
+                 when the first call only primes a rate computation, or a `TimedSnapshot`
+                 when the snapshot was not taken now
+        """
+        raise NotImplementedError
+
+
+class CollectorStats:
+    """
+    Timing statistics of a collector.
+
+    Attributes:
+        runs (int): Number of collections
+        failures (int): Number of collections that raised an exception
+        overruns (int): Number of collections that ended after the next one was due
+        last_duration (float): Duration of the last collection, in seconds
+        max_duration (float): Duration of the longest collection, in seconds
+        total_duration (float): Duration of all the collections, in seconds
+        last_error (Optional[str]): Error of the last failed collection
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty statistics."""
+        self.runs = 0
+        self.failures = 0
+        self.overruns = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def mean_duration(self) -> float:
+        """Mean duration of the collections, in seconds."""
+        return self.total_duration / self.runs if self.runs else 0.0
+
+    def record(self, duration: float, error: Optional[str] = None) -> None:
+        """
+        Account for one collection.
+
+        Args:
+            duration: Duration of the collection, in seconds
+            error: Error raised by the collection, if any
+        """
+        self.runs += 1
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+        if error is not None:
+            self.failures += 1
+            self.last_error = error
+
+
+class CollectorRegistry:
+    """
+    Registry of the collectors and of their latest snapshots.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self._collectors: Dict[str, Collector] = {}
+        self._stats: Dict[str, CollectorStats] = {}
+        # Latest (timestamp, snapshot, version) of each collector
+        self._latest: Dict[str, Tuple[float, Any, int]] = {}
+        self._versions = itertools.count(1)
+        self._version = 0
+        self._listeners: List[Listener] = []
+        self._lock = threading.Lock()
+
+    def register(self, collector: Collector) -> Collector:
+        """
+        Add a collector to the registry.
+
+        Args:
+            collector: Collector to add
+
+        Returns:
+            Collector: The added collector
+
+        Raises:
+            ValueError: If a collector with the same name is already registered
+        """
+        with self._lock:
+            if collector.name in self._collectors:
+                raise ValueError(f"Collector already registered: {collector.name}")
+            self._collectors[collector.name] = collector
+            self._stats[collector.name] = CollectorStats()
+        return collector
+
+    def collectors(self) -> List[Collector]:
+        """Return the registered collectors, in registration order."""
+        with self._lock:
+            return list(self._collectors.values())
+
+    def get(self, name: str) -> Optional[Collector]:
+        """Return the collector registered under `name`, if any."""
+        return self._collectors.get(name)
+
+    def stats(self, name: str) -> CollectorStats:
+        """Return the timing statistics of a registered collector."""
+        return self._stats[name]
+
+    def add_listener(self, listener: Listener) -> None:
+        """
+        Call `listener` with each published snapshot, from the publishing thread.
+
+        Args:
+            listener: Callable taking the collector name, the time and the snapshot
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def publish(self, name: str, snapshot: Any, timestamp: Optional[float] = None) -> None:
+        """
+        Store the latest snapshot of a collector and notify the listeners.
+
+        Args:
+            name: Name of the collector
+            snapshot: New snapshot
+            timestamp: Time of the snapshot in seconds since the epoch, now if None
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        self.store(name, snapshot, timestamp)
+        for listener in self._listeners:
+            listener(name, timestamp, snapshot)
+
+    def store(self, name: str, snapshot: Any, timestamp: Optional[float] = None) -> None:
+        """
+        Replace the latest snapshot of a collector without notifying the listeners.
+
+        Args:
+            name: Name of the collector
+            snapshot: New snapshot
+            timestamp: Time of the snapshot in seconds since the epoch, now if None
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        version = next(self._versions)
+        self._latest[name] = (timestamp, snapshot, version)
+        self._version = max(self._version, version)
+
+    def latest(self, name: str) -> Any:
+        """Return the latest snapshot of a collector, None if it has none yet."""
+        entry = self._latest.get(name)
+        return None if entry is None else entry[1]
+
+    @property
+    def version(self) -> int:
+        """Version of the latest stored snapshot, of any collector, 0 if there is none."""
+        return self._version
+
+    def latest_version(self, name: str) -> int:
+        """Return the version of the latest snapshot of a collector, 0 if it has none yet."""
+        entry = self._latest.get(name)
+        return 0 if entry is None else entry[2]
+
+    def latest_entry(self, name: str) -> Tuple[int, Any]:
+        """Return the version and the latest snapshot of a collector, (0, None) if none yet."""
+        entry = self._latest.get(name)
+        return (0, None) if entry is None else (entry[2], entry[1])
+
+    def latest_time(self, name: str) -> Optional[float]:
+        """Return the time of the latest snapshot of a collector, None if it has none yet."""
+        entry = self._latest.get(name)
+        return None if entry is None else entry[0]
@@ -0,0 +1,238 @@
+"""
+This module defines the collectors of the CPU and memory usage of the agent's cgroup v2.
+
+In a container, psutil reports the CPU and memory of the host. The cgroup collectors read
+the interface files of the container's cgroup instead, and report the usage relative to the
+CPU quota and memory limit of the container. Each file is opened once and re-read from its
+start with `pread`, the kernel generating its content afresh at each read, so a sample costs
+one system call per file.
+"""
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import psutil
+
+from monitor.collectors.base import Collector
+from monitor.collectors.procfs import ProcFile
+from monitor.collectors.system import RamSnapshot
+
+CONTAINER_CPU_COLLECTOR = "container_cpu"
+CONTAINER_RAM_COLLECTOR = "container_ram"
+
+# Mount point of the cgroup v2 hierarchy
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+class CgroupFile(ProcFile):
+    """
+    Interface file of a cgroup, kept open and re-read from its start.
+    """
+
+    def read(self) -> str:
+        """Read the current content of the file."""
+        return super().read().decode()
+
+
+def _open_optional(path: str) -> Optional[CgroupFile]:
+    """Open an interface file, None if the cgroup does not have it, as the root cgroup."""
+    try:
+        return CgroupFile(path)
+    except FileNotFoundError:
+        return None
+
+
+def _parse_keyed(content: str) -> Dict[str, int]:
+    """Parse the "key value" lines of a flat keyed file, as cpu.stat and memory.stat."""
+    values = {}
+    for line in content.splitlines():
+        key, _, value = line.partition(" ")
+        if value:
+            values[key] = int(value)
+    return values
+
+
+class Cgroup:
+    """
+    Cgroup v2 of the agent, with its CPU and memory interface files open.
+
+    Attributes:
+        path (str): Directory of the cgroup
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the interface files of a cgroup.
+
+        Args:
+            path: Directory of the cgroup
+
+        Raises:
+            OSError: If the cgroup has no CPU or memory accounting
+        """
+        self.path = path
+        self.cpu_stat = CgroupFile(os.path.join(path, "cpu.stat"))
+        self.memory_current = CgroupFile(os.path.join(path, "memory.current"))
+        self.memory_stat = CgroupFile(os.path.join(path, "memory.stat"))
+        # The root cgroup has no limits
+        self.cpu_max = _open_optional(os.path.join(path, "cpu.max"))
+        self.memory_max = _open_optional(os.path.join(path, "memory.max"))
+
+    @classmethod
+    def detect(
+        cls, root: str = CGROUP_ROOT, proc: str = "/proc/self/cgroup"
+    ) -> Optional["Cgroup"]:
+        """
+        Find the cgroup v2 of the agent.
+
+        Args:
+            root: Mount point of the cgroup v2 hierarchy
+            proc: File listing the cgroups of the agent
+
+        Returns:
+            Optional[Cgroup]: The cgroup of the agent, None if there is no cgroup v2 with CPU
+                              and memory accounting
+        """
+        if not os.path.exists(os.path.join(root, "cgroup.controllers")):
+            return None
+        try:
+            with open(proc, encoding="utf-8") as file:
+                lines = file.read().splitlines()
+        except OSError:
+            lines = []
+        # The cgroup v2 line is "0::/path", relative to the root of the cgroup namespace
+        relative = next((line[3:] for line in lines if line.startswith("0::")), "/")
+        # Without a private cgroup namespace, the container only sees its own cgroup at root
+        for path in (os.path.join(root, relative.lstrip("/")), root):
+            try:
+                return cls(os.path.normpath(path))
+            except OSError:
+                continue
+        return None
+
+    def cpu_limit(self) -> float:
+        """Return the CPU quota in cores, the number of logical cores without quota."""
+        if self.cpu_max is not None:
+            quota, _, period = self.cpu_max.read().partition(" ")
+            if quota != "max":
+                return int(quota) / int(period)
+        return float(psutil.cpu_count() or 1)
+
+    def memory_limit(self) -> Optional[int]:
+        """Return the memory limit in bytes, None without limit."""
+        if self.memory_max is None:
+            return None
+        limit = self.memory_max.read().strip()
+        return None if limit == "max" else int(limit)
+
+    def close(self) -> None:
+        """Close the interface files."""
+        for file in (self.cpu_stat, self.memory_current, self.memory_stat, self.cpu_max,
+                     self.memory_max):
+            if file is not None:
+                file.close()
+
+
+class ContainerCpuSnapshot(NamedTuple):
+    """
+    Container CPU usage snapshot.
+
+    Attributes:
+        percent (List[float]): Usage percentage of the CPU quota, as a single value
+        limit (float): CPU quota in cores
+        throttled (int): Number of periods the container was throttled in, since its start
+        throttled_usec (int): Time the container was throttled, since its start
+    """
+
+    percent: List[float]
+    limit: float
+    throttled: int
+    throttled_usec: int
+
+
+class ContainerCpuCollector(Collector):
+    """
+    Collect the CPU usage of the container relative to its CPU quota.
+    """
+
+    name = CONTAINER_CPU_COLLECTOR
+    interval = 1.0
+
+    def __init__(self, cgroup: Cgroup, interval: Optional[float] = None) -> None:
+        """
+        Initialize the collector, the CPU time is first read by the first collection.
+
+        Args:
+            cgroup: Cgroup of the container
+            interval: Time between two collections in seconds, the class default if None
+        """
+        super().__init__(interval)
+        self.cgroup = cgroup
+        self._previous: Optional[tuple] = None
+
+    def collect(self) -> Optional[ContainerCpuSnapshot]:
+        """
+        Take a snapshot of the CPU usage, computed from the CPU time elapsed since the
+        previous call.
+
+        Returns:
+            Optional[ContainerCpuSnapshot]: CPU usage of the container, None on the first call
+                                            which only reads the initial CPU time
+        """
+        now = time.monotonic()
+        stat = _parse_keyed(self.cgroup.cpu_stat.read())
+        previous, self._previous = self._previous, (now, stat["usage_usec"])
+        if previous is None or now <= previous[0]:
+            return None
+        limit = self.cgroup.cpu_limit()
+        used = (stat["usage_usec"] - previous[1]) / 1e6 / (now - previous[0])
+        return ContainerCpuSnapshot(
+            percent=[round(max(used / limit * 100, 0.0), 1)],
+            limit=limit,
+            throttled=stat.get("nr_throttled", 0),
+            throttled_usec=stat.get("throttled_usec", 0),
+        )
+
+
+class ContainerRamCollector(Collector):
+    """
+    Collect the memory usage of the container relative to its memory limit.
+
+    The used memory is the working set, the current usage without the inactive file cache
+    the kernel reclaims first, as reported by `docker stats`. Without limit, the sizes are
+    relative to the host memory.
+    """
+
+    name = CONTAINER_RAM_COLLECTOR
+    interval = 1.0
+
+    def __init__(self, cgroup: Cgroup, interval: Optional[float] = None) -> None:
+        """
+        Initialize the collector.
+
+        Args:
+            cgroup: Cgroup of the container
+            interval: Time between two collections in seconds, the class default if None
+        """
+        super().__init__(interval)
+        self.cgroup = cgroup
+        self._host_total = psutil.virtual_memory().total
+
+    def collect(self) -> RamSnapshot:
+        """
+        Take a snapshot of the memory usage.
+
+        Returns:
+            RamSnapshot: Memory usage of the container, sizes converted to MB
+        """
+        current = int(self.cgroup.memory_current.read())
+        inactive = _parse_keyed(self.cgroup.memory_stat.read()).get("inactive_file", 0)
+        limit = self.cgroup.memory_limit() or self._host_total
+        used = max(current - inactive, 0)
+        return RamSnapshot(
+            percent=round(used / limit * 100, 1),
+            total=limit / (1024 * 1024),
+            available=max(limit - used, 0) / (1024 * 1024),
+            used=used / (1024 * 1024),
+            free=max(limit - current, 0) / (1024 * 1024),
+        )
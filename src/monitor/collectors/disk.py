@@ -0,0 +1,298 @@
+"""
+This module defines the collectors of the disk activity and of the filesystem usage.
+
+Disk activity is computed from the cumulative I/O counters of each device, as rates over the
+time elapsed since the previous collection. Filesystem usage is probed in a pool of daemon
+threads with a timeout: `statvfs` can hang for minutes on a stale network mount, so a mount
+not answering in time is reported as unavailable, and it is not probed again until its
+pending probe returns. A hung mount thus delays the sampler by the timeout once, instead of
+at every collection. A probe hung in `statvfs` holds its thread, so the pool starts another
+thread for each probe submitted while all its threads are busy, and the probes of the other
+mounts are not queued behind the hung ones.
+"""
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import psutil
+
+from monitor.collectors.base import Collector
+
+DISK_IO_COLLECTOR = "disk_io"
+DISK_USAGE_COLLECTOR = "disk_usage"
+
+# Time given to the filesystem usage probes of a collection, in seconds
+DISK_USAGE_TIMEOUT = 0.5
+# Threads probing the filesystem usage
+DISK_USAGE_WORKERS = 4
+# Maximum number of probe threads, including those held by hung mounts
+DISK_USAGE_MAX_THREADS = 64
+# Time after which an idle probe thread above `DISK_USAGE_WORKERS` exits, in seconds
+DISK_USAGE_IDLE_TIMEOUT = 60.0
+
+
+class DiskIoRates(NamedTuple):
+    """
+    Activity of a disk device.
+
+    Attributes:
+        read_bytes (float): Bytes read per second
+        write_bytes (float): Bytes written per second
+        read_ops (float): Read operations per second
+        write_ops (float): Write operations per second
+    """
+
+    read_bytes: float
+    write_bytes: float
+    read_ops: float
+    write_ops: float
+
+
+class DiskIoSnapshot(NamedTuple):
+    """
+    Disk activity snapshot.
+
+    Attributes:
+        devices (Dict[str, DiskIoRates]): Activity of each device, by device name
+    """
+
+    devices: Dict[str, DiskIoRates]
+
+
+class MountUsage(NamedTuple):
+    """
+    Usage of a mounted filesystem, sizes in bytes.
+
+    Attributes:
+        mountpoint (str): Path the filesystem is mounted on
+        device (str): Mounted device
+        fstype (str): Filesystem type
+        total (int): Total size
+        used (int): Used size
+        free (int): Size available to unprivileged users
+        percent (float): Usage percentage
+    """
+
+    mountpoint: str
+    device: str
+    fstype: str
+    total: int
+    used: int
+    free: int
+    percent: float
+
+
+class DiskUsageSnapshot(NamedTuple):
+    """
+    Filesystem usage snapshot.
+
+    Attributes:
+        mounts (List[MountUsage]): Usage of each mounted filesystem that answered in time
+        unavailable (List[str]): Mount points that did not answer in time or failed
+    """
+
+    mounts: List[MountUsage]
+    unavailable: List[str]
+
+
+class DiskIoCollector(Collector):
+    """
+    Collect the activity of each disk device since the previous collection.
+    """
+
+    name = DISK_IO_COLLECTOR
+    interval = 1.0
+
+    def __init__(self, interval: Optional[float] = None) -> None:
+        """
+        Initialize the collector, the counters are first read by the first collection.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+        """
+        super().__init__(interval)
+        self._previous: Optional[Tuple[float, Dict[str, tuple]]] = None
+
+    def collect(self) -> Optional[DiskIoSnapshot]:
+        """
+        Take a snapshot of the disk activity, computed from the counters elapsed since the
+        previous call.
+
+        Devices whose counters went backwards, after a reset or a wrap, or which appeared
+        since the previous call are left out of this snapshot.
+
+        Returns:
+            Optional[DiskIoSnapshot]: Activity of each device, None on the first call which
+                                      only reads the initial counters
+        """
+        now = time.monotonic()
+        counters = psutil.disk_io_counters(perdisk=True) or {}
+        previous, self._previous = self._previous, (now, counters)
+        if previous is None:
+            return None
+        elapsed = now - previous[0]
+        if elapsed <= 0:
+            return None
+        devices = {}
+        for device, current in counters.items():
+            before = previous[1].get(device)
+            if before is None:
+                continue
+            deltas = (
+                current.read_bytes - before.read_bytes,
+                current.write_bytes - before.write_bytes,
+                current.read_count - before.read_count,
+                current.write_count - before.write_count,
+            )
+            if min(deltas) < 0:
+                continue
+            devices[device] = DiskIoRates(*(delta / elapsed for delta in deltas))
+        return DiskIoSnapshot(devices)
+
+
+class _ProbePool:
+    """
+    Daemon threads running the filesystem probes, never blocking the interpreter exit.
+
+    A thread is started for each probe submitted while every thread is busy, up to
+    `max_threads`, so the threads held by hung probes do not reduce the capacity of the pool.
+    The threads above `workers` exit once idle for `idle_timeout` seconds.
+    """
+
+    def __init__(
+        self, workers: int, max_threads: int, idle_timeout: float = DISK_USAGE_IDLE_TIMEOUT
+    ) -> None:
+        self._tasks: "queue.SimpleQueue[Tuple[Future, Callable[[], MountUsage]]]" = (
+            queue.SimpleQueue()
+        )
+        self._workers = workers
+        self._max_threads = max(workers, max_threads)
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        # Threads running, and probes submitted which have not returned yet
+        self._threads = 0
+        self._busy = 0
+        self._names = itertools.count()
+
+    def submit(self, probe: Callable[[], MountUsage]) -> Future:
+        """Run a probe in a worker thread, starting a thread if they are all busy."""
+        with self._lock:
+            self._busy += 1
+            start = self._busy > self._threads and self._threads < self._max_threads
+            if start:
+                self._threads += 1
+        if start:
+            threading.Thread(
+                target=self._work, name=f"disk-probe-{next(self._names)}", daemon=True
+            ).start()
+        future: Future = Future()
+        self._tasks.put((future, probe))
+        return future
+
+    def _work(self) -> None:
+        while True:
+            try:
+                future, probe = self._tasks.get(timeout=self._idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    # Exit only while the other threads are enough for the submitted probes
+                    if self._threads > self._workers and self._busy < self._threads:
+                        self._threads -= 1
+                        return
+                continue
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(probe())
+                    except BaseException as exc:  # pylint: disable=broad-except
+                        future.set_exception(exc)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+
+
+class DiskUsageCollector(Collector):
+    """
+    Collect the usage of the mounted filesystems, probing each one with a timeout.
+
+    Attributes:
+        timeout (float): Time given to the probes of a collection, in seconds
+    """
+
+    name = DISK_USAGE_COLLECTOR
+    interval = 30.0
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        timeout: float = DISK_USAGE_TIMEOUT,
+        workers: int = DISK_USAGE_WORKERS,
+        max_threads: int = DISK_USAGE_MAX_THREADS,
+    ) -> None:
+        """
+        Initialize the collector, the probe threads are started by the first collection.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+            timeout: Time given to the probes of a collection, in seconds
+            workers: Number of probe threads kept while idle
+            max_threads: Maximum number of probe threads, including those held by hung
+                         mounts
+        """
+        super().__init__(interval)
+        self.timeout = timeout
+        self._pool = _ProbePool(workers, max_threads)
+        # Probes of the previous collections still running, by mount point
+        self._pending: Dict[str, Future] = {}
+
+    @staticmethod
+    def _probe(partition: Any) -> MountUsage:
+        """Read the usage of a mounted filesystem, which may block."""
+        usage = psutil.disk_usage(partition.mountpoint)
+        return MountUsage(
+            mountpoint=partition.mountpoint,
+            device=partition.device,
+            fstype=partition.fstype,
+            total=usage.total,
+            used=usage.used,
+            free=usage.free,
+            percent=usage.percent,
+        )
+
+    def collect(self) -> DiskUsageSnapshot:
+        """
+        Take a snapshot of the usage of the mounted filesystems, within `timeout` seconds.
+
+        Returns:
+            DiskUsageSnapshot: Usage of the filesystems that answered in time, and mount
+                               points of the others
+        """
+        futures: Dict[str, Future] = {}
+        submitted = []
+        for partition in psutil.disk_partitions(all=False):
+            pending = self._pending.get(partition.mountpoint)
+            if pending is not None and not pending.done():
+                # Still hung since a previous collection, neither probed nor waited for
+                futures[partition.mountpoint] = pending
+                continue
+            future = self._pool.submit(lambda partition=partition: self._probe(partition))
+            futures[partition.mountpoint] = future
+            submitted.append(future)
+        wait(submitted, timeout=self.timeout)
+        for future in submitted:
+            # A probe still queued is submitted again by the next collection, only the
+            # running ones stay pending
+            future.cancel()
+        mounts, unavailable = [], []
+        for mountpoint, future in futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                mounts.append(future.result())
+            else:
+                unavailable.append(mountpoint)
+        self._pending = {
+            mountpoint: future for mountpoint, future in futures.items() if not future.done()
+        }
+        return DiskUsageSnapshot(mounts, unavailable)
@@ -0,0 +1,138 @@
+"""
+This module defines the collector of the network interface throughput.
+
+Throughput is computed from the cumulative counters of each interface, as rates over the
+time elapsed since the previous collection. Counters are 32-bit on some platforms and
+drivers, so a counter lower than at the previous collection is taken as a 32-bit wrap when
+its previous value fits in 32 bits, and as a reset of the interface otherwise.
+"""
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import psutil
+
+from monitor.collectors.base import Collector
+
+NET_COLLECTOR = "net"
+
+# Range of the counters wrapping around on 32-bit platforms and drivers
+COUNTER_WRAP = 2**32
+
+# Counters of psutil.net_io_counters, in the order of the NetIoRates fields
+NET_COUNTERS = (
+    "bytes_recv",
+    "bytes_sent",
+    "packets_recv",
+    "packets_sent",
+    "errin",
+    "errout",
+    "dropin",
+    "dropout",
+)
+
+
+class NetIoRates(NamedTuple):
+    """
+    Throughput of a network interface, per second.
+
+    Attributes:
+        rx_bytes (float): Bytes received per second
+        tx_bytes (float): Bytes sent per second
+        rx_packets (float): Packets received per second
+        tx_packets (float): Packets sent per second
+        rx_errors (float): Receive errors per second
+        tx_errors (float): Transmit errors per second
+        rx_drops (float): Incoming packets dropped per second
+        tx_drops (float): Outgoing packets dropped per second
+    """
+
+    rx_bytes: float
+    tx_bytes: float
+    rx_packets: float
+    tx_packets: float
+    rx_errors: float
+    tx_errors: float
+    rx_drops: float
+    tx_drops: float
+
+
+class NetIoSnapshot(NamedTuple):
+    """
+    Network throughput snapshot.
+
+    Attributes:
+        interfaces (Dict[str, NetIoRates]): Throughput of each interface, by interface name
+    """
+
+    interfaces: Dict[str, NetIoRates]
+
+
+def counter_delta(before: int, current: int) -> Optional[int]:
+    """
+    Compute the increase of a cumulative counter, across a 32-bit wraparound.
+
+    Args:
+        before: Value of the counter at the previous collection
+        current: Current value of the counter
+
+    Returns:
+        Optional[int]: Increase of the counter, None if it was reset
+    """
+    if current >= before:
+        return current - before
+    if before < COUNTER_WRAP:
+        return current + COUNTER_WRAP - before
+    return None
+
+
+class NetIoCollector(Collector):
+    """
+    Collect the throughput of each network interface since the previous collection.
+    """
+
+    name = NET_COLLECTOR
+    interval = 1.0
+
+    def __init__(self, interval: Optional[float] = None) -> None:
+        """
+        Initialize the collector, the counters are first read by the first collection.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+        """
+        super().__init__(interval)
+        self._previous: Optional[Tuple[float, Dict[str, tuple]]] = None
+
+    def collect(self) -> Optional[NetIoSnapshot]:
+        """
+        Take a snapshot of the network throughput, computed from the counters elapsed since
+        the previous call.
+
+        Interfaces which were reset or appeared since the previous call are left out of this
+        snapshot.
+
+        Returns:
+            Optional[NetIoSnapshot]: Throughput of each interface, None on the first call
+                                     which only reads the initial counters
+        """
+        now = time.monotonic()
+        counters = psutil.net_io_counters(pernic=True) or {}
+        previous, self._previous = self._previous, (now, counters)
+        if previous is None:
+            return None
+        elapsed = now - previous[0]
+        if elapsed <= 0:
+            return None
+        interfaces = {}
+        for interface, current in counters.items():
+            before = previous[1].get(interface)
+            if before is None:
+                continue
+            deltas = [
+                counter_delta(getattr(before, counter), getattr(current, counter))
+                for counter in NET_COUNTERS
+            ]
+            if None in deltas:
+                continue
+            interfaces[interface] = NetIoRates(*(delta / elapsed for delta in deltas))
+        return NetIoSnapshot(interfaces)
@@ -0,0 +1,216 @@
+"""
+This module defines the collectors of the Pressure Stall Information (PSI) of the kernel.
+
+Usage percentages do not tell whether tasks wait for a resource. PSI does: for the CPU,
+memory and I/O, the "some" line gives the share of time at least one task was stalled on the
+resource, and the "full" line the share of time all the non-idle tasks were stalled at once,
+as averages over the last 10, 60 and 300 seconds and as a cumulative stall time. The
+collectors report the averages, and the stall time elapsed since the previous collection.
+
+The host pressure is read from /proc/pressure, the pressure of the agent's cgroup from its
+`cpu.pressure`, `memory.pressure` and `io.pressure` files. Each file is kept open and re-read
+from its start with `pread`, so a collection costs one system call per file.
+"""
+import os
+from typing import Dict, NamedTuple, Optional
+
+from monitor.collectors.base import Collector
+from monitor.collectors.cgroup import Cgroup
+from monitor.collectors.procfs import ProcFile
+
+PRESSURE_COLLECTOR = "pressure"
+CONTAINER_PRESSURE_COLLECTOR = "container_pressure"
+
+# Directory of the host pressure files
+PROC_PRESSURE = "/proc/pressure"
+# Resources with a pressure file
+PRESSURE_RESOURCES = ("cpu", "memory", "io")
+
+
+class PressureStall(NamedTuple):
+    """
+    Stall of the tasks on a resource, from a line of a pressure file.
+
+    Attributes:
+        avg10 (float): Percentage of the time stalled over the last 10 seconds
+        avg60 (float): Percentage of the time stalled over the last 60 seconds
+        avg300 (float): Percentage of the time stalled over the last 300 seconds
+        stall_usec (int): Time stalled since the previous collection, in microseconds
+    """
+
+    avg10: float
+    avg60: float
+    avg300: float
+    stall_usec: int
+
+
+class ResourcePressure(NamedTuple):
+    """
+    Pressure of a resource.
+
+    Attributes:
+        some (PressureStall): Stall of at least one task
+        full (Optional[PressureStall]): Stall of all the non-idle tasks at once, None for the
+                                        CPU on kernels older than 5.13
+    """
+
+    some: PressureStall
+    full: Optional[PressureStall]
+
+
+class PressureSnapshot(NamedTuple):
+    """
+    Pressure snapshot.
+
+    Attributes:
+        resources (Dict[str, ResourcePressure]): Pressure of each resource, by resource name
+    """
+
+    resources: Dict[str, ResourcePressure]
+
+
+def parse_pressure(content: bytes) -> Dict[bytes, tuple]:
+    """
+    Parse the content of a pressure file.
+
+    Args:
+        content: Lines such as "some avg10=0.12 avg60=0.05 avg300=0.01 total=123456"
+
+    Returns:
+        Dict[bytes, tuple]: avg10, avg60, avg300 and total stall time in microseconds, by
+                            line kind, "some" or "full"
+    """
+    lines = {}
+    for line in content.splitlines():
+        kind, _, fields = line.partition(b" ")
+        avg10, avg60, avg300, total = fields.split()
+        lines[kind] = (
+            float(avg10[6:]), float(avg60[6:]), float(avg300[7:]), int(total[6:])
+        )
+    return lines
+
+
+class PressureCollector(Collector):
+    """
+    Collect the pressure of the CPU, memory and I/O of the host.
+    """
+
+    name = PRESSURE_COLLECTOR
+    interval = 1.0
+
+    def __init__(
+        self, interval: Optional[float] = None, paths: Optional[Dict[str, str]] = None
+    ) -> None:
+        """
+        Open the pressure files, the stall times are first read by the first collection.
+
+        Resources whose file is missing or cannot be read, as when PSI is disabled, are left
+        out.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+            paths: Pressure file of each resource, those of /proc/pressure if None
+
+        Raises:
+            OSError: If none of the pressure files can be read
+        """
+        super().__init__(interval)
+        if paths is None:
+            paths = {
+                resource: os.path.join(PROC_PRESSURE, resource)
+                for resource in PRESSURE_RESOURCES
+            }
+        self._files: Dict[str, ProcFile] = {}
+        for resource, path in paths.items():
+            try:
+                file = ProcFile(path)
+            except OSError:
+                continue
+            try:
+                # Reading fails with EOPNOTSUPP when PSI is disabled
+                file.read()
+            except OSError:
+                file.close()
+                continue
+            self._files[resource] = file
+        if not self._files:
+            raise OSError(f"No pressure file can be read: {', '.join(paths.values())}")
+        # Cumulative stall times at the previous collection, by resource and line kind
+        self._totals: Optional[Dict[tuple, int]] = None
+
+    def collect(self) -> Optional[PressureSnapshot]:
+        """
+        Take a snapshot of the pressure, with the stall times elapsed since the previous
+        call.
+
+        Returns:
+            Optional[PressureSnapshot]: Pressure of each resource, None on the first call
+                                        which only reads the initial stall times
+        """
+        previous = self._totals
+        totals: Dict[tuple, int] = {}
+        resources = {}
+        for resource, file in self._files.items():
+            stalls = {}
+            for kind, (avg10, avg60, avg300, total) in parse_pressure(file.read()).items():
+                totals[resource, kind] = total
+                if previous is not None:
+                    stall = max(total - previous.get((resource, kind), total), 0)
+                    stalls[kind] = PressureStall(avg10, avg60, avg300, stall)
+            if b"some" in stalls:
+                resources[resource] = ResourcePressure(stalls[b"some"], stalls.get(b"full"))
+        self._totals = totals
+        if previous is None:
+            return None
+        return PressureSnapshot(resources)
+
+    def close(self) -> None:
+        """Close the pressure files."""
+        for file in self._files.values():
+            file.close()
+
+
+class ContainerPressureCollector(PressureCollector):
+    """
+    Collect the pressure of the CPU, memory and I/O of the container's cgroup.
+    """
+
+    name = CONTAINER_PRESSURE_COLLECTOR
+
+    def __init__(self, cgroup: Cgroup, interval: Optional[float] = None) -> None:
+        """
+        Open the pressure files of a cgroup.
+
+        Args:
+            cgroup: Cgroup of the container
+            interval: Time between two collections in seconds, the class default if None
+
+        Raises:
+            OSError: If none of the pressure files of the cgroup can be read
+        """
+        super().__init__(interval, {
+            resource: os.path.join(cgroup.path, f"{resource}.pressure")
+            for resource in PRESSURE_RESOURCES
+        })
+
+
+def make_pressure_collector(
+    interval: Optional[float] = None, cgroup: Optional[Cgroup] = None
+) -> Optional[PressureCollector]:
+    """
+    Create the collector of the host pressure, or of the pressure of a cgroup.
+
+    Args:
+        interval: Time between two collections in seconds, the class default if None
+        cgroup: Cgroup of the container, the host pressure is collected if None
+
+    Returns:
+        Optional[PressureCollector]: The collector, None if the kernel has no PSI, or has it
+                                     disabled
+    """
+    try:
+        if cgroup is None:
+            return PressureCollector(interval)
+        return ContainerPressureCollector(cgroup, interval)
+    except OSError:
+        return None
@@ -0,0 +1,141 @@
+"""
+This module defines the collector of the processes using the most CPU and memory.
+
+Each collection reads only the attributes in `PROCESS_ATTRS` of every process, with
+`psutil.process_iter`, which reads them in a single `oneshot` pass over the status files of
+the process and creates a `psutil.Process` only for the PIDs it has not seen yet. The CPU
+time of each process is kept from one collection to the next, by PID, so that its CPU usage
+is computed from the delta of its CPU time. The top processes are then selected with
+bounded heaps, without sorting all of them.
+"""
+import heapq
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import psutil
+
+from monitor.collectors.base import Collector
+
+PROCESS_COLLECTOR = "processes"
+
+# Number of processes kept in each top list
+PROCESS_TOP = 10
+# Attributes read from every process at each collection
+PROCESS_ATTRS = ["name", "cpu_times", "memory_info"]
+
+
+class ProcessUsage(NamedTuple):
+    """
+    Resource usage of a process.
+
+    Attributes:
+        pid (int): Process ID
+        name (str): Process name
+        cpu_percent (float): CPU usage since the previous collection, over 100 when the
+                             process uses more than one core
+        rss (int): Resident memory in bytes
+    """
+
+    pid: int
+    name: str
+    cpu_percent: float
+    rss: int
+
+
+class ProcessSnapshot(NamedTuple):
+    """
+    Top processes snapshot.
+
+    Attributes:
+        count (int): Number of processes read
+        by_cpu (List[ProcessUsage]): Processes using the most CPU, highest first
+        by_memory (List[ProcessUsage]): Processes using the most resident memory, highest
+                                        first
+    """
+
+    count: int
+    by_cpu: List[ProcessUsage]
+    by_memory: List[ProcessUsage]
+
+
+class _TrackedProcess:
+    """Process kept between collections, with its CPU time at the previous collection."""
+
+    __slots__ = ("process", "cpu_time")
+
+    def __init__(self, process: psutil.Process, cpu_time: float) -> None:
+        self.process = process
+        self.cpu_time = cpu_time
+
+
+class ProcessCollector(Collector):
+    """
+    Collect the processes using the most CPU and resident memory.
+
+    Attributes:
+        top (int): Number of processes kept in each top list
+    """
+
+    name = PROCESS_COLLECTOR
+    interval = 5.0
+
+    def __init__(self, interval: Optional[float] = None, top: int = PROCESS_TOP) -> None:
+        """
+        Initialize the collector, the processes are first read by the first collection.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+            top: Number of processes kept in each top list
+        """
+        super().__init__(interval)
+        self.top = top
+        self._processes: Dict[int, _TrackedProcess] = {}
+        self._previous: Optional[float] = None
+
+    def collect(self) -> Optional[ProcessSnapshot]:
+        """
+        Take a snapshot of the top processes, their CPU usage computed from the CPU times
+        elapsed since the previous call.
+
+        Processes started since the previous call, or reusing the PID of a previous process,
+        only count with their memory in this snapshot.
+
+        Returns:
+            Optional[ProcessSnapshot]: Top processes, None on the first call which only
+                                       reads the initial CPU times
+        """
+        now = time.monotonic()
+        previous, self._previous = self._previous, now
+        elapsed = now - previous if previous is not None else 0.0
+        tracked = self._processes
+        processes: Dict[int, _TrackedProcess] = {}
+        usages: List[ProcessUsage] = []
+        for process in psutil.process_iter(PROCESS_ATTRS):
+            info = process.info
+            times, memory = info["cpu_times"], info["memory_info"]
+            if times is None or memory is None:
+                # Not readable by the agent
+                continue
+            cpu_time = times.user + times.system
+            entry = tracked.get(process.pid)
+            if entry is None or entry.process is not process:
+                # New process, or new process reusing the PID of a previous one
+                entry = _TrackedProcess(process, cpu_time)
+                cpu_percent = 0.0
+            else:
+                delta = max(cpu_time - entry.cpu_time, 0.0)
+                cpu_percent = delta / elapsed * 100 if elapsed > 0 else 0.0
+                entry.cpu_time = cpu_time
+            processes[process.pid] = entry
+            usages.append(
+                ProcessUsage(process.pid, info["name"] or "", round(cpu_percent, 2), memory.rss)
+            )
+        # Processes gone since the previous call are dropped with their cache entries
+        self._processes = processes
+        if previous is None:
+            return None
+        return ProcessSnapshot(
+            count=len(usages),
+            by_cpu=heapq.nlargest(self.top, usages, key=lambda usage: usage.cpu_percent),
+            by_memory=heapq.nlargest(self.top, usages, key=lambda usage: usage.rss),
+        )
@@ -0,0 +1,221 @@
+"""
+This module defines Linux fast-path collectors of the CPU and RAM usage, reading /proc.
+
+psutil opens, reads and parses /proc/stat and /proc/meminfo into named tuples at every call.
+The fast-path collectors keep both files open and re-read them from their start with
+`pread`, parse only the fields they need, and keep the CPU times of the previous collection
+in preallocated arrays, so that sub-second sampling costs a fraction of the psutil path.
+They compute the same values as psutil: the busy time of a core excludes idle and iowait,
+its total time excludes the guest times already counted in user and nice, and available
+memory is MemAvailable.
+
+`make_cpu_collector` and `make_ram_collector` return the fast-path collectors on Linux and
+the psutil collectors elsewhere, or if /proc cannot be read.
+"""
+import os
+from array import array
+from typing import Dict, Optional
+
+from monitor.collectors.base import Collector
+from monitor.collectors.system import (
+    CPU_COLLECTOR,
+    RAM_COLLECTOR,
+    CpuCollector,
+    CpuSnapshot,
+    RamCollector,
+    RamSnapshot,
+)
+
+PROC_STAT = "/proc/stat"
+PROC_MEMINFO = "/proc/meminfo"
+# Bytes read from a /proc file at once, larger files take several reads
+PROC_READ_SIZE = 65536
+# Fields of /proc/meminfo used, the others only without MemAvailable, which comes third
+MEMINFO_REQUIRED = frozenset((b"MemTotal", b"MemFree", b"MemAvailable"))
+MEMINFO_FIELDS = MEMINFO_REQUIRED | {b"Buffers", b"Cached", b"SReclaimable"}
+
+
+class ProcFile:
+    """
+    File of /proc, kept open and re-read from its start.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the file.
+
+        Args:
+            path: Path of the file
+
+        Raises:
+            OSError: If the file cannot be opened
+        """
+        self.path = path
+        self._fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+
+    def read(self) -> bytes:
+        """Read the current content of the file."""
+        data = os.pread(self._fd, PROC_READ_SIZE, 0)
+        if len(data) < PROC_READ_SIZE:
+            return data
+        chunks = [data]
+        while len(data) == PROC_READ_SIZE:
+            data = os.pread(self._fd, PROC_READ_SIZE, PROC_READ_SIZE * len(chunks))
+            chunks.append(data)
+        return b"".join(chunks)
+
+    def close(self) -> None:
+        """Close the file."""
+        os.close(self._fd)
+
+
+class ProcCpuCollector(Collector):
+    """
+    Collect the usage of each CPU core from the jiffies of /proc/stat.
+    """
+
+    name = CPU_COLLECTOR
+    interval = 1.0
+
+    def __init__(self, interval: Optional[float] = None, path: str = PROC_STAT) -> None:
+        """
+        Open /proc/stat, the CPU times are first read by the first collection.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+            path: Path of the kernel CPU statistics
+
+        Raises:
+            OSError: If the file cannot be opened
+        """
+        super().__init__(interval)
+        self._file = ProcFile(path)
+        # Busy and total jiffies of each core at the previous collection
+        self._busy = array("d")
+        self._total = array("d")
+
+    def collect(self) -> Optional[CpuSnapshot]:
+        """
+        Take a snapshot of the CPU usage, computed from the jiffies elapsed since the previous
+        call.
+
+        Returns:
+            Optional[CpuSnapshot]: Usage percentage of each logical core, None on the first
+                                   call, or after a core went online or offline, which only
+                                   reads the initial jiffies
+        """
+        cores = []
+        for line in self._file.read().splitlines():
+            if not line.startswith(b"cpu"):
+                # The cpu lines come first
+                break
+            if line[3:4] == b" ":
+                # Aggregate of all the cores
+                continue
+            # user nice system idle iowait irq softirq steal, then the guest times
+            fields = [int(field) for field in line.split()[1:9]]
+            total = sum(fields)
+            cores.append((total - fields[3] - fields[4], total))
+        previous_busy, previous_total = self._busy, self._total
+        if len(cores) != len(previous_total):
+            # First call, or a core went online or offline
+            self._busy = array("d", (busy for busy, _ in cores))
+            self._total = array("d", (total for _, total in cores))
+            return None
+        percent = []
+        for core, (busy, total) in enumerate(cores):
+            elapsed = total - previous_total[core]
+            used = max(busy - previous_busy[core], 0)
+            percent.append(round(used / elapsed * 100, 1) if elapsed > 0 else 0.0)
+            previous_busy[core], previous_total[core] = busy, total
+        return CpuSnapshot(percent)
+
+
+class ProcRamCollector(Collector):
+    """
+    Collect the RAM usage from /proc/meminfo.
+    """
+
+    name = RAM_COLLECTOR
+    interval = 1.0
+
+    def __init__(self, interval: Optional[float] = None, path: str = PROC_MEMINFO) -> None:
+        """
+        Open /proc/meminfo.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+            path: Path of the kernel memory statistics
+
+        Raises:
+            OSError: If the file cannot be opened
+        """
+        super().__init__(interval)
+        self._file = ProcFile(path)
+
+    def collect(self) -> RamSnapshot:
+        """
+        Take a snapshot of the RAM usage.
+
+        Returns:
+            RamSnapshot: RAM usage, sizes converted to MB
+        """
+        fields: Dict[bytes, int] = {}
+        for line in self._file.read().splitlines():
+            key, _, value = line.partition(b":")
+            if key in MEMINFO_FIELDS:
+                fields[key] = int(value.split()[0])
+                if MEMINFO_REQUIRED.issubset(fields):
+                    break
+        # Sizes are in kB
+        total = fields[b"MemTotal"]
+        free = fields[b"MemFree"]
+        available = fields.get(b"MemAvailable")
+        if available is None:
+            # Kernels older than 3.14
+            available = (
+                free + fields.get(b"Buffers", 0) + fields.get(b"Cached", 0)
+                + fields.get(b"SReclaimable", 0)
+            )
+        if available > total:
+            # Values of the host seen from some containers
+            available = free
+        return RamSnapshot(
+            percent=round((total - available) / total * 100, 1),
+            total=total / 1024,
+            available=available / 1024,
+            used=(total - available) / 1024,
+            free=free / 1024,
+        )
+
+
+def make_cpu_collector(interval: Optional[float] = None) -> Collector:
+    """
+    Create the fastest CPU collector available.
+
+    Args:
+        interval: Time between two collections in seconds, the class default if None
+
+    Returns:
+        Collector: The /proc collector if /proc/stat can be read, the psutil one otherwise
+    """
+    try:
+        return ProcCpuCollector(interval)
+    except OSError:
+        return CpuCollector(interval)
+
+
+def make_ram_collector(interval: Optional[float] = None) -> Collector:
+    """
+    Create the fastest RAM collector available.
+
+    Args:
+        interval: Time between two collections in seconds, the class default if None
+
+    Returns:
+        Collector: The /proc collector if /proc/meminfo can be read, the psutil one otherwise
+    """
+    try:
+        return ProcRamCollector(interval)
+    except OSError:
+        return RamCollector(interval)
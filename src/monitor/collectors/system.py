@@ -0,0 +1,183 @@
+"""
+This module defines the collectors of the CPU and RAM usage.
+"""
+import operator
+from array import array
+from itertools import chain
+from typing import List, NamedTuple, Optional, Tuple
+
+import psutil
+
+from monitor.collectors.base import Collector
+
+CPU_COLLECTOR = "cpu"
+CPU_TIMES_COLLECTOR = "cpu_times"
+RAM_COLLECTOR = "ram"
+
+# States of the CPU time breakdown, those missing on a platform are left out. The guest
+# times are already counted in user and nice
+CPU_STATES = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+
+
+def cpu_time_states() -> Tuple[str, ...]:
+    """Return the states of `CPU_STATES` reported by the platform, in the same order."""
+    return tuple(state for state in CPU_STATES if state in psutil.cpu_times()._fields)
+
+
+class CpuSnapshot(NamedTuple):
+    """
+    CPU usage snapshot.
+
+    Attributes:
+        percent (List[float]): Usage percentage of each logical core
+    """
+
+    percent: List[float]
+
+
+class CpuTimesSnapshot(NamedTuple):
+    """
+    CPU time breakdown snapshot.
+
+    Attributes:
+        states (Tuple[str, ...]): States of the CPU time, in the order of the percentages
+        percent (List[List[float]]): Percentage of the time spent in each state, per logical
+                                     core
+        average (List[float]): Percentage of the time spent in each state, over all the cores
+    """
+
+    states: Tuple[str, ...]
+    percent: List[List[float]]
+    average: List[float]
+
+
+class RamSnapshot(NamedTuple):
+    """
+    RAM usage snapshot, sizes in MB.
+
+    Attributes:
+        percent (float): Total RAM usage percentage
+        total (float): Total RAM
+        available (float): Available RAM
+        used (float): Used RAM
+        free (float): Free RAM
+    """
+
+    percent: float
+    total: float
+    available: float
+    used: float
+    free: float
+
+
+class CpuCollector(Collector):
+    """
+    Collect the usage of each CPU core since the previous collection.
+    """
+
+    name = CPU_COLLECTOR
+    interval = 1.0
+
+    def __init__(self, interval: Optional[float] = None) -> None:
+        """
+        Initialize the collector, the CPU times are first read by the first collection.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+        """
+        super().__init__(interval)
+        self._primed = False
+
+    def collect(self) -> Optional[CpuSnapshot]:
+        """
+        Take a snapshot of the CPU usage, computed from the CPU times elapsed since the
+        previous call, without sleeping.
+
+        Returns:
+            Optional[CpuSnapshot]: Usage percentage of each logical core, None on the first
+                                   call which only reads the initial CPU times
+        """
+        percent = psutil.cpu_percent(percpu=True, interval=None)
+        if not self._primed:
+            self._primed = True
+            return None
+        return CpuSnapshot(percent)
+
+
+class CpuTimesCollector(Collector):
+    """
+    Collect the share of each state in the CPU time of each core since the previous
+    collection, such as iowait and the steal time taken by the hypervisor.
+
+    The CPU times are kept as a flat cores x states matrix in an array, and the deltas of all
+    the cores and states are computed in a single pass over both matrices.
+    """
+
+    name = CPU_TIMES_COLLECTOR
+    interval = 1.0
+
+    def __init__(self, interval: Optional[float] = None) -> None:
+        """
+        Initialize the collector, the CPU times are first read by the first collection.
+
+        Args:
+            interval: Time between two collections in seconds, the class default if None
+        """
+        super().__init__(interval)
+        self.states = cpu_time_states()
+        self._getter = operator.attrgetter(*self.states)
+        self._previous: Optional["array[float]"] = None
+
+    def collect(self) -> Optional[CpuTimesSnapshot]:
+        """
+        Take a snapshot of the CPU time breakdown, computed from the CPU times elapsed since
+        the previous call.
+
+        Returns:
+            Optional[CpuTimesSnapshot]: Percentage of each state per core and over all the
+                                        cores, None on the first call, or after a core went
+                                        online or offline, which only reads the CPU times
+        """
+        current = array(
+            "d", chain.from_iterable(map(self._getter, psutil.cpu_times(percpu=True)))
+        )
+        previous, self._previous = self._previous, current
+        if previous is None or len(previous) != len(current):
+            return None
+        # Counters may go slightly backwards on some virtualized hosts
+        deltas = [max(delta, 0.0) for delta in map(operator.sub, current, previous)]
+        width = len(self.states)
+        percent = []
+        for start in range(0, len(deltas), width):
+            row = deltas[start:start + width]
+            total = sum(row)
+            percent.append([round(delta / total * 100, 1) if total else 0.0 for delta in row])
+        columns = [deltas[state::width] for state in range(width)]
+        total = sum(deltas)
+        average = [round(sum(column) / total * 100, 1) if total else 0.0 for column in columns]
+        return CpuTimesSnapshot(self.states, percent, average)
+
+
+class RamCollector(Collector):
+    """
+    Collect the RAM usage.
+    """
+
+    name = RAM_COLLECTOR
+    interval = 1.0
+
+    def collect(self) -> RamSnapshot:
+        """
+        Take a snapshot of the RAM usage.
+
+        Returns:
+            RamSnapshot: RAM usage, sizes converted to MB
+        """
+        ram = psutil.virtual_memory()
+        return RamSnapshot(
+            percent=ram.percent,
+            total=ram.total / (1024 * 1024),
+            available=ram.available / (1024 * 1024),
+            used=ram.used / (1024 * 1024),
+            free=ram.free / (1024 * 1024),
+        )
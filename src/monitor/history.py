@@ -0,0 +1,466 @@
+"""
+This module defines a fixed-size, in-memory history of sampled metrics.
+
+A `MetricHistory` preallocates one `array('d')` ring per series (one per CPU core, for
+instance) plus one for the sample times, so recording a raw sample never allocates. Queries
+select a time range with a binary search and downsample it into min/max/avg/p95 buckets
+using slices and the C-implemented `sorted` and `sum` builtins, so a chart of a whole day is
+a single cheap request.
+
+The raw ring only holds a day of samples, so each history also rolls its samples up into
+cascading tiers of 1-minute and 1-hour buckets. Each raw sample updates the open minute
+bucket, and each closed minute bucket updates the open hour bucket, with a constant amount
+of work per sample. The 95th percentile of a bucket comes from a logarithmic histogram of
+its values, within 1% of the exact value, which merges into the bucket of the next tier
+without keeping the values. `MetricHistory.query` serves a time range from the coarsest tier
+which still gives a bucket per requested point, so long ranges stay cheap to query.
+"""
+import bisect
+import math
+import operator
+import threading
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Samples kept per history, a day of samples at the default 1 second interval
+HISTORY_SIZE = 24 * 60 * 60
+# Rollup tiers, by name: bucket duration in seconds and number of buckets kept, a week of
+# minutes and 90 days of hours
+ROLLUP_TIERS: Tuple[Tuple[str, float, int], ...] = (
+    ("1m", 60.0, 7 * 24 * 60),
+    ("1h", 3600.0, 90 * 24),
+)
+# Name of the tier of the raw samples
+RAW_TIER = "raw"
+# Longest time range summarized from the raw samples when a rollup tier covers it, in
+# seconds, longer ranges are summarized from the finest rollup tier whatever the points
+RAW_QUERY_SPAN = 3600.0
+# Maximum number of buckets of a query
+HISTORY_MAX_POINTS = 1000
+# Percentile of the values reported by each bucket
+PERCENTILE = 0.95
+# Relative accuracy of the percentiles of the rollup buckets
+ROLLUP_ACCURACY = 0.01
+# Growth factor of the histogram bins, a value v falls in the bin ceil(log(v, gamma))
+_LOG_GAMMA = math.log((1 + ROLLUP_ACCURACY) / (1 - ROLLUP_ACCURACY))
+# Bin of the values which are not positive, reported as zero
+_ZERO_BIN = -(2**62)
+
+
+class HistoryBucket(NamedTuple):
+    """
+    Downsampled samples of a history.
+
+    Attributes:
+        timestamp (datetime): Time of the first sample of the bucket
+        minimum (List[float]): Smallest value of each series
+        maximum (List[float]): Largest value of each series
+        average (List[float]): Mean value of each series
+        p95 (List[float]): 95th percentile of each series, for buckets merging several
+                           rollup buckets the largest of their percentiles
+    """
+
+    timestamp: datetime
+    minimum: List[float]
+    maximum: List[float]
+    average: List[float]
+    p95: List[float]
+
+
+class _OpenBucket:
+    """
+    Bucket of a rollup tier being filled, with a histogram of the values of each series.
+    """
+
+    __slots__ = ("start", "count", "minimum", "maximum", "total", "bins")
+
+    def __init__(self, start: float, size: int) -> None:
+        self.start = start
+        self.count = 0
+        self.minimum = [math.inf] * size
+        self.maximum = [-math.inf] * size
+        self.total = [0.0] * size
+        # Number of values in each logarithmic bin, by bin index, per series
+        self.bins: List[Dict[int, int]] = [{} for _ in range(size)]
+
+    def add(self, values: Sequence[float]) -> None:
+        """Account for a raw sample."""
+        self.count += 1
+        for index, value in enumerate(values):
+            if value < self.minimum[index]:
+                self.minimum[index] = value
+            if value > self.maximum[index]:
+                self.maximum[index] = value
+            self.total[index] += value
+            key = math.ceil(math.log(value) / _LOG_GAMMA) if value > 0 else _ZERO_BIN
+            bins = self.bins[index]
+            bins[key] = bins.get(key, 0) + 1
+
+    def merge(self, other: "_OpenBucket") -> None:
+        """Account for the samples of a closed bucket of the previous tier."""
+        self.count += other.count
+        for index, bins in enumerate(self.bins):
+            self.minimum[index] = min(self.minimum[index], other.minimum[index])
+            self.maximum[index] = max(self.maximum[index], other.maximum[index])
+            self.total[index] += other.total[index]
+            for key, count in other.bins[index].items():
+                bins[key] = bins.get(key, 0) + count
+
+    def percentile(self, index: int) -> float:
+        """Return the percentile of a series, within the accuracy of its histogram."""
+        rank = math.ceil(PERCENTILE * self.count)
+        seen = 0
+        for key in sorted(self.bins[index]):
+            seen += self.bins[index][key]
+            if seen >= rank:
+                break
+        if key == _ZERO_BIN:
+            return 0.0
+        # Middle of the bin in relative terms, bounded by the values actually seen
+        value = 2 * math.exp(key * _LOG_GAMMA) / (math.exp(_LOG_GAMMA) + 1)
+        return min(max(value, self.minimum[index]), self.maximum[index])
+
+
+class RollupTier:
+    """
+    Ring buffer of fixed-duration buckets summarizing the samples of a history.
+
+    Attributes:
+        name (str): Name of the tier, such as "1m"
+        duration (float): Duration of a bucket in seconds, buckets start at multiples of it
+        capacity (int): Number of closed buckets kept, older buckets are overwritten
+    """
+
+    def __init__(self, name: str, duration: float, capacity: int, size: int) -> None:
+        """
+        Initialize an empty tier, allocating the memory of its closed buckets.
+
+        Args:
+            name: Name of the tier
+            duration: Duration of a bucket in seconds
+            capacity: Number of closed buckets kept
+            size: Number of series
+        """
+        self.name = name
+        self.duration = duration
+        self.capacity = capacity
+        self._size = size
+        self._times = array("d", bytes(8 * capacity))
+        self._counts = array("d", bytes(8 * capacity))
+        # Minimum, maximum, average and percentile rings of each series
+        self._columns = [
+            [array("d", bytes(8 * capacity)) for _ in range(size)] for _ in range(4)
+        ]
+        self._count = 0
+        self._open: Optional[_OpenBucket] = None
+
+    def __len__(self) -> int:
+        """Number of buckets, the open one included."""
+        return min(self._count, self.capacity) + (self._open is not None)
+
+    def _bucket(self, timestamp: float) -> Tuple[_OpenBucket, Optional[_OpenBucket]]:
+        """Return the bucket of a time, opened if needed, and the bucket it closed."""
+        opened = self._open
+        start = timestamp - timestamp % self.duration
+        if opened is not None and start <= opened.start:
+            # Late samples count in the open bucket
+            return opened, None
+        self._open = _OpenBucket(start, self._size)
+        if opened is not None:
+            self._close(opened)
+        return self._open, opened
+
+    def _close(self, bucket: _OpenBucket) -> None:
+        """Write a closed bucket to the rings."""
+        slot = self._count % self.capacity
+        self._times[slot] = bucket.start
+        self._counts[slot] = bucket.count
+        minimum, maximum, average, p95 = self._columns
+        for index in range(self._size):
+            minimum[index][slot] = bucket.minimum[index]
+            maximum[index][slot] = bucket.maximum[index]
+            average[index][slot] = bucket.total[index] / bucket.count
+            p95[index][slot] = bucket.percentile(index)
+        self._count += 1
+
+    def add(self, timestamp: float, values: Sequence[float]) -> Optional[_OpenBucket]:
+        """
+        Account for a raw sample.
+
+        Args:
+            timestamp: Time of the sample, in seconds since the epoch
+            values: Value of each series
+
+        Returns:
+            Optional[_OpenBucket]: The bucket closed by the sample, if any
+        """
+        bucket, closed = self._bucket(timestamp)
+        bucket.add(values)
+        return closed
+
+    def merge(self, closed: _OpenBucket) -> Optional[_OpenBucket]:
+        """
+        Account for a closed bucket of the previous tier.
+
+        Args:
+            closed: Bucket closed by the previous tier
+
+        Returns:
+            Optional[_OpenBucket]: The bucket of this tier closed by the merge, if any
+        """
+        bucket, closed_here = self._bucket(closed.start)
+        bucket.merge(closed)
+        return closed_here
+
+    def _first_slot(self) -> int:
+        """Return the slot of the oldest closed bucket."""
+        return self._count % self.capacity if self._count > self.capacity else 0
+
+    def oldest(self) -> Optional[float]:
+        """Return the start of the oldest bucket, None if the tier is empty."""
+        if self._count:
+            return self._times[self._first_slot()]
+        return None if self._open is None else self._open.start
+
+    def _ordered(self, ring: "array[float]") -> "array[float]":
+        """Return the closed buckets of a ring, oldest first."""
+        start = self._first_slot()
+        return ring[start:min(self._count, self.capacity)] + ring[:start]
+
+    def downsample(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        points: int = 300,
+    ) -> List[HistoryBucket]:
+        """
+        Merge the buckets overlapping a time range into at most `points` buckets.
+
+        The open bucket counts as the newest bucket, with the samples it has so far.
+
+        Args:
+            since: Start of the range in seconds since the epoch, None for the oldest bucket
+            until: End of the range in seconds since the epoch, None for the newest bucket
+            points: Maximum number of buckets
+
+        Returns:
+            List[HistoryBucket]: Buckets, oldest first
+        """
+        times = self._ordered(self._times).tolist()
+        closed = len(times)
+        opened = self._open
+        if opened is not None and opened.count:
+            times.append(opened.start)
+        start = 0 if since is None else bisect.bisect_right(times, since - self.duration)
+        stop = len(times) if until is None else bisect.bisect_right(times, until)
+        if stop <= start:
+            return []
+        # Only the closed buckets of the range are boxed
+        counts = self._ordered(self._counts)[start:stop].tolist()
+        columns = [
+            [self._ordered(ring)[start:stop].tolist() for ring in rings]
+            for rings in self._columns
+        ]
+        if stop > closed:
+            counts.append(opened.count)
+            for index in range(self._size):
+                columns[0][index].append(opened.minimum[index])
+                columns[1][index].append(opened.maximum[index])
+                columns[2][index].append(opened.total[index] / opened.count)
+                columns[3][index].append(opened.percentile(index))
+        times = times[start:stop]
+        size = stop - start
+        minimum, maximum, average, p95 = columns
+        count = min(points, size)
+        buckets = []
+        for i in range(count):
+            low, high = i * size // count, (i + 1) * size // count
+            weights = counts[low:high]
+            total = sum(weights)
+            buckets.append(HistoryBucket(
+                datetime.fromtimestamp(times[low], tz=timezone.utc),
+                [min(column[low:high]) for column in minimum],
+                [max(column[low:high]) for column in maximum],
+                [
+                    sum(map(operator.mul, column[low:high], weights)) / total
+                    for column in average
+                ],
+                [max(column[low:high]) for column in p95],
+            ))
+        return buckets
+
+
+class MetricHistory:
+    """
+    Ring buffer of timestamped samples of several series.
+
+    Attributes:
+        series (List[str]): Names of the series, one value of each per sample
+        capacity (int): Number of samples kept, older samples are overwritten
+        tiers (List[RollupTier]): Rollup tiers, finest first
+    """
+
+    def __init__(
+        self,
+        series: Sequence[str],
+        capacity: int = HISTORY_SIZE,
+        tiers: Sequence[Tuple[str, float, int]] = ROLLUP_TIERS,
+    ) -> None:
+        """
+        Initialize an empty history, allocating the memory of its raw samples and of its
+        closed rollup buckets.
+
+        Args:
+            series: Names of the series
+            capacity: Number of samples kept
+            tiers: Name, bucket duration in seconds and number of buckets of each rollup
+                   tier, finest first, each duration a multiple of the previous one
+        """
+        self.series = list(series)
+        self.capacity = capacity
+        self.tiers = [
+            RollupTier(name, duration, size, len(self.series))
+            for name, duration, size in tiers
+        ]
+        self._times = array("d", bytes(8 * capacity))
+        self._columns = [array("d", bytes(8 * capacity)) for _ in self.series]
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def append(self, timestamp: float, values: Sequence[float]) -> None:
+        """
+        Record a sample, overwriting the oldest one when the history is full.
+
+        Args:
+            timestamp: Time of the sample, in seconds since the epoch
+            values: Value of each series
+
+        Raises:
+            ValueError: If there is not exactly one value per series
+        """
+        if len(values) != len(self._columns):
+            raise ValueError(f"Expected {len(self._columns)} values, got {len(values)}")
+        with self._lock:
+            slot = self._count % self.capacity
+            self._times[slot] = timestamp
+            for column, value in zip(self._columns, values):
+                column[slot] = value
+            self._count += 1
+            if self.tiers:
+                # Cascade the closed buckets, one tier per closed bucket at most
+                closed = self.tiers[0].add(timestamp, values)
+                for tier in self.tiers[1:]:
+                    if closed is None:
+                        break
+                    closed = tier.merge(closed)
+
+    def _first_slot(self) -> int:
+        """Return the slot of the oldest sample."""
+        return self._count % self.capacity if self._count > self.capacity else 0
+
+    def _ordered(self, ring: "array[float]") -> "array[float]":
+        """Return the samples of a ring, oldest first."""
+        start = self._first_slot()
+        return ring[start:len(self)] + ring[:start]
+
+    def downsample(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        points: int = 300,
+    ) -> List[HistoryBucket]:
+        """
+        Summarize the samples of a time range into at most `points` buckets.
+
+        Buckets hold the same number of samples, give or take one. Only the raw samples are
+        summarized, see `query` for the rollup tiers.
+
+        Args:
+            since: Start of the range in seconds since the epoch, None for the oldest sample
+            until: End of the range in seconds since the epoch, None for the newest sample
+            points: Maximum number of buckets
+
+        Returns:
+            List[HistoryBucket]: Buckets, oldest first
+        """
+        with self._lock:
+            times = self._ordered(self._times)
+            start = 0 if since is None else bisect.bisect_left(times, since)
+            stop = len(times) if until is None else bisect.bisect_right(times, until)
+            columns = [self._ordered(column)[start:stop] for column in self._columns]
+        # Boxing the values once makes the min/max/sum passes cheaper
+        columns = [column.tolist() for column in columns]
+        size = stop - start
+        if size <= 0:
+            return []
+        count = min(points, size)
+        buckets = []
+        for i in range(count):
+            low, high = i * size // count, (i + 1) * size // count
+            # Sorted slices give the minimum, maximum and percentile by index
+            slices = [sorted(column[low:high]) for column in columns]
+            rank = math.ceil(PERCENTILE * (high - low)) - 1
+            buckets.append(HistoryBucket(
+                datetime.fromtimestamp(times[start + low], tz=timezone.utc),
+                [values[0] for values in slices],
+                [values[-1] for values in slices],
+                [sum(values) / (high - low) for values in slices],
+                [values[rank] for values in slices],
+            ))
+        return buckets
+
+    def query(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        points: int = 300,
+    ) -> Tuple[str, List[HistoryBucket]]:
+        """
+        Summarize a time range into at most `points` buckets, from the coarsest tier whose
+        buckets are not longer than a point, or from a coarser tier reaching further back
+        when the finer ones do not cover the start of the range. Ranges longer than
+        `RAW_QUERY_SPAN` are not summarized from the raw samples while a rollup tier has
+        buckets, even if it gives fewer buckets than `points`.
+
+        Args:
+            since: Start of the range in seconds since the epoch, None for the oldest sample
+                   of any tier
+            until: End of the range in seconds since the epoch, None for the newest sample
+            points: Maximum number of buckets
+
+        Returns:
+            Tuple[str, List[HistoryBucket]]: Name of the tier summarized, "raw" for the raw
+                                             samples, and buckets, oldest first
+        """
+        with self._lock:
+            oldest = self._times[self._first_slot()] if self._count else None
+            newest = self._times[(self._count - 1) % self.capacity] if self._count else None
+            starts = [oldest] + [tier.oldest() for tier in self.tiers]
+            first = min((start for start in starts if start is not None), default=None)
+            first = first if since is None else since
+            last = newest if until is None else until
+            chosen: Optional[RollupTier] = None
+            if first is not None and last is not None:
+                resolution = (last - first) / points
+                if last - first > RAW_QUERY_SPAN and self.tiers:
+                    # Sorting the raw samples of a long range costs too much per query
+                    resolution = max(resolution, self.tiers[0].duration)
+                # Start of the samples of the chosen tier
+                covered = oldest
+                for tier, start in zip(self.tiers, starts[1:]):
+                    if start is None:
+                        # Coarser tiers are only fed by this one
+                        break
+                    # The first bucket of a tier may start before the samples of the others
+                    further = covered is None or (
+                        covered > first and start + tier.duration <= covered
+                    )
+                    if tier.duration <= resolution or further:
+                        chosen, covered = tier, start
+            if chosen is not None:
+                return chosen.name, chosen.downsample(since, until, points)
+        return RAW_TIER, self.downsample(since, until, points)
@@ -0,0 +1,182 @@
+"""
+This module defines a parser and running aggregates for Apache error logs.
+
+Both the Apache 2.2 and 2.4 error log formats are understood:
+
+    [Wed Oct 11 14:32:52 2000] [error] [client 127.0.0.1] client denied by server ...
+    [Wed Oct 11 14:32:52.123456 2000] [core:error] [pid 35708:tid 4328636416] ...
+
+Messages are grouped once normalized: addresses, paths, hexadecimal and decimal numbers are
+replaced by placeholders, so "File does not exist: /a" and "File does not exist: /b" count
+as the same message. `ErrorLogAggregate` shares the base class of `LogAggregate`, so error
+logs are tailed by a `LogIngestor` too.
+"""
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from monitor.log_ingest import RECENT_ERRORS_LIMIT, RunningAggregate
+from monitor.log_parser import MONTHS
+
+_ERROR_PATTERN = re.compile(
+    r"\[(?P<time>[^\]]+)\] \[(?:(?P<module>[^:\]]*):)?(?P<severity>[^\]]+)\]"
+    r"(?: \[pid (?P<pid>\d+)[^\]]*\])?(?: \[client (?P<client>[^\]]+)\])? (?P<message>.*)"
+)
+# Placeholders substituted to the variable parts of messages, in this order
+_PLACEHOLDERS: List[Tuple["re.Pattern[str]", str]] = [
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"(?<![\w<>])(?:[A-Za-z]:)?/[^\s,;:'\"()]*"), "<path>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b"), "<hex>"),
+    (re.compile(r"\b\d+\b"), "<n>"),
+]
+# Normalized messages already seen, cleared when full
+_MESSAGES: Dict[str, str] = {}
+_CACHE_LIMIT = 4096
+
+
+class ErrorRecord(NamedTuple):
+    """
+    Parsed error log line.
+
+    Attributes:
+        timestamp (datetime): Time of the error, naive as written in the log
+        severity (str): Log level, such as "error" or "warn"
+        module (str): Module that logged the error, empty for Apache 2.2 logs
+        pid (Optional[int]): Process id, if logged
+        client (str): Client address, empty if not logged
+        message (str): Error message
+    """
+
+    timestamp: datetime
+    severity: str
+    module: str
+    pid: Optional[int]
+    client: str
+    message: str
+
+
+def parse_error_timestamp(value: str) -> datetime:
+    """
+    Decode an error log timestamp such as "Wed Oct 11 14:32:52.123456 2000".
+
+    Args:
+        value: Timestamp without the surrounding brackets
+
+    Returns:
+        datetime: Naive datetime, as written in the log
+
+    Raises:
+        ValueError: If the timestamp is invalid
+    """
+    try:
+        _, month, day, clock, year = value.split()
+        clock, _, fraction = clock.partition(".")
+        hour, minute, second = clock.split(":")
+        return datetime(
+            int(year), MONTHS[month], int(day), int(hour), int(minute), int(second),
+            int(fraction[:6].ljust(6, "0")) if fraction else 0,
+        )
+    except (KeyError, ValueError) as exc:
+        raise ValueError(f"Invalid timestamp: {value}") from exc
+
+
+def normalize_message(message: str) -> str:
+    """
+    Replace the variable parts of an error message by placeholders.
+
+    Args:
+        message: Error message
+
+    Returns:
+        str: Message with "<ip>", "<path>", "<hex>" and "<n>" placeholders
+    """
+    normalized = _MESSAGES.get(message)
+    if normalized is None:
+        normalized = message
+        for pattern, placeholder in _PLACEHOLDERS:
+            normalized = pattern.sub(placeholder, normalized)
+        if len(_MESSAGES) >= _CACHE_LIMIT:
+            _MESSAGES.clear()
+        _MESSAGES[message] = normalized
+    return normalized
+
+
+def parse_error_line(line: str) -> ErrorRecord:
+    """
+    Parse a single error log line.
+
+    Args:
+        line: Raw log line, without its line terminator
+
+    Returns:
+        ErrorRecord: Parsed log line
+
+    Raises:
+        ValueError: If the line is not a valid error log line
+    """
+    match = _ERROR_PATTERN.fullmatch(line)
+    if match is None:
+        raise ValueError(f"Invalid error log line: {line}")
+    pid = match.group("pid")
+    return ErrorRecord(
+        parse_error_timestamp(match.group("time")),
+        match.group("severity"),
+        match.group("module") or "",
+        int(pid) if pid else None,
+        match.group("client") or "",
+        match.group("message"),
+    )
+
+
+class ErrorLogAggregate(RunningAggregate):
+    """
+    Running aggregates over parsed error log entries.
+
+    Attributes:
+        total (int): Number of parsed entries
+        severity_counter (Counter): Number of entries per severity
+        module_counter (Counter): Number of entries per module
+        message_counter (Counter): Number of entries per normalized message
+    """
+
+    def __init__(self, recent_limit: int = RECENT_ERRORS_LIMIT) -> None:
+        """
+        Initialize an empty aggregate.
+
+        Args:
+            recent_limit: Number of most recent entries to keep
+        """
+        super().__init__(recent_limit)
+        self.severity_counter: Counter = Counter()
+        self.module_counter: Counter = Counter()
+        self.message_counter: Counter = Counter()
+
+    def add(self, entry: ErrorRecord, seq: int) -> None:
+        """
+        Fold a parsed entry into the aggregate.
+
+        Args:
+            entry: Parsed error log entry
+            seq: Position of the entry in the log, unique per aggregate
+        """
+        self.total += 1
+        self.severity_counter[entry.severity] += 1
+        self.module_counter[entry.module] += 1
+        self.message_counter[normalize_message(entry.message)] += 1
+        self._push_recent((entry.timestamp, -seq, entry))
+
+    def merge(self, other: "ErrorLogAggregate", seq_offset: int = 0) -> None:
+        """Fold another aggregate, covering later entries, into this one."""
+        super().merge(other, seq_offset)
+        self.severity_counter.update(other.severity_counter)
+        self.module_counter.update(other.module_counter)
+        self.message_counter.update(other.message_counter)
+
+    def recent_entries(self) -> List[ErrorRecord]:
+        """Return the kept entries, most recent first."""
+        return self._recent_entries()
+
+    def top_messages(self, limit: int) -> List[Tuple[str, int]]:
+        """Return the `limit` most frequent normalized messages with their count."""
+        return self.message_counter.most_common(limit)
@@ -0,0 +1,269 @@
+"""
+This module defines a sparse, persistent index of access log timestamps.
+
+Every `stride` bytes the index samples the first complete line starting after that position
+and records (timestamp, line offset). Sampled timestamps are stored as a running maximum so
+they can be binary searched even though access logs are only roughly time ordered: lines are
+written when requests complete, so they are assumed to be out of order by at most `skew`
+seconds.
+
+The index is saved next to other indexes in a directory, keyed by the log path, together
+with the identity and head of the log file. It is reused after a restart when the file is
+still the same, and silently rebuilt when the file was rotated or truncated. As the saved
+indexes are loaded back, their directory must be private to the user running the agent.
+"""
+import bisect
+import calendar
+import hashlib
+import json
+import os
+import re
+import stat
+import threading
+from array import array
+from datetime import datetime, timezone
+from typing import BinaryIO, Optional, Tuple
+
+from monitor.log_parser import parse_timestamp
+
+# Distance in bytes between two samples
+INDEX_STRIDE = 1024 * 1024
+# Maximum disorder of the log timestamps, in seconds
+INDEX_MAX_SKEW = 300
+# Number of leading bytes used to recognize the indexed file
+_HEAD_SIZE = 64
+# Number of bytes read to find a sampled line and its timestamp
+_PROBE_SIZE = 4096
+_TIMESTAMP_PATTERN = re.compile(rb"\[([^\]\n]{20,40})\]")
+
+
+def to_log_time(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Convert a query time to a naive time comparable with log timestamps.
+
+    Log timestamps are compared as written in the log, aware times are converted to UTC.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def to_seconds(timestamp: datetime) -> int:
+    """Convert a naive log timestamp to seconds since the epoch, as written in the log."""
+    return calendar.timegm(timestamp.timetuple())
+
+
+def private_index_dir(index_dir: str) -> str:
+    """
+    Create the directory of the saved indexes, readable and writable only by its owner.
+
+    Args:
+        index_dir: Directory of the saved indexes
+
+    Returns:
+        str: Absolute path of the directory
+
+    Raises:
+        PermissionError: If the directory is a symbolic link, is not owned by the user
+                         running the agent, or is writable by other users
+    """
+    index_dir = os.path.abspath(index_dir)
+    os.makedirs(index_dir, mode=0o700, exist_ok=True)
+    status = os.lstat(index_dir)
+    if not stat.S_ISDIR(status.st_mode):
+        raise PermissionError(f"Log index directory is not a directory: {index_dir}")
+    if hasattr(os, "getuid") and status.st_uid != os.getuid():
+        raise PermissionError(f"Log index directory owned by another user: {index_dir}")
+    if status.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"Log index directory writable by other users: {index_dir}")
+    return index_dir
+
+
+class TimestampIndex:
+    """
+    Sparse (timestamp -> byte offset) index of one access log file.
+
+    Attributes:
+        store_path (Optional[str]): File the index is saved to, None to keep it in memory
+        stride (int): Distance in bytes between two samples
+        skew (int): Maximum disorder of the log timestamps, in seconds
+        indexed_to (int): Position of the next sample
+    """
+
+    def __init__(
+        self,
+        store_path: Optional[str] = None,
+        stride: int = INDEX_STRIDE,
+        skew: int = INDEX_MAX_SKEW,
+    ) -> None:
+        """
+        Initialize the index, loading it from `store_path` if it was saved before.
+
+        Args:
+            store_path: File the index is saved to, None to keep it in memory
+            stride: Distance in bytes between two samples
+            skew: Maximum disorder of the log timestamps, in seconds
+        """
+        self.store_path = store_path
+        self.stride = stride
+        self.skew = skew
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    @classmethod
+    def for_log(cls, index_dir: Optional[str], log_path: str, **kwargs) -> "TimestampIndex":
+        """
+        Create the index of a log file, stored in `index_dir`.
+
+        Args:
+            index_dir: Directory of the saved indexes, None to keep the index in memory
+            log_path: Path of the indexed log file
+            **kwargs: Other arguments of the constructor
+
+        Returns:
+            TimestampIndex: Index of the log file
+        """
+        if index_dir is None:
+            return cls(None, **kwargs)
+        digest = hashlib.sha1(os.path.abspath(log_path).encode()).hexdigest()
+        return cls(os.path.join(index_dir, f"{digest}.json"), **kwargs)
+
+    def _reset(self) -> None:
+        """Drop every sample."""
+        self._identity: Optional[Tuple[int, int]] = None
+        self._head = b""
+        self.indexed_to = 0
+        self._times = array("q")
+        self._offsets = array("q")
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def sync(self, file: BinaryIO, size: int) -> None:
+        """
+        Validate the index against a log file and sample the bytes appended since.
+
+        Args:
+            file: Log file opened in binary mode
+            size: Number of bytes of the file to index
+        """
+        with self._lock:
+            stat = os.fstat(file.fileno())
+            identity = (stat.st_dev, stat.st_ino)
+            head = os.pread(file.fileno(), _HEAD_SIZE, 0)
+            if (
+                identity != self._identity
+                or size < self.indexed_to
+                or head[: len(self._head)] != self._head
+            ):
+                self._reset()
+                self._identity = identity
+            self._head = head
+            count = len(self._offsets)
+            while self.indexed_to < size:
+                sample = self._probe(file, self.indexed_to, size)
+                if sample is None:
+                    break
+                self.indexed_to += self.stride
+                if sample[1] >= 0 and (not self._offsets or sample[1] > self._offsets[-1]):
+                    previous = self._times[-1] if self._times else sample[0]
+                    self._times.append(max(previous, sample[0]))
+                    self._offsets.append(sample[1])
+            if len(self._offsets) != count:
+                self._save()
+
+    @staticmethod
+    def _probe(file: BinaryIO, position: int, size: int) -> Optional[Tuple[int, int]]:
+        """
+        Find the timestamp of the first complete line starting at or after `position`.
+
+        Returns:
+            Optional[Tuple[int, int]]: Timestamp in seconds and offset of the line, an
+                                       offset of -1 if no usable line was found, or None
+                                       if the line is not complete yet
+        """
+        start = position - 1 if position else 0
+        block = os.pread(file.fileno(), min(_PROBE_SIZE, size - start), start)
+        line_start = 0 if position == 0 else block.find(b"\n") + 1
+        if position and line_start == 0:
+            return (0, -1) if len(block) == _PROBE_SIZE else None
+        line_end = block.find(b"\n", line_start)
+        if line_end < 0:
+            return (0, -1) if len(block) == _PROBE_SIZE else None
+        match = _TIMESTAMP_PATTERN.search(block, line_start, line_end)
+        if match is None:
+            return 0, -1
+        try:
+            timestamp = parse_timestamp(match.group(1).decode("ascii"))
+        except (UnicodeDecodeError, ValueError):
+            return 0, -1
+        return to_seconds(timestamp), start + line_start
+
+    def window(
+        self, since: Optional[datetime], until: Optional[datetime]
+    ) -> Tuple[int, Optional[int]]:
+        """
+        Find the byte range holding every line logged between two times.
+
+        Args:
+            since: Naive start time as written in the log, None for the beginning
+            until: Naive end time as written in the log, None for the end
+
+        Returns:
+            Tuple[int, Optional[int]]: Start offset and end offset, None for the end of the
+                                       indexed file
+        """
+        with self._lock:
+            start, end = 0, None
+            if since is not None:
+                # Last sample whose preceding lines are all older than `since`
+                position = bisect.bisect_left(self._times, to_seconds(since) - self.skew)
+                if position > 0:
+                    start = self._offsets[position - 1]
+            if until is not None:
+                # First sample whose following lines are all newer than `until`
+                position = bisect.bisect_right(self._times, to_seconds(until) + 2 * self.skew)
+                if position < len(self._offsets):
+                    end = self._offsets[position]
+            return start, end
+
+    def _load(self) -> None:
+        """Load the index saved in `store_path`, if any."""
+        if self.store_path is None or not os.path.exists(self.store_path):
+            return
+        try:
+            with open(self.store_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data["stride"] != self.stride:
+                return
+            self._identity = tuple(data["identity"])
+            self._head = bytes.fromhex(data["head"])
+            self.indexed_to = data["indexed_to"]
+            self._times = array("q", data["times"])
+            self._offsets = array("q", data["offsets"])
+        except (OSError, ValueError, KeyError, TypeError):
+            self._reset()
+
+    def _save(self) -> None:
+        """Save the index in `store_path`, atomically."""
+        if self.store_path is None:
+            return
+        data = {
+            "stride": self.stride,
+            "identity": list(self._identity or ()),
+            "head": self._head.hex(),
+            "indexed_to": self.indexed_to,
+            "times": self._times.tolist(),
+            "offsets": self._offsets.tolist(),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+            temporary = f"{self.store_path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump(data, file)
+            os.replace(temporary, self.store_path)
+        except OSError:
+            # The index is only an optimization, it is rebuilt after a restart
+            pass
+
@@ -0,0 +1,326 @@
+"""
+This module defines an incremental, offset-checkpointed access log ingestion engine.
+
+A `LogIngestor` remembers, for one log file, the file identity (device, inode), the byte
+offset it has consumed up to and the trailing bytes of a line that has not been terminated
+yet. Each poll only reads the bytes appended since the previous poll and folds them into a
+`LogAggregate`, so the cost of a poll is proportional to the new data, not the file size.
+Rotation (new inode) and truncation (smaller size or rewritten head) reset the state.
+"""
+import heapq
+import os
+import threading
+from collections import Counter
+from typing import Any, BinaryIO, Callable, List, Optional, Tuple
+
+# Number of most recent error entries kept by an aggregate
+RECENT_ERRORS_LIMIT = 10
+# Number of bytes read from the log file per read() call
+READ_CHUNK_SIZE = 1024 * 1024
+# Number of leading bytes used to detect a file rewritten in place
+HEAD_FINGERPRINT_SIZE = 64
+
+
+class RunningAggregate:
+    """
+    Base class of the running aggregates over parsed log entries.
+
+    It counts the entries and keeps the `recent_limit` most recent of those passed to
+    `_push_recent`, in a bounded min-heap. Subclasses add their counters to `add` and
+    `merge`.
+
+    Attributes:
+        total (int): Number of parsed entries
+        recent_limit (int): Number of most recent entries kept
+    """
+
+    def __init__(self, recent_limit: int = RECENT_ERRORS_LIMIT) -> None:
+        """
+        Initialize an empty aggregate.
+
+        Args:
+            recent_limit: Number of most recent entries to keep
+        """
+        self.total = 0
+        self.recent_limit = recent_limit
+        # Min-heap of (timestamp, -seq, entry), the smallest item is evicted first
+        self._recent: List[Tuple[Any, int, Any]] = []
+
+    def _push_recent(self, item: Tuple[Any, int, Any]) -> None:
+        """Keep `item` if it is one of the `recent_limit` most recent entries."""
+        if len(self._recent) < self.recent_limit:
+            heapq.heappush(self._recent, item)
+        elif item[:2] > self._recent[0][:2]:
+            heapq.heapreplace(self._recent, item)
+
+    def merge(self, other: "RunningAggregate", seq_offset: int = 0) -> None:
+        """
+        Fold another aggregate into this one.
+
+        `other` must cover entries that come after the entries of this aggregate so that
+        the first-seen order of the counters is preserved.
+
+        Args:
+            other: Aggregate to merge, of the same class
+            seq_offset: Offset added to the sequence numbers of `other`, to merge the
+                        aggregate of another file
+        """
+        self.total += other.total
+        for timestamp, neg_seq, entry in other._recent:
+            self._push_recent((timestamp, neg_seq - seq_offset, entry))
+
+    def copy(self) -> "RunningAggregate":
+        """Return an independent copy of the aggregate."""
+        clone = type(self)(self.recent_limit)
+        clone.merge(self)
+        return clone
+
+    def _recent_entries(self) -> List[Any]:
+        """Return the kept entries, most recent first."""
+        return [item[2] for item in sorted(self._recent, key=lambda x: x[:2], reverse=True)]
+
+
+class LogAggregate(RunningAggregate):
+    """
+    Running aggregates over parsed access log entries.
+
+    Entries only need `timestamp`, `url` and `status_code` attributes. Each entry is added
+    with a sequence number (its byte offset in the log) which is used to break timestamp
+    ties the same way a stable sort over the file order would. Only the error entries are
+    kept as recent entries.
+
+    Attributes:
+        total (int): Number of parsed requests
+        success_count (int): Number of requests with a status code below 400
+        error_count (int): Number of requests with a status code of 400 or more
+        status_counter (Counter): Number of requests per status code
+        url_counter (Counter): Number of requests per URL
+    """
+
+    def __init__(self, recent_limit: int = RECENT_ERRORS_LIMIT) -> None:
+        """
+        Initialize an empty aggregate.
+
+        Args:
+            recent_limit: Number of most recent error entries to keep
+        """
+        super().__init__(recent_limit)
+        self.success_count = 0
+        self.error_count = 0
+        self.status_counter: Counter = Counter()
+        self.url_counter: Counter = Counter()
+
+    def add(self, entry: Any, seq: int) -> None:
+        """
+        Fold a parsed entry into the aggregate.
+
+        Args:
+            entry: Parsed log entry
+            seq: Position of the entry in the log, unique per aggregate
+        """
+        if self.count(entry.status_code, entry.url):
+            self._push_recent((entry.timestamp, -seq, entry))
+
+    def count(self, status_code: int, url: str) -> bool:
+        """
+        Count a request in the counters only, without keeping the entry.
+
+        Args:
+            status_code: HTTP status code of the request
+            url: Requested URL
+
+        Returns:
+            bool: Whether the request is an error
+        """
+        self.total += 1
+        self.status_counter[str(status_code)] += 1
+        self.url_counter[url] += 1
+        if status_code < 400:
+            self.success_count += 1
+            return False
+        self.error_count += 1
+        return True
+
+    def merge(self, other: "LogAggregate", seq_offset: int = 0) -> None:
+        """Fold another aggregate, covering later entries, into this one."""
+        super().merge(other, seq_offset)
+        self.success_count += other.success_count
+        self.error_count += other.error_count
+        self.status_counter.update(other.status_counter)
+        self.url_counter.update(other.url_counter)
+
+    def recent_errors(self) -> List[Any]:
+        """Return the kept error entries, most recent first."""
+        return self._recent_entries()
+
+    def top_urls(self, limit: int) -> List[Tuple[str, int]]:
+        """Return the `limit` most requested URLs with their request count."""
+        return self.url_counter.most_common(limit)
+
+
+def add_line(aggregate: LogAggregate, parse: Callable[[str], Any], line: bytes, seq: int) -> None:
+    """
+    Parse a raw line and fold it into an aggregate, skipping invalid lines.
+
+    Args:
+        aggregate: Aggregate to update
+        parse: Callable turning a stripped line into an entry, raising ValueError
+        line: Raw line, without its newline
+        seq: Byte offset of the line in the log
+    """
+    try:
+        entry = parse(line.decode("utf-8", errors="replace").strip())
+    except ValueError:
+        return
+    aggregate.add(entry, seq)
+
+
+def ingest_range(
+    file: BinaryIO,
+    start: int,
+    end: int,
+    parse: Callable[[str], Any],
+    aggregate: LogAggregate,
+    partial: bytes = b"",
+    read_size: int = READ_CHUNK_SIZE,
+) -> Tuple[int, bytes]:
+    """
+    Fold the complete lines found between two byte offsets of a file into an aggregate.
+
+    Args:
+        file: Log file opened in binary mode
+        start: Offset to start reading from
+        end: Offset to stop reading at
+        parse: Callable turning a stripped line into an entry, raising ValueError
+        aggregate: Aggregate to update
+        partial: Unterminated line read before `start`
+        read_size: Number of bytes read per read() call
+
+    Returns:
+        Tuple[int, bytes]: Offset reached, lower than `end` if the file shrank, and the
+                           trailing bytes of the last unterminated line
+    """
+    file.seek(start)
+    offset = start
+    while offset < end:
+        chunk = file.read(min(read_size, end - offset))
+        if not chunk:
+            break
+        seq = offset - len(partial)
+        offset += len(chunk)
+        lines = (partial + chunk).split(b"\n")
+        partial = lines.pop()
+        for line in lines:
+            add_line(aggregate, parse, line, seq)
+            seq += len(line) + 1
+    return offset, partial
+
+
+class LogIngestor:
+    """
+    Tail a single log file and keep its aggregates up to date.
+
+    Attributes:
+        path (str): Path of the tailed log file
+        offset (int): Number of bytes of the file consumed so far
+        partial (bytes): Trailing bytes of a line that has no newline yet
+        aggregate (LogAggregate): Aggregates over all complete lines consumed
+    """
+
+    def __init__(
+        self,
+        path: str,
+        parse: Callable[[str], Any],
+        read_size: int = READ_CHUNK_SIZE,
+        bulk: Optional[Callable[[str, int], Tuple[int, LogAggregate]]] = None,
+        reader: Callable[..., Tuple[int, bytes]] = ingest_range,
+        index: Optional[Any] = None,
+        aggregate_factory: Callable[[], Any] = LogAggregate,
+    ) -> None:
+        """
+        Initialize the ingestor, nothing is read until the first poll.
+
+        Args:
+            path: Path of the log file to tail
+            parse: Callable turning a stripped line into an entry, raising ValueError
+            read_size: Number of bytes read per read() call
+            bulk: Optional callable analyzing the start of a file up to a size in one go,
+                  returning the offset reached (just after a newline) and the aggregate.
+                  It is used for the first poll of a file instead of reading it line by line.
+            reader: Function folding a byte range into the aggregate, with the signature of
+                    `ingest_range`
+            index: Optional timestamp index of the file, extended at each poll
+            aggregate_factory: Callable creating an empty aggregate, with the interface of
+                               `LogAggregate`
+        """
+        self.path = path
+        self.read_size = read_size
+        self._parse = parse
+        self._bulk = bulk
+        self._reader = reader
+        self.index = index
+        self._aggregate_factory = aggregate_factory
+        self._lock = threading.Lock()
+        self._identity: Optional[Tuple[int, int]] = None
+        self._head = b""
+        self.offset = 0
+        self.partial = b""
+        self.aggregate = aggregate_factory()
+
+    def reset(self) -> None:
+        """Forget everything read so far, the next poll restarts from byte 0."""
+        self._identity = None
+        self._head = b""
+        self.offset = 0
+        self.partial = b""
+        self.aggregate = self._aggregate_factory()
+
+    def poll(self) -> LogAggregate:
+        """
+        Consume the bytes appended since the previous poll.
+
+        Returns:
+            LogAggregate: Aggregates over the whole file, including a trailing line
+                          without newline. It must not be modified by the caller.
+
+        Raises:
+            FileNotFoundError: If the log file does not exist
+        """
+        with self._lock:
+            with open(self.path, "rb") as file:
+                stat = os.fstat(file.fileno())
+                identity = (stat.st_dev, stat.st_ino)
+                if identity != self._identity or self._rewritten(file, stat.st_size):
+                    self.reset()
+                    self._identity = identity
+                if stat.st_size > self.offset:
+                    self._consume(file, stat.st_size)
+                if self.index is not None:
+                    self.index.sync(file, stat.st_size)
+            return self._snapshot()
+
+    def _rewritten(self, file: BinaryIO, size: int) -> bool:
+        """Tell whether the file was truncated or rewritten since the last poll."""
+        if size < self.offset:
+            return True
+        if not self._head:
+            return False
+        return os.pread(file.fileno(), len(self._head), 0) != self._head
+
+    def _consume(self, file: BinaryIO, size: int) -> None:
+        """Parse the bytes between the current offset and `size`."""
+        if self.offset == 0 and self._bulk is not None:
+            self.offset, self.aggregate = self._bulk(self.path, size)
+        self.offset, self.partial = self._reader(
+            file, self.offset, size, self._parse, self.aggregate, self.partial, self.read_size
+        )
+        if len(self._head) < HEAD_FINGERPRINT_SIZE:
+            self._head = os.pread(file.fileno(), HEAD_FINGERPRINT_SIZE, 0)[: self.offset]
+
+    def _snapshot(self) -> LogAggregate:
+        """Return the aggregate, accounting for a trailing line without newline."""
+        if not self.partial.strip():
+            return self.aggregate
+        aggregate = self.aggregate.copy()
+        add_line(aggregate, self._parse, self.partial, self.offset - len(self.partial))
+        return aggregate
@@ -0,0 +1,178 @@
+"""
+This module defines a multi-core analyzer for large access log files.
+
+The file is split into newline-aligned byte ranges, each range is parsed by a worker of a
+`ProcessPoolExecutor` into a partial `LogAggregate`, and the partial aggregates are merged
+in file order. Entries are keyed by their byte offset, so the merged result is identical to
+the one of a serial read of the same bytes.
+"""
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from monitor.log_ingest import READ_CHUNK_SIZE, LogAggregate
+from monitor.log_parser import LogParser
+from monitor.log_scan import RANGE_READERS, TEXT_MODE
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+# Files smaller than this are not worth the inter-process overhead
+PARALLEL_MIN_SIZE = 64 * 1024 * 1024
+# Number of ranges per worker, to balance uneven ranges
+RANGES_PER_WORKER = 4
+
+# Parsers of a worker process, keyed by log format
+_PARSERS: Dict[str, LogParser] = {}
+
+
+def split_ranges(path: str, size: int, count: int) -> List[Tuple[int, int]]:
+    """
+    Split the first `size` bytes of a file into newline-aligned byte ranges.
+
+    Every range starts at the beginning of a line and every range but the last ends just
+    after a newline.
+
+    Args:
+        path: Path of the file
+        size: Number of bytes to split
+        count: Target number of ranges
+
+    Returns:
+        List[Tuple[int, int]]: Ordered (start, end) byte ranges covering [0, size)
+    """
+    bounds = [0]
+    with open(path, "rb") as file:
+        for i in range(1, count):
+            target = max(size * i // count, bounds[-1])
+            if target >= size:
+                break
+            file.seek(target - 1 if target else 0)
+            file.readline()
+            bounds.append(min(file.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def analyze_range(
+    path: str, log_format: str, start: int, end: int, mode: str = TEXT_MODE
+) -> LogAggregate:
+    """
+    Parse the lines of a byte range, this is the worker entrypoint.
+
+    Args:
+        path: Path of the log file
+        log_format: Apache LogFormat string of the log file
+        start: Offset of the first line of the range
+        end: Offset just after the last newline of the range
+        mode: Scan mode, one of `RANGE_READERS`
+
+    Returns:
+        LogAggregate: Aggregates over the lines of the range
+    """
+    parser = _PARSERS.get(log_format)
+    if parser is None:
+        parser = _PARSERS[log_format] = LogParser(log_format)
+    aggregate = LogAggregate()
+    with open(path, "rb") as file:
+        RANGE_READERS[mode](file, start, end, parser, aggregate, read_size=READ_CHUNK_SIZE)
+    return aggregate
+
+
+class ParallelLogAnalyzer:
+    """
+    Analyze large log files with a pool of worker processes.
+
+    The pool is created on first use and kept until `close` is called.
+
+    Attributes:
+        log_format (str): Apache LogFormat string of the analyzed logs
+        workers (int): Number of worker processes
+        min_size (int): Smaller files are analyzed in the calling process
+        mode (str): Scan mode of the workers, one of `RANGE_READERS`
+    """
+
+    def __init__(
+        self,
+        log_format: str,
+        workers: int,
+        min_size: int = PARALLEL_MIN_SIZE,
+        mode: str = TEXT_MODE,
+    ) -> None:
+        """
+        Initialize the analyzer.
+
+        Args:
+            log_format: Apache LogFormat string of the analyzed logs
+            workers: Number of worker processes
+            min_size: Smaller files are analyzed in the calling process
+            mode: Scan mode of the workers, one of `RANGE_READERS`
+        """
+        self.log_format = log_format
+        self.workers = workers
+        self.min_size = min_size
+        self.mode = mode
+        self._executor: Optional["ProcessPoolExecutor"] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> "ProcessPoolExecutor":
+        """Create the worker pool on first use."""
+        # Imported on first use, small files never need the pool
+        import multiprocessing  # pylint: disable=import-outside-toplevel
+        from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+
+        with self._lock:
+            if self._executor is None:
+                # Forking a process running the server threads is not safe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def analyze(self, path: str, size: int) -> Tuple[int, LogAggregate]:
+        """
+        Analyze the complete lines found in the first `size` bytes of a log file.
+
+        Args:
+            path: Path of the log file
+            size: Number of bytes to analyze
+
+        Returns:
+            Tuple[int, LogAggregate]: Offset just after the last analyzed newline and the
+                                      aggregates over the analyzed lines
+        """
+        end = _last_line_end(path, size)
+        if end < self.min_size:
+            return 0, LogAggregate()
+        ranges = split_ranges(path, end, self.workers * RANGES_PER_WORKER)
+        executor = self._get_executor()
+        futures = [
+            executor.submit(analyze_range, path, self.log_format, start, stop, self.mode)
+            for start, stop in ranges
+        ]
+        aggregate = LogAggregate()
+        for future in futures:
+            aggregate.merge(future.result())
+        return end, aggregate
+
+    def close(self) -> None:
+        """Shut the worker pool down."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+def _last_line_end(path: str, size: int) -> int:
+    """Return the offset just after the last newline found in the first `size` bytes."""
+    with open(path, "rb") as file:
+        position = size
+        while position > 0:
+            start = max(0, position - READ_CHUNK_SIZE)
+            block = os.pread(file.fileno(), position - start, start)
+            index = block.rfind(b"\n")
+            if index >= 0:
+                return start + index + 1
+            position = start
+    return 0
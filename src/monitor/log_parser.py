@@ -0,0 +1,236 @@
+"""
+This module defines a precompiled, high-throughput parser for Apache access log lines.
+
+The common and combined formats are matched with a single strict regular expression that is
+compiled once. Whenever the strict expression matches, the captured fields are exactly the
+ones `apache_log_parser` would extract, so the fast path never changes which lines are
+accepted. Lines it does not match (escaped quotes, exotic spacing, ...) and any other log
+format go through `apache_log_parser`, imported and compiled on first use only.
+
+Timestamps are decoded with plain slicing, a month table and a table of already seen UTC
+offsets, and consecutive lines sharing a timestamp reuse the same datetime. No pydantic
+model is built per line: the parser returns lightweight `LogRecord` tuples.
+
+Throughput target: at least 250 000 combined lines per second on a single core, measured
+with `python -m benchmarks.log_parser` (about 25x the apache_log_parser + pydantic path).
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+
+COMMON_FORMAT = '%h %l %u %t "%r" %>s %b'
+COMBINED_FORMAT = '%h %l %u %t "%r" %>s %b "%{Referer}i" "%{User-agent}i"'
+
+_COMMON_PATTERN = r'(\S+) (\S+) (\S+) \[([^\]]*)\] "([^"]*)" ([0-9]+) (?:[0-9]+|-)'
+FAST_PATTERNS: Dict[str, "re.Pattern[str]"] = {
+    COMMON_FORMAT: re.compile(_COMMON_PATTERN),
+    COMBINED_FORMAT: re.compile(_COMMON_PATTERN + r' "[^"]*" "([^"]*)"'),
+}
+
+# Byte patterns over raw lines, used for aggregate-only scans. Fields are restricted to
+# printable ASCII so that, when they match, the str patterns match the decoded line too.
+_COMMON_BYTES_PATTERN = (
+    rb'[!-~]+ [!-~]+ [!-~]+ \[([ -\x5c\x5e-~]*)\] "([ !#-~]*)" ([0-9]+) (?:[0-9]+|-)'
+)
+FAST_BYTES_PATTERNS: Dict[str, "re.Pattern[bytes]"] = {
+    COMMON_FORMAT: re.compile(_COMMON_BYTES_PATTERN),
+    COMBINED_FORMAT: re.compile(_COMMON_BYTES_PATTERN + rb' "[^"]*" "[^"]*"'),
+}
+
+# Same request line expression as apache_log_parser, compiled once
+_REQUEST_PATTERN = re.compile(
+    r"^(?P<method>GET|HEAD|POST|OPTIONS|PUT|CONNECT|PATCH|PROPFIND|DELETE)\s?"
+    r"(?P<url>.{,10000}?)(\s+HTTP/(?P<http_ver>1.[01]))?$"
+)
+_METHODS = frozenset(
+    ("GET", "HEAD", "POST", "OPTIONS", "PUT", "CONNECT", "PATCH", "PROPFIND", "DELETE")
+)
+_PROTOCOLS = frozenset(("HTTP/1.0", "HTTP/1.1"))
+MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
+}
+# UTC offsets already seen, keyed by their "+HHMM" representation
+_OFFSETS: Dict[str, timedelta] = {}
+# Decoded timestamps and request URLs, cleared when full since log lines are mostly time
+# ordered and a few request lines make up most of the traffic
+_TIMESTAMPS: Dict[str, datetime] = {}
+_REQUEST_URLS: Dict[str, str] = {}
+_CACHE_LIMIT = 4096
+
+
+class LogRecord(NamedTuple):
+    """
+    Parsed access log line.
+
+    Attributes:
+        timestamp (datetime): Time the request was received, naive as written in the log
+        ip (str): Remote host
+        user (str): Remote user
+        url (str): Requested URL, empty when the request line is not understood
+        status_code (int): Final HTTP status code
+        user_agent (str): User agent, empty when the format does not log it
+    """
+
+    timestamp: datetime
+    ip: str
+    user: str
+    url: str
+    status_code: int
+    user_agent: str
+
+
+_new_record = tuple.__new__
+
+
+def _utc_offset(value: str) -> timedelta:
+    """Decode an offset the way apache_log_parser does, caching the result."""
+    offset = _OFFSETS.get(value)
+    if offset is None:
+        sign, digits = 1, value
+        if value[0] in "+-":
+            sign, digits = (-1 if value[0] == "-" else 1), value[1:]
+        offset = timedelta(minutes=sign * (int(digits[0:2], 10) * 60 + int(digits[2:3], 10)))
+        _OFFSETS[value] = offset
+    return offset
+
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Decode an Apache timestamp such as "10/Jan/2024:13:55:36 +0000".
+
+    Args:
+        value: Timestamp without the surrounding brackets
+
+    Returns:
+        datetime: Naive datetime, as written in the log
+
+    Raises:
+        ValueError: If the timestamp is invalid
+    """
+    timestamp = _TIMESTAMPS.get(value)
+    if timestamp is not None:
+        return timestamp
+    try:
+        timestamp = datetime(
+            int(value[7:11]), MONTHS[value[3:6]], int(value[0:2]),
+            int(value[12:14]), int(value[15:17]), int(value[18:20]),
+        )
+        # Converting to UTC must be possible, as apache_log_parser does it
+        timestamp - _utc_offset(value[21:26])  # pylint: disable=expression-not-assigned
+    except (KeyError, IndexError, OverflowError) as exc:
+        raise ValueError(f"Invalid timestamp: {value}") from exc
+    if len(_TIMESTAMPS) >= _CACHE_LIMIT:
+        _TIMESTAMPS.clear()
+    _TIMESTAMPS[value] = timestamp
+    return timestamp
+
+
+def parse_request_url(request: str) -> str:
+    """
+    Extract the URL of a request line such as "GET /index.html HTTP/1.1".
+
+    Args:
+        request: Request line
+
+    Returns:
+        str: Requested URL, empty if the request line is not understood
+
+    Raises:
+        ValueError: If the URL can not be parsed
+    """
+    url = _REQUEST_URLS.get(request)
+    if url is not None:
+        return url
+    parts = request.split(" ")
+    if (
+        len(parts) == 3 and parts[0] in _METHODS and parts[2] in _PROTOCOLS
+        and len(parts[1]) <= 10000 and not parts[1][-1:].isspace()
+    ):
+        url = parts[1]
+    else:
+        match = _REQUEST_PATTERN.match(request)
+        if match is None:
+            return ""
+        url = match.group("url")
+    # Absolute paths have no network location, so they can not be invalid
+    if url[:1] != "/" or url[:2] == "//":
+        parsed = urlparse(url)
+        parsed.port  # pylint: disable=pointless-statement
+    if len(_REQUEST_URLS) >= _CACHE_LIMIT:
+        _REQUEST_URLS.clear()
+    _REQUEST_URLS[request] = url
+    return url
+
+
+class LogParser:
+    """
+    Parser for one access log format, compiled once.
+
+    Attributes:
+        log_format (str): Apache LogFormat string
+        bytes_pattern (re.Pattern): Pattern capturing the timestamp, request line and status
+                                    of a raw line, None if the format has no fast path
+    """
+
+    def __init__(self, log_format: str = COMBINED_FORMAT) -> None:
+        """
+        Initialize the parser.
+
+        Args:
+            log_format: Apache LogFormat string, common and combined use the fast path
+        """
+        self.log_format = log_format
+        self._pattern = FAST_PATTERNS.get(log_format)
+        self.bytes_pattern = FAST_BYTES_PATTERNS.get(log_format)
+        self._fallback: Optional[Callable[[str], dict]] = None
+
+    def __call__(self, line: str) -> LogRecord:
+        return self.parse(line)
+
+    def parse(self, line: str) -> LogRecord:
+        """
+        Parse a single log line.
+
+        Args:
+            line: Raw log line, without its line terminator
+
+        Returns:
+            LogRecord: Parsed log line
+
+        Raises:
+            ValueError: If the line does not match the log format
+        """
+        match = self._pattern.match(line) if self._pattern is not None else None
+        if match is None:
+            return self._parse_fallback(line)
+        groups = match.groups()
+        # tuple.__new__ skips the keyword handling of the generated NamedTuple constructor
+        return _new_record(LogRecord, (
+            parse_timestamp(groups[3]),
+            groups[0],
+            groups[2],
+            parse_request_url(groups[4]),
+            int(groups[5]),
+            groups[6] if len(groups) > 6 else "",
+        ))
+
+    def _parse_fallback(self, line: str) -> LogRecord:
+        """Parse a line with apache_log_parser."""
+        if self._fallback is None:
+            import apache_log_parser  # pylint: disable=import-outside-toplevel
+
+            self._fallback = apache_log_parser.make_parser(self.log_format)
+        try:
+            parsed = self._fallback(line)
+            return LogRecord(
+                parsed["time_received_datetimeobj"],
+                parsed["remote_host"],
+                parsed.get("remote_user", "-"),
+                parsed["request_url"],
+                int(parsed["status"]),
+                parsed.get("request_header_user_agent", ""),
+            )
+        except Exception as exc:
+            raise ValueError(f"Error parsing log line: {exc}") from exc
@@ -0,0 +1,148 @@
+"""
+This module defines a memory-mapped scanning mode for access logs.
+
+Instead of decoding every line to `str`, `scan_range` maps the byte range into memory and
+matches the raw bytes in place. For the requests that are only counted (status below 400)
+it decodes nothing but the request line, through small caches, and allocates no entry at
+all. Error lines, kept as recent errors, and lines the byte pattern does not match are
+decoded and parsed exactly like the text mode does, so both modes give the same metrics.
+
+Both modes can be compared with `python -m benchmarks.log_scan`.
+"""
+import mmap
+import os
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple
+
+from monitor.log_ingest import READ_CHUNK_SIZE, LogAggregate, add_line, ingest_range
+from monitor.log_parser import LogParser, parse_request_url, parse_timestamp
+
+TEXT_MODE = "text"
+MMAP_MODE = "mmap"
+
+# Size of the request line cache of a scan
+_REQUEST_CACHE_LIMIT = 4096
+_UNSET = object()
+
+
+def scan_range(
+    file: BinaryIO,
+    start: int,
+    end: int,
+    parse: LogParser,
+    aggregate: LogAggregate,
+    partial: bytes = b"",
+    read_size: int = READ_CHUNK_SIZE,  # pylint: disable=unused-argument
+) -> Tuple[int, bytes]:
+    """
+    Fold the complete lines found between two byte offsets of a file into an aggregate.
+
+    Same contract as `ingest_range`, the range being memory-mapped instead of read.
+
+    Args:
+        file: Log file opened in binary mode
+        start: Offset to start reading from
+        end: Offset to stop reading at
+        parse: Parser of the log format
+        aggregate: Aggregate to update
+        partial: Unterminated line read before `start`
+        read_size: Unused, the whole range is mapped at once
+
+    Returns:
+        Tuple[int, bytes]: Offset reached and the trailing bytes of the last unterminated
+                           line
+    """
+    end = min(end, os.fstat(file.fileno()).st_size)
+    if end <= start:
+        return start, partial
+    # Mappings must start on an allocation granularity boundary
+    base = start - start % mmap.ALLOCATIONGRANULARITY
+    with mmap.mmap(file.fileno(), end - base, access=mmap.ACCESS_READ, offset=base) as view:
+        if hasattr(view, "madvise"):
+            view.madvise(mmap.MADV_SEQUENTIAL)
+        position = start - base
+        if partial:
+            newline = view.find(b"\n", position)
+            if newline < 0:
+                return end, partial + view[position:]
+            add_line(aggregate, parse, partial + view[position:newline], start - len(partial))
+            position = newline + 1
+        last = view.rfind(b"\n", position)
+        if last < 0:
+            return end, view[position:]
+        _scan_lines(view, position, last + 1, base, parse, aggregate)
+        return end, view[last + 1:]
+
+
+def _scan_lines(
+    view: mmap.mmap,
+    position: int,
+    stop: int,
+    base: int,
+    parse: LogParser,
+    aggregate: LogAggregate,
+) -> None:
+    """Fold the newline-terminated lines between `position` and `stop` of a mapping."""
+    pattern = parse.bytes_pattern
+    if pattern is None:
+        _fold_lines(view, position, stop, base, parse, aggregate)
+        return
+    match, find, count = pattern.match, view.find, aggregate.count
+    valid_timestamp: Optional[bytes] = None
+    urls: Dict[bytes, Any] = {}
+    while position < stop:
+        line_start, newline = position, find(b"\n", position, stop)
+        position = newline + 1
+        found = match(view, line_start, newline)
+        if found is None:
+            add_line(aggregate, parse, view[line_start:newline], base + line_start)
+            continue
+        timestamp, request, status = found.groups()
+        if timestamp != valid_timestamp:
+            try:
+                parse_timestamp(timestamp.decode("ascii"))
+            except ValueError:
+                continue
+            valid_timestamp = timestamp
+        url = urls.get(request, _UNSET)
+        if url is _UNSET:
+            url = _request_url(request)
+            if len(urls) >= _REQUEST_CACHE_LIMIT:
+                urls.clear()
+            urls[request] = url
+        if url is None:
+            continue
+        status_code = int(status)
+        if status_code < 400:
+            count(status_code, url)
+        else:
+            add_line(aggregate, parse, view[line_start:newline], base + line_start)
+
+
+def _request_url(request: bytes) -> Optional[str]:
+    """Decode the URL of a raw request line, None if the URL is invalid."""
+    try:
+        return parse_request_url(request.decode("ascii"))
+    except ValueError:
+        return None
+
+
+def _fold_lines(
+    view: mmap.mmap,
+    position: int,
+    stop: int,
+    base: int,
+    parse: LogParser,
+    aggregate: LogAggregate,
+) -> None:
+    """Decode and parse every line, for formats without a byte pattern."""
+    while position < stop:
+        newline = view.find(b"\n", position, stop)
+        add_line(aggregate, parse, view[position:newline], base + position)
+        position = newline + 1
+
+
+# Range readers by scan mode, all with the signature of `ingest_range`
+RANGE_READERS: Dict[str, Callable[..., Tuple[int, bytes]]] = {
+    TEXT_MODE: ingest_range,
+    MMAP_MODE: scan_range,
+}
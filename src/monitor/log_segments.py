@@ -0,0 +1,164 @@
+"""
+This module defines the rotated segments of a log file.
+
+Log rotation turns `access.log` into `access.log.1`, `access.log.2.gz`, ... Rotated segments
+are immutable, so each one is analyzed once and its aggregate cached, keyed by the segment
+(path, inode, size, mtime): only the live file is read again. Compressed segments (gzip,
+bzip2, xz) are decompressed on the fly, without being loaded in memory. The decompression
+modules are only imported once a compressed segment is opened.
+"""
+import glob
+import importlib
+import os
+import re
+import sys
+import threading
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from monitor.log_ingest import LogAggregate, add_line, ingest_range
+
+# Modules opening the compressed segments, by file extension
+SEGMENT_OPENERS: Dict[str, str] = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "lzma",
+}
+_ROTATION_PATTERN = re.compile(r"\.(\d+)(?:\.[A-Za-z0-9]+)?$")
+
+
+class SegmentSummary(NamedTuple):
+    """
+    Analysis of a rotated log segment.
+
+    Attributes:
+        aggregate (LogAggregate): Aggregates over the lines of the segment
+        length (int): Number of bytes of the segment, once decompressed
+        first (Optional[datetime]): Oldest timestamp of the segment, None if it is empty
+        last (Optional[datetime]): Newest timestamp of the segment, None if it is empty
+    """
+
+    aggregate: LogAggregate
+    length: int
+    first: Optional[datetime]
+    last: Optional[datetime]
+
+
+def open_segment(path: str) -> BinaryIO:
+    """
+    Open a log segment for binary reading, decompressing it if needed.
+
+    Args:
+        path: Path of the segment
+
+    Returns:
+        BinaryIO: Readable stream of the decompressed bytes
+    """
+    module = SEGMENT_OPENERS.get(os.path.splitext(path)[1])
+    if module is None:
+        return open(path, "rb")  # pylint: disable=consider-using-with
+    return importlib.import_module(module).open(path, "rb")
+
+
+def find_segments(pattern: str, live_path: str) -> List[str]:
+    """
+    List the rotated segments of a log file, oldest first.
+
+    Segments are ordered by modification time, then by decreasing rotation number.
+
+    Args:
+        pattern: Glob matching the segments, it may match the live file too
+        live_path: Path of the live log file, never listed
+
+    Returns:
+        List[str]: Paths of the rotated segments
+    """
+    live = os.path.realpath(live_path)
+    segments: List[Tuple[int, int, str]] = []
+    for path in glob.glob(pattern):
+        if os.path.realpath(path) == live:
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        match = _ROTATION_PATTERN.search(path)
+        segments.append((stat.st_mtime_ns, -int(match.group(1)) if match else 0, path))
+    return [path for _, _, path in sorted(segments)]
+
+
+def analyze_segment(path: str, parse: Callable[[str], Any]) -> SegmentSummary:
+    """
+    Parse every line of a log segment.
+
+    Args:
+        path: Path of the segment
+        parse: Callable turning a stripped line into an entry, raising ValueError
+
+    Returns:
+        SegmentSummary: Aggregates and time span of the segment
+    """
+    bounds: List[datetime] = []
+
+    def parse_and_track(line: str) -> Any:
+        entry = parse(line)
+        if not bounds:
+            bounds.extend((entry.timestamp, entry.timestamp))
+        elif entry.timestamp < bounds[0]:
+            bounds[0] = entry.timestamp
+        elif entry.timestamp > bounds[1]:
+            bounds[1] = entry.timestamp
+        return entry
+
+    aggregate = LogAggregate()
+    with open_segment(path) as file:
+        length, partial = ingest_range(file, 0, sys.maxsize, parse_and_track, aggregate)
+    if partial.strip():
+        add_line(aggregate, parse_and_track, partial, length - len(partial))
+    first, last = bounds if bounds else (None, None)
+    return SegmentSummary(aggregate, length, first, last)
+
+
+class SegmentCache:
+    """
+    Cache of the analyses of rotated log segments.
+
+    Attributes:
+        parse (Callable[[str], Any]): Parser of the segment lines
+    """
+
+    def __init__(self, parse: Callable[[str], Any]) -> None:
+        """
+        Initialize an empty cache.
+
+        Args:
+            parse: Callable turning a stripped line into an entry, raising ValueError
+        """
+        self.parse = parse
+        self._lock = threading.Lock()
+        self._summaries: Dict[str, Tuple[Tuple[int, int, int], SegmentSummary]] = {}
+
+    def get(self, path: str) -> SegmentSummary:
+        """
+        Get the analysis of a segment, analyzing it if it changed since it was cached.
+
+        Args:
+            path: Path of the segment
+
+        Returns:
+            SegmentSummary: Aggregates and time span of the segment. The aggregate must not
+                            be modified by the caller.
+        """
+        stat = os.stat(path)
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._summaries.get(path)
+            if cached is None or cached[0] != key:
+                cached = self._summaries[path] = (key, analyze_segment(path, self.parse))
+            return cached[1]
+
+    def prune(self) -> None:
+        """Forget the segments that were deleted."""
+        with self._lock:
+            for path in [path for path in self._summaries if not os.path.exists(path)]:
+                del self._summaries[path]
@@ -1,16 +1,180 @@
-"""This module defines a MonitorTask class for monitoring system metrics."""
+"""
+This module defines a MonitorTask class for monitoring system metrics.
 
-import time
-from typing import List
+Metrics are taken by collectors registered in a `CollectorRegistry` and run at their own
+interval by a `CollectorScheduler`, in a dedicated thread started and stopped with the
+application. Collectors never sleep: CPU usage is computed from the CPU times elapsed since
+the previous collection, so the scheduler thread only holds the GIL for the few
+microseconds a collection takes. On Linux, the CPU and RAM usage are parsed from /proc
+directly, see `monitor.collectors.procfs`.
+
+Creating a `MonitorTask` does not take any sample, so the application starts right away: the
+collectors are primed by the first run of the scheduler thread and `ready` tells whether
+every collector has published a snapshot.
+
+In multi-worker mode a single sampler process runs the collectors of `SHARED_COLLECTORS`, and
+the `MonitorTask` of each server worker reads their snapshots from shared memory instead, see
+`monitor.shared`.
+
+With an adaptive sampling policy, the collectors speed up to their floor interval when the
+CPU or RAM usage is high or moves quickly, and slow down while it is stable, see
+`monitor.adaptive`.
+"""
+
+import threading
+from typing import Any, Callable, Collection, List, Optional, Sequence, Tuple
 import psutil
 
+from monitor.adaptive import AdaptiveSampling
+from monitor.broadcast import Broadcaster
+from monitor.collectors import (
+    CPU_COLLECTOR,
+    CPU_TIMES_COLLECTOR,
+    RAM_COLLECTOR,
+    CONTAINER_CPU_COLLECTOR,
+    CONTAINER_RAM_COLLECTOR,
+    CONTAINER_PRESSURE_COLLECTOR,
+    DISK_IO_COLLECTOR,
+    DISK_USAGE_COLLECTOR,
+    NET_COLLECTOR,
+    PRESSURE_COLLECTOR,
+    PROCESS_COLLECTOR,
+    Cgroup,
+    Collector,
+    CollectorRegistry,
+    ContainerCpuCollector,
+    ContainerRamCollector,
+    CpuSnapshot,
+    CpuTimesCollector,
+    DiskIoCollector,
+    DiskUsageCollector,
+    NetIoCollector,
+    ProcessCollector,
+    RamSnapshot,
+    cpu_time_states,
+    make_cpu_collector,
+    make_pressure_collector,
+    make_ram_collector,
+)
+from monitor.history import HISTORY_SIZE, ROLLUP_TIERS, MetricHistory
+from monitor.openmetrics import ExpositionCache
+from monitor.scheduler import CollectorScheduler
+from monitor.shared import (
+    SHARED_SNAPSHOTS,
+    SharedCollector,
+    SharedCpuCollector,
+    SharedMetrics,
+    SharedRamCollector,
+    SharedSnapshotCollector,
+)
+from monitor.snapshots import SnapshotCache
+
+# Series of the RAM history
+RAM_HISTORY_SERIES = ("percent", "used", "available")
+
+# CPU and RAM collectors of each view of the metrics: the whole host, or the container
+# of the agent relative to its limits
+HOST_VIEW = "host"
+CONTAINER_VIEW = "container"
+VIEW_COLLECTORS = {
+    HOST_VIEW: (CPU_COLLECTOR, RAM_COLLECTOR),
+    CONTAINER_VIEW: (CONTAINER_CPU_COLLECTOR, CONTAINER_RAM_COLLECTOR),
+}
+# Pressure collector of each view, not registered without PSI
+PRESSURE_VIEW_COLLECTORS = {
+    HOST_VIEW: PRESSURE_COLLECTOR,
+    CONTAINER_VIEW: CONTAINER_PRESSURE_COLLECTOR,
+}
+
+# Collectors of the metrics, in registration order, the container ones only with a cgroup
+COLLECTORS = (
+    CPU_COLLECTOR,
+    RAM_COLLECTOR,
+    PRESSURE_COLLECTOR,
+    CPU_TIMES_COLLECTOR,
+    DISK_IO_COLLECTOR,
+    DISK_USAGE_COLLECTOR,
+    NET_COLLECTOR,
+    PROCESS_COLLECTOR,
+    CONTAINER_CPU_COLLECTOR,
+    CONTAINER_RAM_COLLECTOR,
+    CONTAINER_PRESSURE_COLLECTOR,
+)
+# Collectors run by the sampler process in multi-worker mode, whose snapshots the server
+# workers read from shared memory
+SHARED_COLLECTORS = (CPU_COLLECTOR, RAM_COLLECTOR) + SHARED_SNAPSHOTS
+
+# RAM snapshot reported before the first collection
+EMPTY_RAM_SNAPSHOT = RamSnapshot(percent=0.0, total=0.0, available=0.0, used=0.0, free=0.0)
+
+
+def make_collectors(
+    interval: float,
+    cgroup: Optional[Cgroup] = None,
+    names: Optional[Collection[str]] = None,
+) -> List[Collector]:
+    """
+    Create the collectors of the metrics, in registration order.
+
+    The collectors whose system interface is missing, as the pressure without PSI, are left
+    out.
+
+    Args:
+        interval: Time interval between the collections of the fast collectors in seconds
+        cgroup: Cgroup of the container, whose collectors are also created if not None
+        names: Names of the collectors to create, every collector if None
+
+    Returns:
+        List[Collector]: The created collectors
+    """
+    factories: List[Tuple[str, Callable[[], Optional[Collector]]]] = [
+        (CPU_COLLECTOR, lambda: make_cpu_collector(interval)),
+        (RAM_COLLECTOR, lambda: make_ram_collector(interval)),
+        (PRESSURE_COLLECTOR, lambda: make_pressure_collector(interval)),
+        (CPU_TIMES_COLLECTOR, lambda: CpuTimesCollector(interval)),
+        (DISK_IO_COLLECTOR, lambda: DiskIoCollector(interval)),
+        (DISK_USAGE_COLLECTOR, DiskUsageCollector),
+        (NET_COLLECTOR, lambda: NetIoCollector(interval)),
+        (PROCESS_COLLECTOR, ProcessCollector),
+    ]
+    if cgroup is not None:
+        factories += [
+            (CONTAINER_CPU_COLLECTOR, lambda: ContainerCpuCollector(cgroup, interval)),
+            (CONTAINER_RAM_COLLECTOR, lambda: ContainerRamCollector(cgroup, interval)),
+            (CONTAINER_PRESSURE_COLLECTOR, lambda: make_pressure_collector(interval, cgroup)),
+        ]
+    collectors = []
+    for name, factory in factories:
+        if names is None or name in names:
+            collector = factory()
+            if collector is not None:
+                collectors.append(collector)
+    return collectors
+
+
+def _ram_property(field: str, doc: str) -> property:
+    """Create a property reading a field of the latest RAM snapshot."""
+
+    def getter(self: "MonitorTask") -> float:
+        return getattr(self.registry.latest(RAM_COLLECTOR) or EMPTY_RAM_SNAPSHOT, field)
+
+    def setter(self: "MonitorTask", value: float) -> None:
+        snapshot = self.registry.latest(RAM_COLLECTOR) or EMPTY_RAM_SNAPSHOT
+        self.registry.store(RAM_COLLECTOR, snapshot._replace(**{field: value}))
+
+    return property(getter, setter, doc=doc)
+
 
 class MonitorTask:
     """
-    A class for monitoring system metrics including CPU and RAM usage.
+    A class for monitoring system metrics including CPU, RAM, disk and network usage, and
+    the pressure on the CPU, memory and I/O.
+
+    The metric attributes read the latest snapshots of the collectors, they are empty or zero
+    until the first collection. Setting them replaces the value of the latest snapshot.
 
     Attributes:
-        interval (int): Time interval between metric updates in seconds
+        interval (float): Time interval between CPU and RAM updates in seconds
         num_cores (int): Number of CPU cores (physical)
         cpu_percent (List[float]): List of CPU usage percentages per core
         ram_percent (float): Total RAM usage percentage
@@ -18,57 +182,185 @@ class MonitorTask:
         available_ram (float): Available RAM in MB
         used_ram (float): Used RAM in MB
         free_ram (float): Free RAM in MB
+        registry (CollectorRegistry): Collectors and their latest snapshots
+        scheduler (CollectorScheduler): Scheduler running the collectors
+        cpu_history (MetricHistory): Past CPU usage percentages, one series per core
+        cpu_times_history (MetricHistory): Past percentages of the CPU time spent in each
+                                           state over all the cores, one series per state
+        ram_history (MetricHistory): Past RAM usage percentage, used and available RAM in MB
+        snapshots (SnapshotCache): API responses encoded from the latest snapshots
+        exposition (ExpositionCache): OpenMetrics text rendered from the latest snapshots
+        broadcaster (Broadcaster): Pushes the new snapshots to the streaming clients
+        cgroup (Optional[Cgroup]): Cgroup whose CPU and memory usage is collected as the
+                                   container view, None for the host view only
+        sampling (Optional[AdaptiveSampling]): Policy adapting the interval of the
+                                               collectors, None for fixed intervals
     """
 
-    interval: int
+    interval: float
     num_cores: int
-    cpu_percent: List[float]
-    ram_percent: float
-    total_ram: float
-    available_ram: float
-    used_ram: float
-    free_ram: float
-
-    def __init__(self) -> None:
-        """Initialize the MonitorTask with current system metrics."""
+    registry: CollectorRegistry
+    scheduler: CollectorScheduler
+    cpu_history: MetricHistory
+    cpu_times_history: MetricHistory
+    ram_history: MetricHistory
+    snapshots: SnapshotCache
+    exposition: ExpositionCache
+    broadcaster: Broadcaster
+    cgroup: Optional[Cgroup]
+    sampling: Optional[AdaptiveSampling]
+
+    def __init__(
+        self,
+        history_size: int = HISTORY_SIZE,
+        interval: float = 1.0,
+        shared: Optional[SharedMetrics] = None,
+        cgroup: Optional[Cgroup] = None,
+        sampling: Optional[AdaptiveSampling] = None,
+        rollup_tiers: Sequence[Tuple[str, float, int]] = ROLLUP_TIERS,
+        collectors: Optional[Collection[str]] = None,
+    ) -> None:
+        """
+        Initialize the MonitorTask, without taking any sample.
+
+        Args:
+            history_size: Number of samples kept in the metric histories
+            interval: Time interval between CPU and RAM updates in seconds
+            shared: Shared metrics written by a sampler process, read instead of sampling
+                    the system if not None
+            cgroup: Cgroup of the container, whose CPU and memory usage is also collected
+                    if not None
+            sampling: Policy adapting the interval of the collectors, which keep a fixed
+                      interval if None
+            rollup_tiers: Name, bucket duration in seconds and number of buckets of each
+                          rollup tier of the metric histories
+            collectors: Names of the collectors run when not reading shared metrics, every
+                        collector if None
+        """
         # Initialize monitoring interval
-        self.interval = 3
+        self.interval = interval
 
         # Get CPU information
         self.num_cores = psutil.cpu_count(logical=False)
-        self.cpu_percent = psutil.cpu_percent(percpu=True, interval=1)
 
-        # Initialize RAM metrics
-        self.ram_percent = 0.0
-        self._update_ram_metrics()
+        # Register the collectors
+        self.registry = CollectorRegistry()
+        self.cgroup = cgroup
+        if shared is None:
+            for collector in make_collectors(interval, cgroup, collectors):
+                self.registry.register(collector)
+            cpu_count = psutil.cpu_count()
+        else:
+            # The collectors run by the sampler process are read from shared memory, the
+            # others are run by each worker
+            self.registry.register(SharedCpuCollector(shared))
+            self.registry.register(SharedRamCollector(shared))
+            for name in shared.collectors:
+                self.registry.register(SharedSnapshotCollector(shared, name))
+            local = [name for name in COLLECTORS if name not in SHARED_COLLECTORS]
+            for collector in make_collectors(interval, cgroup, local):
+                self.registry.register(collector)
+            cpu_count = shared.cpu_count
+        self.scheduler = CollectorScheduler(self.registry)
+        self.sampling = sampling
+        if sampling is not None:
+            # The shared collectors poll the records written by the sampler process, which
+            # adapts its own intervals
+            sampling.govern(
+                (
+                    collector for collector in self.registry.collectors()
+                    if not isinstance(collector, SharedCollector)
+                ),
+                self.scheduler,
+            )
+            self.registry.add_listener(sampling)
 
-    def _update_ram_metrics(self) -> None:
-        """
-        Update RAM-related metrics.
-        
-        Fetches current RAM usage statistics and updates instance attributes.
-        All values are converted to MB for consistency.
-        """
-        ram = psutil.virtual_memory()
-        self.ram_percent = ram.percent
-        self.total_ram = ram.total / (1024 * 1024)
-        self.available_ram = ram.available / (1024 * 1024)
-        self.used_ram = ram.used / (1024 * 1024)
-        self.free_ram = ram.free / (1024 * 1024)
+        # Preallocate the histories, fed by every new CPU and RAM snapshot
+        self.cpu_history = MetricHistory(
+            [f"core{core}" for core in range(cpu_count)], history_size, rollup_tiers
+        )
+        self.cpu_times_history = MetricHistory(cpu_time_states(), history_size, rollup_tiers)
+        self.ram_history = MetricHistory(RAM_HISTORY_SERIES, history_size, rollup_tiers)
+        self.registry.add_listener(self._record_history)
+        self.snapshots = SnapshotCache(self.registry)
+        self.exposition = ExpositionCache()
+        self.broadcaster = Broadcaster()
+        self.registry.add_listener(self._notify_subscribers)
+
+        # Scheduler thread, see start() and stop()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def cpu_percent(self) -> List[float]:
+        """List of CPU usage percentages per core."""
+        snapshot = self.registry.latest(CPU_COLLECTOR)
+        return [] if snapshot is None else snapshot.percent
+
+    @cpu_percent.setter
+    def cpu_percent(self, value: List[float]) -> None:
+        self.registry.store(CPU_COLLECTOR, CpuSnapshot(value))
+
+    ram_percent = _ram_property("percent", "Total RAM usage percentage.")
+    total_ram = _ram_property("total", "Total RAM in MB.")
+    available_ram = _ram_property("available", "Available RAM in MB.")
+    used_ram = _ram_property("used", "Used RAM in MB.")
+    free_ram = _ram_property("free", "Free RAM in MB.")
+
+    def has_view(self, view: str) -> bool:
+        """Whether the CPU and RAM collectors of a view of the metrics are registered."""
+        return view in VIEW_COLLECTORS and all(
+            self.registry.get(name) is not None for name in VIEW_COLLECTORS[view]
+        )
+
+    @property
+    def ready(self) -> bool:
+        """Whether every collector has published a snapshot."""
+        return all(
+            self.registry.latest(collector.name) is not None
+            for collector in self.registry.collectors()
+        )
+
+    def _record_history(self, name: str, timestamp: float, snapshot: Any) -> None:
+        """Append a new CPU or RAM snapshot to its history."""
+        if name == CPU_COLLECTOR:
+            self.cpu_history.append(timestamp, snapshot.percent)
+        elif name == CPU_TIMES_COLLECTOR:
+            self.cpu_times_history.append(timestamp, snapshot.average)
+        elif name == RAM_COLLECTOR:
+            self.ram_history.append(
+                timestamp, (snapshot.percent, snapshot.used, snapshot.available)
+            )
+
+    def _notify_subscribers(self, name: str, _timestamp: float, _snapshot: Any) -> None:
+        """Push a new snapshot to the clients subscribed to its collector."""
+        self.broadcaster.notify(name)
+
+    def sample(self) -> None:
+        """Run every collector once, without blocking."""
+        for collector in self.registry.collectors():
+            self.scheduler.run_once(collector)
 
     def monitor(self) -> None:
+        """Run the collectors at their own interval until `stop` is called."""
+        self.scheduler.run(self._stop_event)
+
+    def start(self) -> None:
+        """Start running the collectors in a dedicated daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.monitor, name="monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
         """
-        Continuously monitor system metrics.
-        
-        Runs in an infinite loop, updating CPU and RAM metrics at regular intervals.
-        CPU percentages are collected with a small interval for accuracy.
+        Stop the scheduler thread and wait for it to exit.
+
+        Args:
+            timeout: Maximum time to wait for the thread, in seconds
         """
-        while True:
-            # Get per-CPU percentages with a small interval for accurate reading
-            self.cpu_percent = psutil.cpu_percent(percpu=True, interval=0.1)
-            
-            # Update RAM metrics
-            self._update_ram_metrics()
-            
-            # Sleep for the remaining time to maintain the desired interval
-            time.sleep(max(0, self.interval - 0.1))  # Prevent negative sleep time
\ No newline at end of file
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -1,7 +1,10 @@
 from pathlib import Path
 from typing import List, Dict, Union
 from datetime import datetime
-import apache_log_parser
+from monitor.log_parser import COMMON_FORMAT, LogParser
+
+# Parser compiled once for the whole module
+_LINE_PARSER = LogParser(COMMON_FORMAT)
 
 def parse_log_line(line: str) -> Dict[str, Union[str, datetime]]:
     """
@@ -17,14 +20,13 @@ def parse_log_line(line: str) -> Dict[str, Union[str, datetime]]:
         ValueError: If line format is invalid
     """
     try:
-        line_parser = apache_log_parser.make_parser("%h %l %u %t \"%r\" %>s %b")
-        parsed = line_parser(line)
+        record = _LINE_PARSER.parse(line)
         return {
-            'remote_host': parsed['remote_host'],
-            'remote_user': parsed['remote_user'],
-            'status': parsed['status'],
-            'request_url': parsed['request_url'],
-            'timestamp': parsed['time_received_datetimeobj']
+            'remote_host': record.ip,
+            'remote_user': record.user,
+            'status': str(record.status_code),
+            'request_url': record.url,
+            'timestamp': record.timestamp
         }
     except Exception as e:
         raise ValueError(f"Invalid log line format: {str(e)}")
@@ -0,0 +1,156 @@
+"""
+This module defines the rendering of metrics in the OpenMetrics text exposition format.
+
+Scrapers poll much more often than the metrics change, so the rendered text is cached with
+the key of the state it was rendered from, along with its gzip encoding: scrapes between two
+samples only send the cached bytes.
+"""
+import math
+import threading
+import zlib
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+# Compression level of the gzip encoding, rendered once per sample
+EXPOSITION_GZIP_LEVEL = 6
+
+
+def escape_label(value: str) -> str:
+    """Escape a label value, as required by the exposition format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    """Format a sample value, as required by the exposition format."""
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class MetricFamily:
+    """
+    Samples of a metric, rendered with their metadata.
+
+    Attributes:
+        name (str): Name of the metric, without the `_total` suffix of counters
+        type (str): OpenMetrics type, such as "gauge", "counter" or "info"
+        help (str): Description of the metric
+        unit (Optional[str]): Unit of the metric, which must end its name
+    """
+
+    # Suffix of the samples of each metric type
+    SUFFIXES: Dict[str, str] = {"counter": "_total", "info": "_info"}
+
+    def __init__(self, name: str, type_: str, help_: str, unit: Optional[str] = None) -> None:
+        """
+        Initialize a metric without samples.
+
+        Args:
+            name: Name of the metric, without the `_total` suffix of counters
+            type_: OpenMetrics type
+            help_: Description of the metric
+            unit: Unit of the metric, which must end its name
+        """
+        self.name = name
+        self.type = type_
+        self.help = help_
+        self.unit = unit
+        self._samples: List[Tuple[Tuple[Tuple[str, str], ...], float]] = []
+
+    def add(self, value: float, **labels: str) -> "MetricFamily":
+        """
+        Add a sample.
+
+        Args:
+            value: Value of the sample
+            labels: Labels of the sample
+
+        Returns:
+            MetricFamily: This metric, to chain calls
+        """
+        self._samples.append((tuple(labels.items()), value))
+        return self
+
+    def render(self) -> List[str]:
+        """Return the lines of the metadata and of the samples of the metric."""
+        lines = [f"# TYPE {self.name} {self.type}"]
+        if self.unit is not None:
+            lines.append(f"# UNIT {self.name} {self.unit}")
+        lines.append(f"# HELP {self.name} {escape_label(self.help)}")
+        name = self.name + self.SUFFIXES.get(self.type, "")
+        for labels, value in self._samples:
+            if labels:
+                rendered = ",".join(f'{key}="{escape_label(str(label))}"' for key, label in labels)
+                lines.append(f"{name}{{{rendered}}} {format_value(value)}")
+            else:
+                lines.append(f"{name} {format_value(value)}")
+        return lines
+
+
+def render_openmetrics(families: List[MetricFamily]) -> bytes:
+    """
+    Render metrics in the OpenMetrics text format.
+
+    Args:
+        families: Metrics to render, with unique names
+
+    Returns:
+        bytes: UTF-8 exposition text, terminated by "# EOF"
+    """
+    lines = [line for family in families for line in family.render()]
+    lines.append("# EOF\n")
+    return "\n".join(lines).encode("utf-8")
+
+
+class Exposition(NamedTuple):
+    """
+    Rendered exposition text.
+
+    Attributes:
+        key (Hashable): Key of the state the text was rendered from
+        text (bytes): Exposition text
+        gzipped (bytes): Exposition text encoded with gzip
+    """
+
+    key: Hashable
+    text: bytes
+    gzipped: bytes
+
+
+class ExpositionCache:
+    """
+    Latest rendered exposition text.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty cache."""
+        self._latest: Optional[Exposition] = None
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, render: Callable[[], bytes]) -> Exposition:
+        """
+        Return the exposition text of a state, rendering it if the state changed.
+
+        Args:
+            key: Key of the state, equal keys must render the same text
+            render: Renderer of the exposition text
+
+        Returns:
+            Exposition: The exposition text of the state
+        """
+        latest = self._latest
+        if latest is not None and latest.key == key:
+            return latest
+        with self._lock:
+            # Concurrent scrapes render each state once
+            latest = self._latest
+            if latest is not None and latest.key == key:
+                return latest
+            text = render()
+            compressor = zlib.compressobj(EXPOSITION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._latest = Exposition(key, text, compressor.compress(text) + compressor.flush())
+            return self._latest
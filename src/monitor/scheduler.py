@@ -0,0 +1,142 @@
+"""
+This module defines a multi-rate scheduler running the collectors of a registry.
+
+Each collector is due on its own fixed grid (start, start + interval, ...) and the next due
+collector is found with a heap, so the scheduler thread sleeps until exactly the next
+collection, whatever the number of collectors and their rates. A small random delay is added
+to each run so that collectors sharing an interval do not always run back to back. A
+collection ending after the next one was due is counted as an overrun and the missed runs
+are skipped instead of being run in a burst. A collector which has not published a snapshot
+yet, such as a rate collector reading its first counters, runs again after a short delay so
+that the first metrics are available soon after startup.
+
+The interval of a collector is read again after each of its runs, so it can change while the
+scheduler runs. Runs already due later than a shortened interval are brought forward by
+`reschedule`.
+"""
+import heapq
+import logging
+import math
+import random
+import threading
+import time
+from typing import List, Tuple
+
+from monitor.collectors import Collector, CollectorRegistry, TimedSnapshot
+
+# Maximum delay added to each run, as a fraction of the collector interval
+SCHEDULER_JITTER = 0.05
+# Delay before running again a collector without snapshot, in seconds
+SCHEDULER_PRIME_DELAY = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+class CollectorScheduler:
+    """
+    Run every collector of a registry at its own interval.
+
+    Attributes:
+        registry (CollectorRegistry): Collectors to run and store of their snapshots
+        jitter (float): Maximum delay added to each run, as a fraction of the interval
+    """
+
+    def __init__(self, registry: CollectorRegistry, jitter: float = SCHEDULER_JITTER) -> None:
+        """
+        Initialize the scheduler.
+
+        Args:
+            registry: Collectors to run and store of their snapshots
+            jitter: Maximum delay added to each run, as a fraction of the interval
+        """
+        self.registry = registry
+        self.jitter = jitter
+        self._random = random.Random()
+        self._rescheduled = False
+
+    def reschedule(self) -> None:
+        """
+        Bring forward the next run of the collectors whose interval was shortened.
+
+        Called by the registry listeners, from the scheduler thread, it takes effect after
+        the current collection.
+        """
+        self._rescheduled = True
+
+    def run_once(self, collector: Collector) -> bool:
+        """
+        Run a collector, publish its snapshot, if any, and record its duration.
+
+        Args:
+            collector: Collector to run
+
+        Returns:
+            bool: Whether the collection succeeded
+        """
+        start = time.perf_counter()
+        try:
+            snapshot = collector.collect()
+        except Exception as exc:  # pylint: disable=broad-except
+            # A failing collector must not stop the others
+            self.registry.stats(collector.name).record(time.perf_counter() - start, repr(exc))
+            logger.exception("Collector %s failed", collector.name)
+            return False
+        self.registry.stats(collector.name).record(time.perf_counter() - start)
+        if isinstance(snapshot, TimedSnapshot):
+            self.registry.publish(collector.name, snapshot.snapshot, snapshot.timestamp)
+        elif snapshot is not None:
+            self.registry.publish(collector.name, snapshot)
+        return True
+
+    def run(self, stop_event: threading.Event) -> None:
+        """
+        Run the collectors until `stop_event` is set.
+
+        Collectors without snapshot yet run right away, the others one interval after the
+        start. Collectors must be registered before the scheduler starts.
+
+        Args:
+            stop_event: Event stopping the scheduler once set
+        """
+        now = time.monotonic()
+        # Items are (run time, registration order, due time, collector)
+        heap: List[Tuple[float, int, float, Collector]] = []
+        for order, collector in enumerate(self.registry.collectors()):
+            due = now
+            if self.registry.latest(collector.name) is not None:
+                due += collector.interval
+            heap.append((due, order, due, collector))
+        heapq.heapify(heap)
+        while heap:
+            run_at, order, due, collector = heap[0]
+            if stop_event.wait(max(0.0, run_at - time.monotonic())):
+                return
+            self.run_once(collector)
+            if self._rescheduled:
+                # The collector just run stays first, the others are brought forward to
+                # after now
+                self._rescheduled = False
+                self._bring_forward(heap)
+            if self.registry.latest(collector.name) is None:
+                # Restart the grid of the collector from its next attempt
+                due = time.monotonic() + min(SCHEDULER_PRIME_DELAY, collector.interval)
+                heapq.heapreplace(heap, (due, order, due, collector))
+                continue
+            interval = collector.interval
+            due += interval
+            now = time.monotonic()
+            if now > due:
+                self.registry.stats(collector.name).overruns += 1
+                due += interval * math.ceil((now - due) / interval)
+            delay = self._random.uniform(0.0, self.jitter * interval)
+            heapq.heapreplace(heap, (due + delay, order, due, collector))
+
+    @staticmethod
+    def _bring_forward(heap: List[Tuple[float, int, float, Collector]]) -> None:
+        """Restart the grid of the collectors due later than one interval from now."""
+        now = time.monotonic()
+        for index, (run_at, order, due, collector) in enumerate(heap):
+            if due > now + collector.interval:
+                due = now + collector.interval
+                heap[index] = (min(run_at, due), order, due, collector)
+        heapq.heapify(heap)
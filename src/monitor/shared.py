@@ -0,0 +1,630 @@
+"""
+This module defines a shared memory segment publishing the metrics to several processes.
+
+In multi-worker mode a single sampler process runs the collectors and writes their snapshots
+to records of a `multiprocessing.shared_memory` segment, and every server worker reads the
+records instead of sampling the system itself, so the sampling cost does not grow with the
+number of workers and all the workers serve the same values. The CPU and RAM snapshots are
+written as fixed-layout records of floats, the snapshots of the other collectors of
+`SHARED_SNAPSHOTS`, whose size varies, are pickled into records of bytes. The segment is
+only accessible to the user running the agent, like its pickled records.
+
+Each record is guarded by a sequence lock: the writer makes the sequence number odd while it
+writes, then even again, and a reader retries until it reads the same even number before
+and after the values. Readers never block the writer nor each other.
+"""
+import logging
+import multiprocessing
+import pickle
+import signal
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Union
+
+import psutil
+
+from monitor.adaptive import AdaptiveSampling
+from monitor.collectors import (
+    CONTAINER_CPU_COLLECTOR,
+    CONTAINER_PRESSURE_COLLECTOR,
+    CONTAINER_RAM_COLLECTOR,
+    CPU_COLLECTOR,
+    CPU_TIMES_COLLECTOR,
+    DISK_IO_COLLECTOR,
+    DISK_USAGE_COLLECTOR,
+    NET_COLLECTOR,
+    PRESSURE_COLLECTOR,
+    PROCESS_COLLECTOR,
+    RAM_COLLECTOR,
+    Cgroup,
+    Collector,
+    CpuSnapshot,
+    RamSnapshot,
+    TimedSnapshot,
+)
+
+# Segment header: magic number, number of CPU values per record and bit mask of the
+# collectors of `SHARED_SNAPSHOTS` run by the sampler process
+SHARED_HEADER = struct.Struct("<4sIQ")
+SHARED_MAGIC = b"AGM2"
+# Record header: sequence number, then the values start with the sample time
+_SEQUENCE = struct.Struct("<Q")
+# Header of a record of bytes: sequence number, sample time and length of the bytes
+_BLOB_HEADER = struct.Struct("<QdI")
+# Reads retried while the writer updates a record, before giving up until the next read
+SEQLOCK_RETRIES = 100
+# Time between two reads of the shared records by the server workers, in seconds
+SHARED_POLL_INTERVAL = 0.1
+# Collectors whose pickled snapshots are shared, besides the CPU and RAM, in segment order
+SHARED_SNAPSHOTS = (
+    PRESSURE_COLLECTOR,
+    CONTAINER_PRESSURE_COLLECTOR,
+    DISK_IO_COLLECTOR,
+    DISK_USAGE_COLLECTOR,
+    PROCESS_COLLECTOR,
+    NET_COLLECTOR,
+    CONTAINER_CPU_COLLECTOR,
+    CONTAINER_RAM_COLLECTOR,
+    CPU_TIMES_COLLECTOR,
+)
+# Maximum size of a pickled snapshot, in bytes
+SHARED_SNAPSHOT_SIZE = 256 * 1024
+# Time given to the sampler process to create its collectors, in seconds
+SHARED_START_TIMEOUT = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class SharedRecord(NamedTuple):
+    """
+    Consistent read of a shared record.
+
+    Attributes:
+        sequence (int): Sequence number of the record, increased by each write
+        timestamp (float): Time of the snapshot in seconds since the epoch
+        values (List[float]): Values of the snapshot
+    """
+
+    sequence: int
+    timestamp: float
+    values: List[float]
+
+
+class SeqlockRecord:
+    """
+    Fixed-size record of float values in a shared buffer, guarded by a sequence lock.
+
+    Attributes:
+        size (int): Number of values of the record
+        nbytes (int): Number of bytes of the record
+    """
+
+    def __init__(self, buffer: memoryview, offset: int, size: int) -> None:
+        """
+        Initialize the record at an offset of a buffer.
+
+        Args:
+            buffer: Shared buffer holding the record
+            offset: Offset of the record in the buffer
+            size: Number of values of the record
+        """
+        self.size = size
+        self._buffer = buffer
+        self._offset = offset
+        self._values = struct.Struct(f"<d{size}d")
+        self.nbytes = _SEQUENCE.size + self._values.size
+
+    def write(self, timestamp: float, values: Sequence[float]) -> None:
+        """
+        Write the values of a snapshot, only one process may write a record.
+
+        Missing values are written as zeros and extra values are dropped.
+
+        Args:
+            timestamp: Time of the snapshot in seconds since the epoch
+            values: Values of the snapshot
+        """
+        values = list(values[:self.size]) + [0.0] * (self.size - len(values))
+        (sequence,) = _SEQUENCE.unpack_from(self._buffer, self._offset)
+        _SEQUENCE.pack_into(self._buffer, self._offset, sequence + 1)
+        self._values.pack_into(self._buffer, self._offset + _SEQUENCE.size, timestamp, *values)
+        _SEQUENCE.pack_into(self._buffer, self._offset, sequence + 2)
+
+    def read(self) -> Optional[SharedRecord]:
+        """
+        Read the latest values of the record, without locking.
+
+        Returns:
+            Optional[SharedRecord]: Values of the record, None if it was never written or if
+                                    it kept being written during all the retries
+        """
+        for _ in range(SEQLOCK_RETRIES):
+            (before,) = _SEQUENCE.unpack_from(self._buffer, self._offset)
+            if before & 1:
+                continue
+            timestamp, *values = self._values.unpack_from(
+                self._buffer, self._offset + _SEQUENCE.size
+            )
+            (after,) = _SEQUENCE.unpack_from(self._buffer, self._offset)
+            if before == after:
+                return None if before == 0 else SharedRecord(before, timestamp, values)
+        return None
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the record, 0 if it was never written, odd during a write."""
+        return _SEQUENCE.unpack_from(self._buffer, self._offset)[0]
+
+
+class SharedBlob(NamedTuple):
+    """
+    Consistent read of a shared record of bytes.
+
+    Attributes:
+        sequence (int): Sequence number of the record, increased by each write
+        timestamp (float): Time of the snapshot in seconds since the epoch
+        data (bytes): Bytes of the snapshot
+    """
+
+    sequence: int
+    timestamp: float
+    data: bytes
+
+
+class SeqlockBlob:
+    """
+    Record of up to `capacity` bytes in a shared buffer, guarded by a sequence lock.
+
+    Attributes:
+        capacity (int): Maximum number of bytes of the record
+        nbytes (int): Number of bytes of the record in the buffer
+    """
+
+    def __init__(self, buffer: memoryview, offset: int, capacity: int) -> None:
+        """
+        Initialize the record at an offset of a buffer.
+
+        Args:
+            buffer: Shared buffer holding the record
+            offset: Offset of the record in the buffer
+            capacity: Maximum number of bytes of the record
+        """
+        self.capacity = capacity
+        self._buffer = buffer
+        self._offset = offset
+        self.nbytes = _BLOB_HEADER.size + capacity
+
+    def write(self, timestamp: float, data: bytes) -> None:
+        """
+        Write the bytes of a snapshot, only one process may write a record.
+
+        Args:
+            timestamp: Time of the snapshot in seconds since the epoch
+            data: Bytes of the snapshot
+
+        Raises:
+            ValueError: If there are more bytes than the capacity of the record
+        """
+        if len(data) > self.capacity:
+            raise ValueError(f"Snapshot of {len(data)} bytes over {self.capacity} bytes")
+        (sequence,) = _SEQUENCE.unpack_from(self._buffer, self._offset)
+        _SEQUENCE.pack_into(self._buffer, self._offset, sequence + 1)
+        start = self._offset + _BLOB_HEADER.size
+        self._buffer[start:start + len(data)] = data
+        _BLOB_HEADER.pack_into(self._buffer, self._offset, sequence + 1, timestamp, len(data))
+        _SEQUENCE.pack_into(self._buffer, self._offset, sequence + 2)
+
+    def read(self) -> Optional[SharedBlob]:
+        """
+        Read the latest bytes of the record, without locking.
+
+        Returns:
+            Optional[SharedBlob]: Bytes of the record, None if it was never written or if it
+                                  kept being written during all the retries
+        """
+        start = self._offset + _BLOB_HEADER.size
+        for _ in range(SEQLOCK_RETRIES):
+            before, timestamp, length = _BLOB_HEADER.unpack_from(self._buffer, self._offset)
+            if before & 1:
+                continue
+            data = bytes(self._buffer[start:start + min(length, self.capacity)])
+            (after,) = _SEQUENCE.unpack_from(self._buffer, self._offset)
+            if before == after:
+                return None if before == 0 else SharedBlob(before, timestamp, data)
+        return None
+
+    @property
+    def sequence(self) -> int:
+        """Sequence number of the record, 0 if it was never written, odd during a write."""
+        return _SEQUENCE.unpack_from(self._buffer, self._offset)[0]
+
+
+class SharedMetrics:
+    """
+    Shared memory segment holding the latest snapshots of the collectors.
+
+    Attributes:
+        name (str): Name of the shared memory segment
+        cpu_count (int): Number of CPU usage values
+        cpu (SeqlockRecord): Latest CPU usage of each core
+        ram (SeqlockRecord): Latest RAM usage, in the `RamSnapshot` field order
+        snapshots (Dict[str, SeqlockBlob]): Latest pickled snapshot of each collector of
+                                            `SHARED_SNAPSHOTS`, by collector name
+    """
+
+    def __init__(self, segment: shared_memory.SharedMemory) -> None:
+        """
+        Map the records of a segment, use `create` or `attach` instead.
+
+        Args:
+            segment: Shared memory segment, initialized with its header
+
+        Raises:
+            ValueError: If the segment does not hold shared metrics
+        """
+        magic, self.cpu_count, _ = SHARED_HEADER.unpack_from(segment.buf)
+        if magic != SHARED_MAGIC:
+            raise ValueError(f"Not a shared metrics segment: {segment.name}")
+        self.name = segment.name
+        self._segment = segment
+        self.cpu = SeqlockRecord(segment.buf, SHARED_HEADER.size, self.cpu_count)
+        offset = SHARED_HEADER.size + self.cpu.nbytes
+        self.ram = SeqlockRecord(segment.buf, offset, len(RamSnapshot._fields))
+        offset += self.ram.nbytes
+        self.snapshots: Dict[str, SeqlockBlob] = {}
+        for name in SHARED_SNAPSHOTS:
+            self.snapshots[name] = SeqlockBlob(segment.buf, offset, SHARED_SNAPSHOT_SIZE)
+            offset += self.snapshots[name].nbytes
+
+    @staticmethod
+    def _nbytes(cpu_count: int) -> int:
+        """Return the size of a segment holding `cpu_count` CPU usage values."""
+        record = _SEQUENCE.size + struct.calcsize("<d")
+        blob = _BLOB_HEADER.size + SHARED_SNAPSHOT_SIZE
+        return (
+            SHARED_HEADER.size
+            + 2 * record
+            + 8 * (cpu_count + len(RamSnapshot._fields))
+            + len(SHARED_SNAPSHOTS) * blob
+        )
+
+    @property
+    def collectors(self) -> List[str]:
+        """Collectors of `SHARED_SNAPSHOTS` run by the sampler process, in segment order."""
+        (*_, mask) = SHARED_HEADER.unpack_from(self._segment.buf)
+        return [name for bit, name in enumerate(SHARED_SNAPSHOTS) if mask >> bit & 1]
+
+    def declare(self, collectors: Iterable[str]) -> None:
+        """
+        Record the collectors run by the sampler process, before the workers attach.
+
+        Args:
+            collectors: Names of the collectors run, those out of `SHARED_SNAPSHOTS` are
+                        ignored
+        """
+        names = set(collectors)
+        mask = sum(1 << bit for bit, name in enumerate(SHARED_SNAPSHOTS) if name in names)
+        SHARED_HEADER.pack_into(self._segment.buf, 0, SHARED_MAGIC, self.cpu_count, mask)
+
+    @classmethod
+    def create(cls, name: str, cpu_count: Optional[int] = None) -> "SharedMetrics":
+        """
+        Create a segment without any snapshot.
+
+        Args:
+            name: Name of the shared memory segment
+            cpu_count: Number of CPU usage values, the number of logical cores if None
+
+        Returns:
+            SharedMetrics: The created segment, to be unlinked by its creator
+
+        Raises:
+            FileExistsError: If a segment with the same name already exists
+        """
+        cpu_count = psutil.cpu_count() if cpu_count is None else cpu_count
+        segment = shared_memory.SharedMemory(name, create=True, size=cls._nbytes(cpu_count))
+        SHARED_HEADER.pack_into(segment.buf, 0, SHARED_MAGIC, cpu_count, 0)
+        return cls(segment)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedMetrics":
+        """
+        Attach to an existing segment.
+
+        Args:
+            name: Name of the shared memory segment
+
+        Returns:
+            SharedMetrics: The attached segment
+
+        Raises:
+            FileNotFoundError: If there is no segment with this name
+        """
+        return cls(shared_memory.SharedMemory(name))
+
+    def close(self) -> None:
+        """Unmap the segment from this process."""
+        self._segment.close()
+
+    def unlink(self) -> None:
+        """Destroy the segment, once every process has closed it."""
+        self._segment.unlink()
+
+
+class SharedMetricsWriter:
+    """
+    Registry listener writing the snapshots to shared metrics.
+    """
+
+    def __init__(self, shared: SharedMetrics) -> None:
+        """
+        Initialize the writer.
+
+        Args:
+            shared: Segment written, this writer must be its only writer
+        """
+        self.shared = shared
+
+    def __call__(self, name: str, timestamp: float, snapshot: Any) -> None:
+        """Write a published snapshot to its record."""
+        if name == CPU_COLLECTOR:
+            self.shared.cpu.write(timestamp, snapshot.percent)
+        elif name == RAM_COLLECTOR:
+            self.shared.ram.write(timestamp, snapshot)
+        elif name in self.shared.snapshots:
+            try:
+                self.shared.snapshots[name].write(
+                    timestamp, pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+                )
+            except ValueError:
+                # The workers keep serving the previous snapshot
+                logger.warning("Snapshot of collector %s too large to share", name)
+
+
+class SharedCollector(Collector):
+    """
+    Base class of the collectors reading a record of shared metrics.
+
+    Collections only return a snapshot when the record has been written since the previous
+    one, so they run more often than the sampler process to keep the delay low.
+
+    Attributes:
+        shared (SharedMetrics): Segment read
+    """
+
+    interval = SHARED_POLL_INTERVAL
+
+    def __init__(self, shared: SharedMetrics, interval: Optional[float] = None) -> None:
+        """
+        Initialize the collector.
+
+        Args:
+            shared: Segment read
+            interval: Time between two reads in seconds, the class default if None
+        """
+        super().__init__(interval)
+        self.shared = shared
+        self._sequence = 0
+
+    def _read(
+        self, record: Union[SeqlockRecord, SeqlockBlob]
+    ) -> Union[SharedRecord, SharedBlob, None]:
+        """Read a record, None if it was not written since the previous read."""
+        if record.sequence == self._sequence:
+            return None
+        values = record.read()
+        if values is None or values.sequence == self._sequence:
+            return None
+        self._sequence = values.sequence
+        return values
+
+
+class SharedCpuCollector(SharedCollector):
+    """
+    Collect the usage of each CPU core written by the sampler process.
+    """
+
+    name = CPU_COLLECTOR
+
+    def collect(self) -> Optional[TimedSnapshot]:
+        """
+        Read the latest CPU snapshot.
+
+        Returns:
+            Optional[TimedSnapshot]: Usage percentage of each logical core at the time the
+                                     sampler took it, None if there is no new snapshot
+        """
+        record = self._read(self.shared.cpu)
+        if record is None:
+            return None
+        return TimedSnapshot(record.timestamp, CpuSnapshot(record.values))
+
+
+class SharedRamCollector(SharedCollector):
+    """
+    Collect the RAM usage written by the sampler process.
+    """
+
+    name = RAM_COLLECTOR
+
+    def collect(self) -> Optional[TimedSnapshot]:
+        """
+        Read the latest RAM snapshot.
+
+        Returns:
+            Optional[TimedSnapshot]: RAM usage in MB at the time the sampler took it, None if
+                                     there is no new snapshot
+        """
+        record = self._read(self.shared.ram)
+        if record is None:
+            return None
+        return TimedSnapshot(record.timestamp, RamSnapshot(*record.values))
+
+
+class SharedSnapshotCollector(SharedCollector):
+    """
+    Collect the snapshots of a collector of `SHARED_SNAPSHOTS` written by the sampler
+    process.
+    """
+
+    def __init__(self, shared: SharedMetrics, name: str, interval: Optional[float] = None):
+        """
+        Initialize the collector, named after the collector run by the sampler process.
+
+        Args:
+            shared: Segment read
+            name: Name of the collector run by the sampler process
+            interval: Time between two reads in seconds, the class default if None
+        """
+        self.name = name
+        super().__init__(shared, interval)
+
+    def collect(self) -> Optional[TimedSnapshot]:
+        """
+        Read the latest snapshot.
+
+        Returns:
+            Optional[TimedSnapshot]: Snapshot of the collector run by the sampler process at
+                                     the time it was taken, None if there is no new snapshot
+        """
+        record = self._read(self.shared.snapshots[self.name])
+        if record is None:
+            return None
+        return TimedSnapshot(record.timestamp, pickle.loads(record.data))
+
+
+def run_sampler(
+    name: str,
+    sampling: Optional[AdaptiveSampling] = None,
+    cgroup_root: Optional[str] = None,
+    started: Optional[Any] = None,
+) -> None:
+    """
+    Run the collectors and write their snapshots to shared metrics until terminated.
+
+    This is the target of the sampler process started by `SharedSampler`.
+
+    Args:
+        name: Name of the shared memory segment, created beforehand
+        sampling: Adaptive sampling policy of the collectors, fixed intervals if None
+        cgroup_root: Mount point of the cgroup v2 hierarchy, whose cgroup of the agent is
+                     also collected if there is one, only the host is collected if None
+        started: Event set once the collectors run by the process are declared
+    """
+    # Imported here, the monitor module imports this one
+    # pylint: disable=import-outside-toplevel
+    from monitor.monitor import SHARED_COLLECTORS, MonitorTask
+
+    # Interrupting the terminal interrupts the server, which then terminates the sampler
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    shared = SharedMetrics.attach(name)
+    cgroup = None if cgroup_root is None else Cgroup.detect(cgroup_root)
+    # Only the shared collectors run, the histories are kept by the server workers
+    monitortask = MonitorTask(
+        history_size=1,
+        cgroup=cgroup,
+        sampling=sampling,
+        rollup_tiers=(),
+        collectors=SHARED_COLLECTORS,
+    )
+    shared.declare(collector.name for collector in monitortask.registry.collectors())
+    monitortask.registry.add_listener(SharedMetricsWriter(shared))
+    if started is not None:
+        started.set()
+    monitortask.scheduler.run(threading.Event())
+
+
+class SharedSampler:
+    """
+    Sampler process writing the metrics to a shared memory segment it owns.
+
+    Attributes:
+        name (str): Name of the shared memory segment
+        sampling (Optional[AdaptiveSampling]): Adaptive sampling policy of the collectors,
+                                               fixed intervals if None
+        cgroup_root (Optional[str]): Mount point of the cgroup v2 hierarchy, None to only
+                                     collect the host
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sampling: Optional[AdaptiveSampling] = None,
+        cgroup_root: Optional[str] = None,
+    ) -> None:
+        """
+        Initialize the sampler, nothing is created before `start`.
+
+        Args:
+            name: Name of the shared memory segment
+            sampling: Adaptive sampling policy of the collectors, not governing any collector
+                      yet, fixed intervals if None
+            cgroup_root: Mount point of the cgroup v2 hierarchy, whose cgroup of the agent is
+                         also collected if there is one, None to only collect the host
+        """
+        self.name = name
+        self.sampling = sampling
+        self.cgroup_root = cgroup_root
+        # Forking a process running threads is not safe
+        self._context = multiprocessing.get_context("spawn")
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._shared: Optional[SharedMetrics] = None
+
+    def start(self, timeout: float = SHARED_START_TIMEOUT) -> None:
+        """
+        Create the shared memory segment and start the sampler process.
+
+        Returns once the process has declared its collectors, so that the workers attached
+        afterwards read the snapshots of the same collectors.
+
+        Args:
+            timeout: Maximum time to wait for the process, in seconds
+
+        Raises:
+            RuntimeError: If the process exited or did not declare its collectors in time
+        """
+        self._shared = SharedMetrics.create(self.name)
+        started = self._context.Event()
+        self._process = self._context.Process(
+            target=run_sampler,
+            args=(self.name, self.sampling, self.cgroup_root, started),
+            name="sampler",
+            daemon=True,
+        )
+        self._process.start()
+        # Either the process declares its collectors, or it exits on an error
+        deadline = time.monotonic() + timeout
+        while not started.is_set() and self._process.is_alive():
+            if time.monotonic() >= deadline:
+                break
+            started.wait(0.1)
+        if not started.is_set():
+            self.stop()
+            raise RuntimeError("The sampler process did not start")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the sampler process and destroy the shared memory segment.
+
+        The process holds no lock shared with the others, so it is simply terminated.
+
+        Args:
+            timeout: Maximum time to wait for the process, in seconds
+        """
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(timeout)
+            self._process = None
+        if self._shared is not None:
+            self._shared.close()
+            self._shared.unlink()
+            self._shared = None
+
+    def __enter__(self) -> "SharedSampler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
@@ -0,0 +1,116 @@
+"""
+This module defines a cache of the API responses built from the collector snapshots.
+
+Snapshots only change once per collection, while dashboards poll the API much more often.
+Each response is encoded to JSON bytes once per snapshot version, right after the
+collection for the responses already requested, and tagged with a digest of its bytes: a
+request then costs a dictionary lookup, or nothing but headers when the client already has
+the same bytes (`If-None-Match`).
+"""
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from monitor.collectors import CollectorRegistry
+
+# Encoder of a response, called with the latest snapshot of a collector, None if it has none
+Encoder = Callable[[Any], bytes]
+
+logger = logging.getLogger(__name__)
+
+
+class EncodedSnapshot(NamedTuple):
+    """
+    Response encoded from a snapshot.
+
+    Attributes:
+        version (int): Version of the encoded snapshot in the registry
+        etag (str): Quoted digest of the body, an HTTP entity tag
+        body (bytes): Encoded response
+    """
+
+    version: int
+    etag: str
+    body: bytes
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Build the entity tag of a response body.
+
+    Args:
+        body: Encoded response
+
+    Returns:
+        str: Quoted digest of the body
+    """
+    return f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+
+class SnapshotCache:
+    """
+    Encoded responses of the latest collector snapshots.
+
+    Attributes:
+        registry (CollectorRegistry): Registry holding the snapshots
+    """
+
+    def __init__(self, registry: CollectorRegistry) -> None:
+        """
+        Initialize an empty cache, updated by every snapshot published in the registry.
+
+        Args:
+            registry: Registry holding the snapshots
+        """
+        self.registry = registry
+        # Encoders by response key, and response keys by collector
+        self._encoders: Dict[str, Tuple[str, Encoder]] = {}
+        self._keys: Dict[str, List[str]] = {}
+        self._encoded: Dict[str, EncodedSnapshot] = {}
+        self._lock = threading.Lock()
+        registry.add_listener(self._on_publish)
+
+    def get(self, key: str, collector: str, encoder: Encoder) -> EncodedSnapshot:
+        """
+        Return a response encoded from the latest snapshot of a collector.
+
+        The encoder is registered on the first call, then the response is encoded again after
+        each collection.
+
+        Args:
+            key: Unique key of the response, such as the route path
+            collector: Name of the collector providing the snapshot
+            encoder: Encoder of the response
+
+        Returns:
+            EncodedSnapshot: Response encoded from the latest snapshot
+        """
+        encoded = self._encoded.get(key)
+        if encoded is not None and encoded.version == self.registry.latest_version(collector):
+            return encoded
+        with self._lock:
+            if key not in self._encoders:
+                self._encoders[key] = (collector, encoder)
+                self._keys.setdefault(collector, []).append(key)
+        return self._encode(key, collector, encoder)
+
+    def _encode(self, key: str, collector: str, encoder: Encoder) -> EncodedSnapshot:
+        """Encode a response from the latest snapshot of a collector and cache it."""
+        version, snapshot = self.registry.latest_entry(collector)
+        body = encoder(snapshot)
+        encoded = EncodedSnapshot(version, make_etag(body), body)
+        current: Optional[EncodedSnapshot] = self._encoded.get(key)
+        # A concurrent encoding of a newer snapshot wins
+        if current is None or current.version <= version:
+            self._encoded[key] = encoded
+        return encoded
+
+    def _on_publish(self, name: str, _timestamp: float, _snapshot: Any) -> None:
+        """Encode the requested responses of a collector after its collection."""
+        for key in self._keys.get(name, ()):
+            try:
+                self._encode(key, *self._encoders[key])
+            except Exception:  # pylint: disable=broad-except
+                # The outdated response is encoded again, and fails, by the next request
+                logger.exception("Encoding %s failed", key)
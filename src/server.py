@@ -2,9 +2,9 @@
 This module contains a FastAPI application with various routes and middleware.
 
 It initializes the FastAPI app, sets up routers, event listeners, and exception handlers, and
-creates a monitoring thread for fetching metrics.
+runs a monitoring thread for fetching metrics during the application lifespan.
 """
-from typing import List
+from typing import AsyncIterator, List
 from fastapi import FastAPI, Request
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
@@ -13,7 +13,11 @@ from api import router
 from api.default.default import default_router
 from core.exceptions import CustomException
 from core.config import get_config
+from domain.services import LogService
 from monitor import MonitorTask
+from monitor.adaptive import AdaptiveSampling
+from monitor.collectors import Cgroup
+from monitor.shared import SharedMetrics
 from contextlib import asynccontextmanager
 import asyncio
 
@@ -45,15 +49,23 @@ def init_listeners(fastapi: FastAPI) -> None:
             content={"error_code": exc.error_code, "message": exc.message},
         )
 
-    # Start monitoring thread
-    @asynccontextmanager
-    async def on_start_up(fastapi: FastAPI):
-        task = asyncio.create_task(fastapi.state.monitor_task.monitor())
-        try:
-            yield
-        finally:
-            print("Shutting down monitor task...")
-            task.cancel()
+
+@asynccontextmanager
+async def lifespan(fastapi: FastAPI) -> AsyncIterator[None]:
+    """
+    Run the metric sampler thread for the lifetime of the application.
+
+    Args:
+        fastapi (FastAPI): The FastAPI application being served.
+    """
+    monitortask = fastapi.state.monitortask
+    monitortask.start()
+    try:
+        yield
+    finally:
+        # Joining the sampler blocks for at most one sample, off the event loop
+        await asyncio.to_thread(monitortask.stop)
+        fastapi.state.logservice.close()
 
 
 def make_middleware() -> List[Middleware]:
@@ -83,8 +95,22 @@ def create_app() -> FastAPI:
         FastAPI: The configured FastAPI application.
     """
     config = get_config()
-    # Monitoring thread to fetch metrics
-    monitortask = MonitorTask()
+    # Metrics sampler, it takes no sample until its thread is run by the lifespan. With
+    # several workers, it reads the metrics sampled by the sampler process instead
+    shared = None if config.metrics_shm is None else SharedMetrics.attach(config.metrics_shm)
+    # Container view of the CPU and RAM, read from the cgroup v2 of the agent if there is one
+    cgroup = Cgroup.detect(config.cgroup_root)
+    # The collectors speed up under load and slow down while the host is stable
+    sampling = AdaptiveSampling(
+        floor=config.sampling_floor,
+        ceiling=config.sampling_ceiling,
+        cpu_threshold=config.sampling_cpu_threshold,
+        ram_threshold=config.sampling_ram_threshold,
+        change_threshold=config.sampling_change_threshold,
+    )
+    monitortask = MonitorTask(
+        interval=config.sampling_floor, shared=shared, cgroup=cgroup, sampling=sampling
+    )
     # API
     fastapi = FastAPI(
         title=config.title,
@@ -93,9 +119,18 @@ def create_app() -> FastAPI:
         docs_url="/docs",
         redoc_url="/redoc",
         middleware=make_middleware(),
+        lifespan=lifespan,
     )
     fastapi.state.monitortask = monitortask
+    # Log service kept for the app lifetime so log files are ingested incrementally
+    fastapi.state.logservice = LogService(
+        workers=config.log_workers,
+        scan_mode=config.log_scan_mode,
+        index_dir=config.log_index_dir,
+    )
     fastapi.state.version = config.version
+    # View of the CPU and RAM routes when a request does not choose one
+    fastapi.state.metrics_view = config.metrics_view if cgroup is not None else "host"
     init_routers(fastapi)
     init_listeners(fastapi)
     return fastapi
@@ -5,6 +5,8 @@ This module contains test cases for the monitoring API endpoints,
 including CPU usage, RAM information, and log parsing functionality.
 """
 
+import asyncio
+import json
 import threading
 from typing import List, Dict, Union
 
@@ -12,7 +14,35 @@ from typing import List, Dict, Union
 import pytest
 from fastapi.testclient import TestClient
 
+from api.metrics.v1 import logs, stream
 from monitor import MonitorTask
+from monitor.collectors import (
+    CONTAINER_CPU_COLLECTOR,
+    CONTAINER_RAM_COLLECTOR,
+    DISK_IO_COLLECTOR,
+    DISK_USAGE_COLLECTOR,
+    Cgroup,
+    CPU_TIMES_COLLECTOR,
+    CpuSnapshot,
+    CpuTimesSnapshot,
+    ContainerCpuSnapshot,
+    DiskIoRates,
+    DiskIoSnapshot,
+    DiskUsageSnapshot,
+    MountUsage,
+    NET_COLLECTOR,
+    NetIoRates,
+    NetIoSnapshot,
+    PRESSURE_COLLECTOR,
+    PressureSnapshot,
+    PressureStall,
+    PROCESS_COLLECTOR,
+    ProcessSnapshot,
+    ProcessUsage,
+    RamSnapshot,
+    ResourcePressure,
+)
+from monitor.history import HISTORY_MAX_POINTS, MetricHistory
 from monitor.monitor_log import parse_log_line, parse_log_file
 
 from server import app
@@ -67,6 +97,35 @@ def test_health():
     assert response.status_code == 200
 
 
+def test_readiness():
+    """Test that the readiness endpoint waits for the first metric samples."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTask(history_size=8)
+        assert client.get("/health").status_code == 200
+        assert client.get("/health/ready").status_code == 503
+        app.state.monitortask.sample()
+        app.state.monitortask.sample()
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_lifespan_runs_sampler():
+    """Test that the application lifespan starts and stops the sampler thread."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        with TestClient(app) as lifespan_client:
+            assert app.state.monitortask._thread is not None
+            assert lifespan_client.get("/health").status_code == 200
+        assert app.state.monitortask._thread is None
+    finally:
+        app.state.monitortask = save_app
+
+
 def test_get_cpu_usage():
     """Test the CPU usage endpoint with mock data."""
     # Save original monitor task
@@ -125,6 +184,456 @@ def test_get_ram_info():
         # Restore original monitor task
         app.state.monitortask = save_app
 
+
+def test_metrics_etag():
+    """Test that the metric responses are revalidated with their ETag."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        response = client.get("/metrics/v1/cpu/usage")
+        etag = response.headers["etag"]
+        assert response.headers["cache-control"] == "no-cache"
+        response = client.get("/metrics/v1/cpu/usage", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b"" and response.headers["etag"] == etag
+        response = client.get("/metrics/v1/cpu/usage", headers={"If-None-Match": f'"x", W/{etag}'})
+        assert response.status_code == 304
+        app.state.monitortask.cpu_percent = [20.0, 30.0]
+        response = client.get("/metrics/v1/cpu/usage", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert response.json()["average"] == 25.0
+        app.state.monitortask.ram_percent = 25.0
+        response = client.get("/metrics/v1/ram/usage")
+        assert response.json() == [{"id": 0, "usage": "25.0"}]
+        response = client.get("/metrics/v1/ram/usage", headers={"If-None-Match": "*"})
+        assert response.status_code == 304
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_get_cpu_times():
+    """Test the CPU time breakdown endpoints with mock data."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        assert client.get("/metrics/v1/cpu/times").json() == {"cpu_times": [], "average": {}}
+        app.state.monitortask.cpu_times_history = MetricHistory(["user", "steal"])
+        app.state.monitortask.registry.publish(
+            CPU_TIMES_COLLECTOR,
+            CpuTimesSnapshot(("user", "steal"), [[60.0, 40.0], [20.0, 0.0]], [40.0, 20.0]),
+            1_700_000_000.0,
+        )
+        assert client.get("/metrics/v1/cpu/times").json() == {
+            "cpu_times": [
+                {"core": 0, "times": {"user": 60.0, "steal": 40.0}},
+                {"core": 1, "times": {"user": 20.0, "steal": 0.0}},
+            ],
+            "average": {"user": 40.0, "steal": 20.0},
+        }
+        response = client.get("/metrics/v1/cpu/times/history")
+        assert response.status_code == 200
+        assert response.json()["series"] == ["user", "steal"]
+        assert response.json()["buckets"][0]["avg"] == [40.0, 20.0]
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_get_disk_metrics():
+    """Test the disk endpoints before and after the disk collections."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        assert client.get("/metrics/v1/disk/io").json() == []
+        assert client.get("/metrics/v1/disk/usage").json() == {"mounts": [], "unavailable": []}
+        registry = app.state.monitortask.registry
+        registry.store(DISK_IO_COLLECTOR, DiskIoSnapshot({
+            "sdb": DiskIoRates(0.0, 0.0, 0.0, 0.0),
+            "sda": DiskIoRates(1024.0, 2048.0, 1.5, 3.0),
+        }))
+        registry.store(DISK_USAGE_COLLECTOR, DiskUsageSnapshot(
+            [MountUsage("/", "/dev/sda1", "ext4", 100, 40, 60, 40.0)], ["/mnt/nfs"]
+        ))
+        response = client.get("/metrics/v1/disk/io")
+        assert [device["device"] for device in response.json()] == ["sda", "sdb"]
+        assert response.json()[0] == {
+            "device": "sda",
+            "read_bytes": 1024.0,
+            "write_bytes": 2048.0,
+            "read_ops": 1.5,
+            "write_ops": 3.0,
+        }
+        response = client.get("/metrics/v1/disk/usage")
+        assert response.json() == {
+            "mounts": [{
+                "mountpoint": "/",
+                "device": "/dev/sda1",
+                "fstype": "ext4",
+                "total": 100,
+                "used": 40,
+                "free": 60,
+                "percent": 40.0,
+            }],
+            "unavailable": ["/mnt/nfs"],
+        }
+        etag = response.headers["etag"]
+        response = client.get("/metrics/v1/disk/usage", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_get_net_io():
+    """Test the network endpoint serving the latest network collection."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        assert client.get("/metrics/v1/net/io").json() == []
+        app.state.monitortask.registry.store(NET_COLLECTOR, NetIoSnapshot({
+            "eth0": NetIoRates(1500.123, 300.0, 10.0, 2.0, 0.0, 0.0, 0.5, 0.0),
+        }))
+        assert client.get("/metrics/v1/net/io").json() == [{
+            "interface": "eth0",
+            "rx_bytes": 1500.12,
+            "tx_bytes": 300.0,
+            "rx_packets": 10.0,
+            "tx_packets": 2.0,
+            "rx_errors": 0.0,
+            "tx_errors": 0.0,
+            "rx_drops": 0.5,
+            "tx_drops": 0.0,
+        }]
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_get_top_processes():
+    """Test the top processes endpoint serving the latest process collection."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        response = client.get("/metrics/v1/processes/top")
+        assert response.json() == {"count": 0, "by_cpu": [], "by_memory": []}
+        usage = ProcessUsage(42, "python", 150.5, 1024)
+        app.state.monitortask.registry.store(
+            PROCESS_COLLECTOR, ProcessSnapshot(120, [usage], [usage])
+        )
+        expected = {"pid": 42, "name": "python", "cpu_percent": 150.5, "rss": 1024}
+        assert client.get("/metrics/v1/processes/top").json() == {
+            "count": 120, "by_cpu": [expected], "by_memory": [expected]
+        }
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_get_pressure():
+    """Test the pressure endpoint serving the latest pressure collection."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        assert client.get("/metrics/v1/pressure").json() == []
+        app.state.monitortask.registry.store(PRESSURE_COLLECTOR, PressureSnapshot({
+            "cpu": ResourcePressure(PressureStall(1.5, 0.75, 0.25, 3000), None),
+        }))
+        assert client.get("/metrics/v1/pressure").json() == [{
+            "resource": "cpu",
+            "some": {"avg10": 1.5, "avg60": 0.75, "avg300": 0.25, "stall_usec": 3000},
+            "full": None,
+        }]
+        response = client.get("/metrics/v1/pressure", params={"view": "container"})
+        assert response.status_code == 404
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_container_view(tmp_path):
+    """Test that the CPU and RAM routes serve the container view when it is collected."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        response = client.get("/metrics/v1/ram/info", params={"view": "container"})
+        assert response.status_code == 404
+        assert client.get("/metrics/v1/ram/info", params={"view": "vm"}).status_code == 422
+        (tmp_path / "cgroup.controllers").write_text("cpu memory\n")
+        for name in ("cpu.stat", "memory.current", "memory.stat"):
+            (tmp_path / name).write_text("0\n")
+        cgroup = Cgroup.detect(str(tmp_path), str(tmp_path / "missing"))
+        app.state.monitortask = MonitorTask(history_size=8, cgroup=cgroup)
+        registry = app.state.monitortask.registry
+        registry.store(CONTAINER_CPU_COLLECTOR, ContainerCpuSnapshot([25.0], 2.0, 0, 0))
+        registry.store(CONTAINER_RAM_COLLECTOR, RamSnapshot(50.0, 512.0, 256.0, 256.0, 128.0))
+        response = client.get("/metrics/v1/cpu/usage", params={"view": "container"})
+        assert response.json() == {"cpu_usage": [{"core": 0, "usage": 25.0}], "average": 25.0}
+        response = client.get("/metrics/v1/ram/usage", params={"view": "container"})
+        assert response.json() == [{"id": 0, "usage": "50.0"}]
+        response = client.get("/metrics/v1/ram/info", params={"view": "container"})
+        assert response.json() == {"total": 512.0, "available": 256.0, "used": 256.0, "free": 128.0}
+        # The host view stays the default
+        assert client.get("/metrics/v1/ram/info").json()["total"] != 512.0
+        cgroup.close()
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_get_history():
+    """Test the CPU and RAM history endpoints with mock data."""
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        app.state.monitortask.sample()
+        history = app.state.monitortask.cpu_history = MetricHistory(["core0"])
+        for i in range(6):
+            history.append(1_700_000_000.0 + 3 * i, [float(i)])
+        response = client.get("/metrics/v1/cpu/history", params={"points": 2})
+        assert response.status_code == 200
+        assert response.json() == {
+            "series": ["core0"],
+            "tier": "raw",
+            "buckets": [
+                {"timestamp": "2023-11-14T22:13:20Z", "min": [0.0], "max": [2.0], "avg": [1.0],
+                 "p95": [2.0]},
+                {"timestamp": "2023-11-14T22:13:29Z", "min": [3.0], "max": [5.0], "avg": [4.0],
+                 "p95": [5.0]},
+            ],
+        }
+        response = client.get("/metrics/v1/ram/history")
+        assert response.status_code == 200
+        assert response.json()["series"] == ["percent", "used", "available"]
+        assert len(response.json()["buckets"]) == 1
+        assert client.get("/metrics/v1/ram/history", params={"points": 0}).status_code == 422
+        too_many = {"points": HISTORY_MAX_POINTS + 1}
+        assert client.get("/metrics/v1/ram/history", params=too_many).status_code == 422
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_history_query_off_event_loop():
+    """Test that a slow history query does not block the other requests."""
+    querying, release = threading.Event(), threading.Event()
+
+    class SlowHistory(MetricHistory):
+        def query(self, since=None, until=None, points=300):
+            querying.set()
+            release.wait(5)
+            return super().query(since, until, points)
+
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        app.state.monitortask.cpu_history = SlowHistory(["core0"])
+        with TestClient(app) as lifespan_client:
+            responses = []
+            query = threading.Thread(
+                target=lambda: responses.append(lifespan_client.get("/metrics/v1/cpu/history"))
+            )
+            query.start()
+            assert querying.wait(5)
+            # Served by the same event loop while the query is still running
+            assert lifespan_client.get("/health").status_code == 200
+            assert not release.is_set() and query.is_alive()
+            release.set()
+            query.join(5)
+            assert responses[0].status_code == 200
+    finally:
+        release.set()
+        app.state.monitortask = save_app
+
+
+def test_get_collector_stats():
+    """Test the collector statistics endpoint."""
+    response = client.get("/metrics/v1/collectors/stats")
+    assert response.status_code == 200
+    stats = {entry["name"]: entry for entry in response.json()}
+    assert set(stats) >= {"cpu", "ram"}
+    assert stats["ram"]["runs"] >= 1
+
+
+def test_get_sampling():
+    """Test the sampling rate endpoint, with and without adaptive sampling."""
+    response = client.get("/metrics/v1/collectors/sampling")
+    assert response.status_code == 200
+    sampling = response.json()
+    assert sampling["adaptive"] is True
+    assert sampling["floor"] <= sampling["interval"] <= sampling["ceiling"]
+    assert sampling["rate"] == pytest.approx(1 / sampling["interval"])
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTask(history_size=8)
+        assert client.get("/metrics/v1/collectors/sampling").json() == {
+            "adaptive": False, "interval": 1.0, "rate": 1.0, "floor": 1.0, "ceiling": 1.0,
+        }
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_log_metrics_invalid_time_range():
+    """Test that a time range ending before it starts is rejected."""
+    response = client.get(
+        "/metrics/v1/logs/metrics",
+        params={"since": "2024-01-10T14:00:00", "until": "2024-01-10T13:00:00"},
+    )
+    assert response.status_code == 400
+
+
+def test_stream_log_entries(tmp_path, monkeypatch):
+    """Test the NDJSON log entry stream and its filters."""
+    log_file = tmp_path / "access.log"
+    log_file.write_text(
+        '10.0.0.1 - - [10/Jan/2024:13:55:36 +0000] "GET /a HTTP/1.1" 200 5 "-" "x"\n'
+        '10.0.0.2 - - [10/Jan/2024:13:55:37 +0000] "GET /b HTTP/1.1" 404 5 "-" "x"\n'
+    )
+    monkeypatch.setattr(logs, "ACCESS_LOG_PATH", str(log_file))
+    response = client.get("/metrics/v1/logs/entries", params={"status_class": 4})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["url"] for line in response.text.splitlines()] == ["/b"]
+    assert client.get("/metrics/v1/logs/entries", params={"status_class": 9}).status_code == 422
+
+
+def test_openmetrics(tmp_path, monkeypatch):
+    """Test the OpenMetrics endpoint, its cache and its gzip encoding."""
+    log_file = tmp_path / "access.log"
+    log_file.write_text(
+        '10.0.0.1 - - [10/Jan/2024:13:55:36 +0000] "GET /a HTTP/1.1" 200 5 "-" "x"\n'
+        '10.0.0.2 - - [10/Jan/2024:13:55:37 +0000] "GET /b HTTP/1.1" 404 5 "-" "x"\n'
+    )
+    monkeypatch.setattr(logs, "ACCESS_LOG_PATH", str(log_file))
+    save_app = app.state.monitortask
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        response = client.get("/metrics", headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/openmetrics-text")
+        assert "content-encoding" not in response.headers
+        lines = response.text.splitlines()
+        assert 'agent_cpu_usage_percent{core="1"} 12.0' in lines
+        assert "agent_memory_total_bytes 4194304000.0" in lines
+        assert 'agent_http_requests_total{code="404"} 1' in lines
+        assert f'agent_build_info{{version="{app.state.version}"}} 1' in lines
+        assert lines[-1] == "# EOF"
+        gzipped = client.get("/metrics", headers={"Accept-Encoding": "gzip"})
+        assert gzipped.headers["content-encoding"] == "gzip"
+        assert gzipped.content == response.content
+        # New samples and new requests are rendered
+        app.state.monitortask.cpu_percent = [50.0, 60.0]
+        with open(log_file, "a") as file:
+            file.write('10.0.0.3 - - [10/Jan/2024:13:55:38 +0000] "GET /c HTTP/1.1" 404 5 "-" "x"\n')
+        lines = client.get("/metrics").text.splitlines()
+        assert 'agent_cpu_usage_percent{core="1"} 60.0' in lines
+        assert 'agent_http_requests_total{code="404"} 2' in lines
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_openmetrics_slow_log_poll(monkeypatch):
+    """Test that a slow poll of the access log does not block the other requests."""
+    polling, release = threading.Event(), threading.Event()
+
+    class SlowIngestor:
+        def poll(self):
+            polling.set()
+            release.wait(5)
+            raise FileNotFoundError
+
+    class SlowLogService:
+        def get_ingestor(self, _path):
+            return SlowIngestor()
+
+        def close(self):
+            pass
+
+    save_app, save_logservice = app.state.monitortask, app.state.logservice
+    try:
+        app.state.monitortask = MonitorTaskFake()
+        app.state.logservice = SlowLogService()
+        with TestClient(app) as lifespan_client:
+            responses = []
+            scrape = threading.Thread(
+                target=lambda: responses.append(lifespan_client.get("/metrics"))
+            )
+            scrape.start()
+            assert polling.wait(5)
+            # Served by the same event loop while the poll is still running
+            assert lifespan_client.get("/health").status_code == 200
+            assert not release.is_set() and scrape.is_alive()
+            release.set()
+            scrape.join(5)
+            assert responses[0].status_code == 200
+    finally:
+        release.set()
+        app.state.monitortask = save_app
+        app.state.logservice = save_logservice
+
+
+def test_stream_websocket():
+    """Test that WebSocket subscribers receive the current and the new snapshots."""
+    save_app = app.state.monitortask
+    try:
+        monitortask = app.state.monitortask = MonitorTaskFake()
+        monitortask.cpu_history = MetricHistory(["core0", "core1"])
+        with client.websocket_connect("/metrics/v1/stream/ws?topics=cpu") as websocket:
+            message = json.loads(websocket.receive_text())
+            assert message["topic"] == "cpu" and message["data"]["average"] == 11.0
+            monitortask.registry.publish("cpu", CpuSnapshot([20.0, 40.0]))
+            message = json.loads(websocket.receive_text())
+            assert message["data"]["cpu_usage"][1] == {"core": 1, "usage": 40.0}
+        with pytest.raises(Exception):
+            with client.websocket_connect("/metrics/v1/stream/ws?topics=disk") as websocket:
+                websocket.receive_text()
+        assert client.get("/metrics/v1/stream/sse?topics=disk").status_code == 400
+    finally:
+        app.state.monitortask = save_app
+
+
+def test_stream_websocket_client_frame():
+    """Test that a client frame received with a message does not drop the message."""
+    monitortask = MonitorTaskFake()
+
+    class FakeWebSocket:
+        app = type("App", (), {"state": type("State", (), {"monitortask": monitortask})})
+
+        def __init__(self):
+            self.sent: List[str] = []
+            self.frames = 0
+
+        async def accept(self):
+            pass
+
+        async def receive(self):
+            self.frames += 1
+            if self.frames == 1:
+                return {"type": "websocket.receive", "text": "ping"}
+            await asyncio.sleep(0.1)
+            return {"type": "websocket.disconnect"}
+
+        async def send_text(self, text):
+            self.sent.append(text)
+
+    websocket = FakeWebSocket()
+    asyncio.run(stream.stream_websocket(websocket, topics=["cpu"]))
+    assert [json.loads(text)["topic"] for text in websocket.sent] == ["cpu"]
+    assert monitortask.broadcaster.subscribers() == 0
+
+
+def test_stream_events():
+    """Test the server-sent events of the subscribed topics."""
+    monitortask = MonitorTaskFake()
+
+    async def read_events():
+        events = stream._events(monitortask, ["ram"])
+        first = await events.__anext__()
+        monitortask.registry.publish("ram", monitortask.registry.latest("ram")._replace(free=1.0))
+        second = await events.__anext__()
+        assert monitortask.broadcaster.subscribers() == 1
+        await events.aclose()
+        return first, second
+
+    first, second = asyncio.run(read_events())
+    assert first.startswith(b"event: ram\ndata: {") and first.endswith(b"}\n\n")
+    assert json.loads(second.split(b"data: ")[1])["free"] == 1.0
+    assert monitortask.broadcaster.subscribers() == 0
+
+
 @pytest.fixture
 def valid_log_line() -> str:
     return '192.168.1.1 - admin [10/Jan/2024:13:55:36 +0000] "GET /index.html HTTP/1.1" 200 2326'
@@ -0,0 +1,466 @@
+"""
+Test module for the log analysis services.
+
+This module contains test cases for the incremental access log ingestion
+and the log metrics computed by the LogService.
+"""
+
+import asyncio
+import bz2
+import gzip
+import json
+import lzma
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+import apache_log_parser
+
+from domain.services import LogService
+from domain.services.logservice import STREAM_READ_SIZE
+from monitor.log_index import TimestampIndex
+from monitor.log_ingest import LogIngestor
+from monitor.log_parallel import split_ranges
+from monitor import log_segments
+from monitor.log_errors import normalize_message, parse_error_line
+from monitor.log_parser import COMBINED_FORMAT, LogParser
+
+SAMPLE_LOG = Path(__file__).parent / "tst_log.log"
+
+
+def _line(ip: str, minute: int, url: str, status: int) -> str:
+    return (
+        f'{ip} - - [10/Jan/2024:13:{minute:02d}:00 +0000] "GET {url} HTTP/1.1" '
+        f'{status} 100 "-" "curl/8.0"\n'
+    )
+
+
+def _metrics(service: LogService, path: Path, since=None, until=None):
+    return asyncio.run(service.get_log_metrics(str(path), "unused.log", since, until))
+
+
+@pytest.fixture
+def access_log(tmp_path) -> Path:
+    log_file = tmp_path / "access.log"
+    log_file.write_text(_line("10.0.0.1", 0, "/", 200) + _line("10.0.0.2", 1, "/a", 404))
+    return log_file
+
+
+class TestLogIngestor:
+    def test_sample_log_metrics(self):
+        """Test the metrics computed over the sample log file."""
+        metrics = _metrics(LogService(), SAMPLE_LOG)
+        assert metrics.total_requests == metrics.success_count + metrics.error_count
+        assert metrics.total_requests > 0
+        assert sum(metrics.status_codes.values()) == metrics.total_requests
+        timestamps = [e.timestamp for e in metrics.recent_errors]
+        assert timestamps == sorted(timestamps, reverse=True)
+
+    def test_only_appended_bytes_are_read(self, access_log):
+        """Test that a second poll only parses the appended lines."""
+        parsed = []
+        service = LogService()
+
+        def parse(line):
+            parsed.append(line)
+            return service.parse_log_entry(line)
+
+        ingestor = LogIngestor(str(access_log), parse)
+        assert ingestor.poll().total == 2
+        with access_log.open("a") as file:
+            file.write(_line("10.0.0.3", 2, "/a", 500))
+        aggregate = ingestor.poll()
+        assert len(parsed) == 3
+        assert aggregate.total == 3
+        assert aggregate.status_counter == {"200": 1, "404": 1, "500": 1}
+        assert aggregate.url_counter.most_common(1) == [("/a", 2)]
+
+    def test_partial_trailing_line(self, access_log):
+        """Test that a line without newline is counted but not committed."""
+        service = LogService()
+        with access_log.open("a") as file:
+            file.write(_line("10.0.0.3", 2, "/b", 200).rstrip("\n"))
+        assert _metrics(service, access_log).total_requests == 3
+        with access_log.open("a") as file:
+            file.write("\n" + _line("10.0.0.4", 3, "/c", 200))
+        metrics = _metrics(service, access_log)
+        assert metrics.total_requests == 4
+        assert metrics.status_codes == {"200": 3, "404": 1}
+
+    def test_truncation_resets_state(self, access_log):
+        """Test that a truncated file is read again from the start."""
+        service = LogService()
+        assert _metrics(service, access_log).total_requests == 2
+        access_log.write_text(_line("10.0.0.9", 5, "/z", 503))
+        metrics = _metrics(service, access_log)
+        assert metrics.total_requests == 1
+        assert metrics.status_codes == {"503": 1}
+
+    def test_rotation_resets_state(self, access_log):
+        """Test that a rotated file is detected through its inode."""
+        service = LogService()
+        assert _metrics(service, access_log).total_requests == 2
+        os.rename(access_log, str(access_log) + ".1")
+        access_log.write_text(
+            _line("10.0.0.9", 5, "/z", 200) + _line("10.0.0.9", 6, "/z", 200)
+            + _line("10.0.0.9", 7, "/z", 200)
+        )
+        metrics = _metrics(service, access_log)
+        assert metrics.total_requests == 3
+        assert metrics.top_urls == [{"url": "/z", "count": 3}]
+
+    def test_recent_errors_keep_file_order_on_ties(self, tmp_path):
+        """Test that errors with equal timestamps keep the file order."""
+        log_file = tmp_path / "ties.log"
+        log_file.write_text("".join(_line("10.0.0.1", 0, f"/{i}", 500) for i in range(15)))
+        metrics = _metrics(LogService(), log_file)
+        assert [e.url for e in metrics.recent_errors] == [f"/{i}" for i in range(10)]
+
+    def test_missing_file(self, tmp_path):
+        """Test that a missing log file yields empty metrics."""
+        metrics = _metrics(LogService(), tmp_path / "missing.log")
+        assert metrics.total_requests == 0
+        assert metrics.recent_errors == []
+
+
+class TestTimeRange:
+    @pytest.fixture
+    def timed_log(self, tmp_path) -> Path:
+        log_file = tmp_path / "timed.log"
+        # Slightly out of order, like logs written when requests complete
+        minutes = [m + (1 if m % 3 == 0 else 0) for m in range(59)]
+        log_file.write_text(
+            "".join(_line("10.0.0.1", m, f"/{m % 4}", 500 if m % 5 else 200) for m in minutes)
+        )
+        return log_file
+
+    @staticmethod
+    def _service(index_dir) -> LogService:
+        return LogService(index_dir=str(index_dir), index_stride=256)
+
+    @pytest.mark.parametrize("since, until", [
+        (datetime(2024, 1, 10, 13, 10), datetime(2024, 1, 10, 13, 20)),
+        (datetime(2024, 1, 10, 13, 40), None),
+        (None, datetime(2024, 1, 10, 13, 5)),
+        (datetime(2024, 1, 10, 15, 0), None),
+    ])
+    def test_window_matches_filter(self, tmp_path, timed_log, since, until):
+        """Test that a time range counts exactly the requests received in it."""
+        lines = timed_log.read_text().splitlines(keepends=True)
+        parser = LogParser(COMBINED_FORMAT)
+        expected = tmp_path / "expected.log"
+        expected.write_text("".join(
+            line for line in lines
+            if (since is None or parser.parse(line.strip()).timestamp >= since)
+            and (until is None or parser.parse(line.strip()).timestamp <= until)
+        ))
+        service = self._service(tmp_path / "index")
+        assert _metrics(service, timed_log, since, until) == _metrics(LogService(), expected)
+
+    def test_index_survives_restart(self, tmp_path, timed_log):
+        """Test that a saved index is reused by a new service."""
+        index_dir = tmp_path / "index"
+        _metrics(self._service(index_dir), timed_log)
+        index = TimestampIndex.for_log(str(index_dir), str(timed_log), stride=256)
+        assert len(index) > 1
+        with timed_log.open("rb") as file:
+            indexed_to = index.indexed_to
+            index.sync(file, timed_log.stat().st_size)
+            assert index.indexed_to == indexed_to
+        start, end = index.window(datetime(2024, 1, 10, 13, 30), datetime(2024, 1, 10, 13, 31))
+        assert 0 < start < end < timed_log.stat().st_size
+
+    def test_index_rebuilt_after_rotation(self, tmp_path, timed_log):
+        """Test that the index of a rotated file is rebuilt."""
+        service = self._service(tmp_path / "index")
+        _metrics(service, timed_log)
+        os.rename(timed_log, str(timed_log) + ".1")
+        timed_log.write_text(_line("10.0.0.9", 30, "/new", 200))
+        since = datetime(2024, 1, 10, 13, 30)
+        metrics = _metrics(service, timed_log, since)
+        assert metrics.total_requests == 1
+        assert metrics.top_urls == [{"url": "/new", "count": 1}]
+
+
+    def test_private_index_dir(self, tmp_path):
+        """Test that the index directory is created private on first use, unused if shared."""
+        log = tmp_path / "access.log"
+        log.write_text("")
+
+        def store_path(index_dir):
+            return LogService(index_dir=str(index_dir)).get_ingestor(str(log)).index.store_path
+
+        index_dir = tmp_path / "index"
+        service = LogService(index_dir=str(index_dir))
+        assert not index_dir.exists()
+        assert service.get_ingestor(str(log)).index.store_path.startswith(str(index_dir))
+        assert index_dir.stat().st_mode & 0o777 == 0o700
+        shared = tmp_path / "shared"
+        shared.mkdir()
+        shared.chmod(0o777)
+        assert store_path(shared) is None
+        link = tmp_path / "link"
+        link.symlink_to(index_dir)
+        assert store_path(link) is None
+        # The directory cannot be created
+        assert store_path(log / "index") is None
+        if os.getuid() == 0:
+            os.chown(index_dir, 1000, 1000)
+            assert store_path(index_dir) is None
+
+
+class TestRotatedSegments:
+    @pytest.fixture(params=[(".gz", gzip.open), (".bz2", bz2.open), (".xz", lzma.open)])
+    def rotated_logs(self, request, tmp_path):
+        """Write a live log with two rotated segments, and the same lines in a single file."""
+        extension, opener = request.param
+        chunks = [
+            "".join(_line("10.0.0.1", m, f"/{m % 3}", 500 if m % 4 else 200) for m in minutes)
+            for minutes in (range(0, 20), range(20, 40), range(40, 50))
+        ]
+        with opener(tmp_path / f"access.log.2{extension}", "wb") as file:
+            file.write(chunks[0].encode())
+        (tmp_path / "access.log.1").write_text(chunks[1])
+        (tmp_path / "access.log").write_text(chunks[2])
+        os.utime(tmp_path / f"access.log.2{extension}", (1000, 1000))
+        os.utime(tmp_path / "access.log.1", (2000, 2000))
+        (tmp_path / "all.log").write_text("".join(chunks))
+        return tmp_path / "access.log", tmp_path / "all.log"
+
+    def test_segments_match_single_file(self, rotated_logs):
+        """Test that segments give the same metrics as their concatenation."""
+        live, single = rotated_logs
+        metrics = asyncio.run(LogService().get_log_metrics(
+            str(live), "unused.log", segments_glob=f"{live}*"
+        ))
+        assert metrics.total_requests == 50
+        assert metrics == _metrics(LogService(), single)
+
+    def test_segments_are_cached(self, rotated_logs, monkeypatch):
+        """Test that rotated segments are only analyzed again when they change."""
+        live, _ = rotated_logs
+        analyzed = []
+        analyze_segment = log_segments.analyze_segment
+        monkeypatch.setattr(
+            log_segments, "analyze_segment",
+            lambda path, parse: analyzed.append(path) or analyze_segment(path, parse),
+        )
+        service = LogService()
+        for _ in range(3):
+            asyncio.run(service.get_log_metrics(str(live), "", segments_glob=f"{live}*"))
+        assert len(analyzed) == 2
+        with open(f"{live}.1", "a") as file:
+            file.write(_line("10.0.0.1", 59, "/late", 200))
+        metrics = asyncio.run(service.get_log_metrics(str(live), "", segments_glob=f"{live}*"))
+        assert analyzed[2:] == [f"{live}.1"]
+        assert metrics.total_requests == 51
+
+    def test_segments_time_range(self, rotated_logs):
+        """Test a time range spanning part of the segments."""
+        live, single = rotated_logs
+        since, until = datetime(2024, 1, 10, 13, 15), datetime(2024, 1, 10, 13, 42)
+        metrics = asyncio.run(LogService().get_log_metrics(
+            str(live), "", since, until, segments_glob=f"{live}*"
+        ))
+        assert metrics.total_requests == 28
+        assert metrics == _metrics(LogService(), single, since, until)
+
+    def test_segments_stream(self, rotated_logs):
+        """Test that the entry stream goes through the segments, oldest first."""
+        live, _ = rotated_logs
+        data = b"".join(LogService().stream_log_entries(str(live), segments_glob=f"{live}*"))
+        minutes = [json.loads(line)["timestamp"][14:16] for line in data.splitlines()]
+        assert minutes == [f"{m:02d}" for m in range(50)]
+
+
+class TestEntryStream:
+    def test_filters(self, access_log):
+        """Test that streamed entries are filtered by status class, IP and URL prefix."""
+        with access_log.open("a") as file:
+            file.write(_line("10.0.0.2", 2, "/api/x", 503) + "garbage\n")
+            file.write(_line("10.0.0.1", 3, "/api/y", 404).rstrip("\n"))
+        service = LogService()
+
+        def stream(**filters):
+            data = b"".join(service.stream_log_entries(str(access_log), **filters))
+            return [json.loads(line) for line in data.splitlines()]
+
+        assert [e["url"] for e in stream()] == ["/", "/a", "/api/x", "/api/y"]
+        assert [e["url"] for e in stream(status_class=4)] == ["/a", "/api/y"]
+        assert [e["url"] for e in stream(ip="10.0.0.2")] == ["/a", "/api/x"]
+        assert [e["url"] for e in stream(url_prefix="/api/", status_class=5)] == ["/api/x"]
+        assert stream()[2] == {
+            "timestamp": "2024-01-10T13:02:00", "ip": "10.0.0.2", "url": "/api/x",
+            "status_code": 503, "user_agent": "curl/8.0",
+        }
+
+    def test_early_stop(self, tmp_path):
+        """Test that a consumer stopping early does not read the rest of the file."""
+        log_file = tmp_path / "large.log"
+        line = _line("10.0.0.1", 0, "/", 200)
+        log_file.write_text(line * (4 * STREAM_READ_SIZE // len(line)))
+        service = LogService()
+        parsed = []
+        parse = service.line_parser.parse
+        service.line_parser.parse = lambda text: parsed.append(text) or parse(text)
+        stream = service.stream_log_entries(str(log_file), status_class=4)
+        assert next(stream) == b""
+        stream.close()
+        assert len(parsed) <= STREAM_READ_SIZE // len(line)
+
+    def test_missing_file(self, tmp_path):
+        """Test that a missing log file streams nothing."""
+        assert list(LogService().stream_log_entries(str(tmp_path / "missing.log"))) == []
+
+
+class TestErrorLog:
+    LINES = [
+        "[Wed Jan 10 13:00:00 2024] [error] [client 10.0.0.1] File does not exist: /var/www/a",
+        "[Wed Jan 10 13:01:00.123456 2024] [core:error] [pid 35708:tid 4328636416] "
+        "[client 10.0.0.2:50432] AH00128: File does not exist: /var/www/b.png",
+        "[Wed Jan 10 13:02:00.000001 2024] [ssl:warn] [pid 12] AH01909: server certificate "
+        "does not include an ID which matches the server name",
+        "not an error log line",
+        "[Wed Jan 10 13:03:00 2024] [error] [client 10.0.0.3] File does not exist: /var/www/c",
+    ]
+
+    def test_parse_error_line(self):
+        """Test parsing Apache 2.2 and 2.4 error log lines."""
+        old, new = parse_error_line(self.LINES[0]), parse_error_line(self.LINES[1])
+        assert (old.severity, old.module, old.pid, old.client) == ("error", "", None, "10.0.0.1")
+        assert old.message == "File does not exist: /var/www/a"
+        assert (new.severity, new.module, new.pid) == ("error", "core", 35708)
+        assert new.timestamp == datetime(2024, 1, 10, 13, 1, 0, 123456)
+        assert new.client == "10.0.0.2:50432"
+        with pytest.raises(ValueError):
+            parse_error_line(self.LINES[3])
+        with pytest.raises(ValueError):
+            parse_error_line("[Wed Foo 10 13:00:00 2024] [error] message")
+
+    def test_normalize_message(self):
+        """Test that the variable parts of messages are replaced by placeholders."""
+        assert normalize_message(
+            "AH01630: client denied by server configuration: /srv/x.php, 10.1.2.3:8080 0x1f 42"
+        ) == "AH01630: client denied by server configuration: <path>, <ip> <hex> <n>"
+
+    def test_error_log_metrics(self, tmp_path, access_log):
+        """Test the error log metrics, tailed incrementally."""
+        error_log = tmp_path / "error.log"
+        error_log.write_text("\n".join(self.LINES[:4]) + "\n")
+        service = LogService()
+        metrics = asyncio.run(service.get_log_metrics(str(access_log), str(error_log)))
+        assert metrics.total_requests == 2
+        assert metrics.error_log.total_entries == 3
+        with error_log.open("a") as file:
+            file.write(self.LINES[4] + "\n")
+        errors = asyncio.run(service.get_log_metrics(str(access_log), str(error_log))).error_log
+        assert errors.total_entries == 4
+        assert errors.severities == {"error": 3, "warn": 1}
+        assert errors.modules == {"": 2, "core": 1, "ssl": 1}
+        assert errors.top_messages[0] == {"message": "File does not exist: <path>", "count": 2}
+        assert [e.timestamp.minute for e in errors.recent_entries] == [3, 2, 1, 0]
+        window = asyncio.run(service.get_log_metrics(
+            str(access_log), str(error_log), since=datetime(2024, 1, 10, 13, 2)
+        )).error_log
+        assert window.total_entries == 2
+
+    def test_missing_error_log(self, access_log):
+        """Test that error log metrics are absent without error log."""
+        assert _metrics(LogService(), access_log).error_log is None
+
+
+class TestParallelAnalysis:
+    def test_ranges_are_newline_aligned(self):
+        """Test that ranges cover the file and start at the beginning of lines."""
+        data = SAMPLE_LOG.read_bytes()
+        ranges = split_ranges(str(SAMPLE_LOG), len(data), 7)
+        assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start and data[start - 1:start] == b"\n"
+
+    def test_parallel_matches_serial(self, tmp_path):
+        """Test that the parallel analysis gives the same metrics as the serial one."""
+        log_file = tmp_path / "big.log"
+        lines = SAMPLE_LOG.read_text().splitlines(keepends=True) * 40
+        log_file.write_text("".join(lines) + "garbage\n" + lines[2].rstrip("\n"))
+        serial = _metrics(LogService(), log_file)
+        service = LogService(workers=2, parallel_min_size=0)
+        try:
+            parallel = _metrics(service, log_file)
+        finally:
+            service.close()
+        assert parallel == serial
+
+
+class TestMmapScan:
+    def test_mmap_matches_text(self, tmp_path):
+        """Test that the mmap scan mode gives the same metrics as the text mode."""
+        log_file = tmp_path / "mixed.log"
+        sample = SAMPLE_LOG.read_bytes()
+        log_file.write_bytes(
+            sample
+            + b"garbage\n  " + sample.splitlines()[2] + b"  \n"
+            + b'10.0.0.1 - - [10/Jan/2024:13:55:36 +0000] "GET /\xff HTTP/1.1" 500 1 "-" "x"\n'
+            + b'10.0.0.1 - - [10/Foo/2024:13:55:36 +0000] "GET /x HTTP/1.1" 200 1 "-" "x"\n'
+            + b'10.0.0.1 - - [10/Jan/2024:13:55:36 +0000] "GET http://h:x/ HTTP/1.1" 200 1 "-" "x"\n'
+            + sample.splitlines()[0]
+        )
+        text_service, mmap_service = LogService(), LogService(scan_mode="mmap")
+        assert _metrics(mmap_service, log_file) == _metrics(text_service, log_file)
+        with log_file.open("ab") as file:
+            file.write(b"\n" + sample)
+        assert _metrics(mmap_service, log_file) == _metrics(text_service, log_file)
+
+    def test_unknown_mode(self):
+        """Test that an unknown scan mode is rejected."""
+        with pytest.raises(ValueError):
+            LogService(scan_mode="unknown")
+
+
+class TestLogParser:
+    def test_matches_apache_log_parser(self):
+        """Test that the fast parser extracts the same fields as apache_log_parser."""
+        reference = apache_log_parser.make_parser(COMBINED_FORMAT)
+        parser = LogParser(COMBINED_FORMAT)
+        for line in SAMPLE_LOG.read_text().splitlines():
+            expected = reference(line)
+            record = parser.parse(line)
+            assert record.timestamp == expected["time_received_datetimeobj"]
+            assert record.ip == expected["remote_host"]
+            assert record.url == expected["request_url"]
+            assert record.status_code == int(expected["status"])
+            assert record.user_agent == expected["request_header_user_agent"]
+
+    def test_escaped_quotes_fall_back(self):
+        """Test that lines the fast pattern rejects go through apache_log_parser."""
+        line = (
+            '10.0.0.1 - - [10/Jan/2024:13:55:36 +0000] "GET /a HTTP/1.1" 200 5 '
+            '"-" "agent \\"quoted\\" name"'
+        )
+        record = LogParser(COMBINED_FORMAT).parse(line)
+        assert record.url == "/a"
+        assert record.user_agent.startswith("agent ")
+
+    def test_unknown_method_has_empty_url(self):
+        """Test that a request line with an unknown method yields an empty URL."""
+        line = '10.0.0.1 - - [10/Jan/2024:13:55:36 +0000] "BREW /pot HTTP/1.1" 418 5 "-" "x"'
+        assert LogParser(COMBINED_FORMAT).parse(line).url == ""
+
+    def test_other_format(self):
+        """Test parsing a format without a fast path."""
+        parser = LogParser('%h %t "%r" %>s %D')
+        record = parser.parse('10.0.0.1 [10/Jan/2024:13:55:36 +0000] "GET /b HTTP/1.1" 302 15')
+        assert (record.ip, record.url, record.status_code) == ("10.0.0.1", "/b", 302)
+
+    @pytest.mark.parametrize("line", [
+        "",
+        "Invalid log line",
+        '10.0.0.1 - - [10/Foo/2024:13:55:36 +0000] "GET / HTTP/1.1" 200 5 "-" "x"',
+        '10.0.0.1 - - [10/Jan/2024:13:55:36 +0000] "GET http://h:abc/ HTTP/1.1" 200 5 "-" "x"',
+    ])
+    def test_invalid_lines(self, line):
+        """Test that invalid lines raise ValueError."""
+        with pytest.raises(ValueError):
+            LogParser(COMBINED_FORMAT).parse(line)
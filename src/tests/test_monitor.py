@@ -0,0 +1,876 @@
+"""
+Test module for the monitoring subsystem.
+
+This module contains test cases for the metric collectors, their scheduler and the
+metric histories kept by the monitor.
+"""
+
+import asyncio
+import gzip
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import psutil
+import pytest
+
+from monitor import MonitorTask
+from monitor.adaptive import AdaptiveSampling
+from monitor.broadcast import Broadcaster
+from monitor.collectors import (
+    CONTAINER_CPU_COLLECTOR,
+    CONTAINER_RAM_COLLECTOR,
+    CPU_COLLECTOR,
+    PRESSURE_COLLECTOR,
+    RAM_COLLECTOR,
+    Cgroup,
+    Collector,
+    CollectorRegistry,
+    ContainerCpuCollector,
+    ContainerPressureCollector,
+    ContainerRamCollector,
+    CpuSnapshot,
+    CpuTimesCollector,
+    DiskIoCollector,
+    DiskUsageCollector,
+    NetIoCollector,
+    PressureCollector,
+    PressureSnapshot,
+    PressureStall,
+    ProcCpuCollector,
+    ProcRamCollector,
+    ProcessCollector,
+    RamCollector,
+    RamSnapshot,
+    ResourcePressure,
+)
+from monitor.collectors import disk, net, processes, procfs, system
+from monitor.history import MetricHistory
+from monitor.openmetrics import ExpositionCache, MetricFamily, render_openmetrics
+from monitor.scheduler import CollectorScheduler
+from monitor.monitor import CONTAINER_VIEW, SHARED_COLLECTORS
+from monitor.shared import (
+    SHARED_SNAPSHOT_SIZE,
+    SharedMetrics,
+    SharedCollector,
+    SharedMetricsWriter,
+    SharedSampler,
+    SharedSnapshotCollector,
+)
+from monitor.snapshots import SnapshotCache
+
+
+class CountingCollector(Collector):
+    """Collector returning the number of times it ran, optionally slowly or failing."""
+
+    def __init__(self, name: str, interval: float, duration: float = 0.0, fail: bool = False):
+        self.name = name
+        super().__init__(interval)
+        self.duration = duration
+        self.fail = fail
+        self.count = 0
+
+    def collect(self) -> int:
+        self.count += 1
+        time.sleep(self.duration)
+        if self.fail:
+            raise RuntimeError("collector failure")
+        return self.count
+
+
+DiskCounters = namedtuple("DiskCounters", "read_bytes write_bytes read_count write_count")
+DiskPartition = namedtuple("DiskPartition", "device mountpoint fstype")
+DiskUsage = namedtuple("DiskUsage", "total used free percent")
+NetCounters = namedtuple("NetCounters", net.NET_COUNTERS)
+CpuTimes = namedtuple("CpuTimes", "user nice system idle iowait steal guest")
+
+
+def _run_scheduler(registry: CollectorRegistry, seconds: float) -> None:
+    stop = threading.Event()
+    thread = threading.Thread(target=CollectorScheduler(registry).run, args=(stop,))
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+class TestMetricHistory:
+    def test_downsample_buckets(self):
+        """Test the min/max/avg of evenly sized buckets."""
+        history = MetricHistory(["a", "b"], capacity=100)
+        for i in range(10):
+            history.append(1000.0 + i, [i, 10 * i])
+        buckets = history.downsample(points=3)
+        assert [b.timestamp for b in buckets] == [
+            datetime.fromtimestamp(t, tz=timezone.utc) for t in (1000.0, 1003.0, 1006.0)
+        ]
+        assert [b.minimum for b in buckets] == [[0, 0], [3, 30], [6, 60]]
+        assert [b.maximum for b in buckets] == [[2, 20], [5, 50], [9, 90]]
+        assert [b.average for b in buckets] == [[1, 10], [4, 40], [7.5, 75]]
+
+    def test_time_range(self):
+        """Test that only the samples of the time range are summarized."""
+        history = MetricHistory(["a"], capacity=100)
+        for i in range(10):
+            history.append(1000.0 + i, [i])
+        buckets = history.downsample(since=1002.0, until=1004.0, points=10)
+        assert [b.average for b in buckets] == [[2], [3], [4]]
+        assert history.downsample(since=2000.0) == []
+
+    def test_ring_overwrites_oldest(self):
+        """Test that a full history keeps the most recent samples, in order."""
+        history = MetricHistory(["a"], capacity=4)
+        for i in range(10):
+            history.append(float(i), [i])
+        assert len(history) == 4
+        assert [b.minimum for b in history.downsample(points=4)] == [[6], [7], [8], [9]]
+
+    def test_rollup_tiers(self):
+        """Test that the samples cascade into minute and hour buckets with their p95."""
+        tiers = (("1m", 60.0, 10), ("1h", 600.0, 4))
+        history = MetricHistory(["a"], capacity=60, tiers=tiers)
+        for i in range(1800):
+            history.append(6000.0 + i, [i % 60])
+        minutes = history.tiers[0].downsample(points=100)
+        # Ten closed minutes kept and the open one
+        assert len(minutes) == 11
+        assert minutes[-1].timestamp == datetime.fromtimestamp(7740.0, tz=timezone.utc)
+        assert minutes[0].minimum == [0] and minutes[0].maximum == [59]
+        assert minutes[0].average == [29.5]
+        # Nearest rank of 60 values, within the accuracy of the histogram
+        assert minutes[0].p95 == [pytest.approx(56, rel=0.01)]
+        hours = history.tiers[1].downsample(points=100)
+        assert [bucket.average for bucket in hours] == [[29.5], [29.5], [29.5]]
+        assert hours[0].p95 == minutes[0].p95
+
+    def test_query_tier(self):
+        """Test that queries pick the coarsest tier with a bucket per point."""
+        tiers = (("1m", 60.0, 100), ("1h", 600.0, 4))
+        history = MetricHistory(["a"], capacity=600, tiers=tiers)
+        for i in range(3000):
+            history.append(6000.0 + i, [float(i)])
+        assert history.query(since=8400.0, points=600)[0] == "raw"
+        tier, buckets = history.query(since=8400.0, points=5)
+        assert tier == "1m" and len(buckets) == 5
+        # The raw samples do not reach back to the start of the range
+        assert history.query(since=6000.0, points=3000)[0] == "1m"
+        tier, buckets = history.query(points=3)
+        # The open minute is rolled up into the hours once closed
+        assert tier == "1h" and buckets[0].minimum == [0.0]
+        assert buckets[-1].maximum == [2939.0]
+        assert MetricHistory(["a"], tiers=()).query()[0] == "raw"
+
+    def test_query_long_range(self):
+        """Test that ranges longer than an hour are not summarized from the raw samples."""
+        history = MetricHistory(["a"], capacity=7200, tiers=(("1m", 60.0, 200),))
+        for i in range(7200):
+            history.append(i, [float(i)])
+        assert history.query(since=3600.0, points=3600)[0] == "raw"
+        tier, buckets = history.query(points=7200)
+        assert tier == "1m" and len(buckets) == 120
+        assert MetricHistory(["a"], capacity=7200, tiers=()).query(points=7200)[0] == "raw"
+
+    def test_value_count(self):
+        """Test that a sample must have one value per series."""
+        with pytest.raises(ValueError):
+            MetricHistory(["a", "b"]).append(0.0, [1.0])
+
+
+class TestSampler:
+    def test_start_and_stop(self):
+        """Test that the sampler thread samples until it is stopped."""
+        task = MonitorTask(history_size=64, interval=0.01)
+        task.start()
+        try:
+            deadline = time.monotonic() + 5
+            while len(task.ram_history) < 4 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert len(task.ram_history) >= 4
+        finally:
+            task.stop(timeout=5)
+        assert task._thread is None
+        count = len(task.ram_history)
+        time.sleep(0.05)
+        assert len(task.ram_history) == count
+
+
+class TestCollectors:
+    def test_registry(self):
+        """Test registering collectors and publishing their snapshots."""
+        registry = CollectorRegistry()
+        collector = registry.register(CountingCollector("a", 1.0))
+        with pytest.raises(ValueError):
+            registry.register(CountingCollector("a", 2.0))
+        published = []
+        registry.add_listener(lambda name, timestamp, snapshot: published.append((name, snapshot)))
+        registry.publish("a", 1)
+        registry.store("a", 2)
+        assert registry.latest("a") == 2 and registry.latest("b") is None
+        assert published == [("a", 1)]
+        assert registry.collectors() == [collector] and registry.get("a") is collector
+
+    def test_invalid_interval(self):
+        """Test that a collector interval must be positive."""
+        with pytest.raises(ValueError):
+            CountingCollector("a", 0)
+
+    def test_multi_rate_scheduling(self):
+        """Test that each collector runs at its own interval."""
+        registry = CollectorRegistry()
+        fast = registry.register(CountingCollector("fast", 0.02))
+        slow = registry.register(CountingCollector("slow", 0.2))
+        _run_scheduler(registry, 0.5)
+        assert 2 <= slow.count <= 4
+        assert fast.count >= 4 * slow.count
+        assert registry.latest("fast") == fast.count
+        assert registry.stats("fast").runs == fast.count
+        assert registry.stats("fast").overruns == 0
+
+    def test_overruns_and_failures(self):
+        """Test that slow and failing collectors are accounted for without stopping others."""
+        registry = CollectorRegistry()
+        slow = registry.register(CountingCollector("slow", 0.02, duration=0.05))
+        failing = registry.register(CountingCollector("failing", 0.02, fail=True))
+        _run_scheduler(registry, 0.3)
+        stats = registry.stats("slow")
+        assert stats.overruns >= 1 and stats.overruns == stats.runs == slow.count
+        assert stats.max_duration >= 0.05 and stats.mean_duration >= 0.05
+        assert registry.stats("failing").failures == failing.count >= 1
+        assert registry.stats("failing").last_error == "RuntimeError('collector failure')"
+        assert registry.latest("failing") is None
+
+    def test_monitor_attributes_read_snapshots(self):
+        """Test that the MonitorTask metrics are backed by the collector snapshots."""
+        task = MonitorTask(history_size=8)
+        task.cpu_percent = [1.0, 2.0]
+        task.total_ram = 42.0
+        assert task.registry.latest("cpu").percent == [1.0, 2.0]
+        assert task.registry.latest("ram").total == 42.0
+        task.sample()
+        assert task.total_ram != 42.0
+        assert task.registry.stats("ram").runs == 1
+
+    def test_snapshot_cache(self):
+        """Test that encoded responses follow the snapshot versions."""
+        registry = CollectorRegistry()
+        cache = SnapshotCache(registry)
+        encoded = []
+
+        def encoder(snapshot):
+            encoded.append(snapshot)
+            return str(snapshot).encode()
+
+        empty = cache.get("a", "a", encoder)
+        assert empty.version == 0 and empty.body == b"None"
+        registry.publish("a", 1)
+        first = cache.get("a", "a", encoder)
+        assert first.version == registry.latest_version("a") and first.body == b"1"
+        assert cache.get("a", "a", encoder) is first
+        # Published snapshots are encoded by the publisher, stored ones by the next request
+        registry.publish("a", 2)
+        assert encoded == [None, 1, 2]
+        assert cache.get("a", "a", encoder).body == b"2" and len(encoded) == 3
+        registry.store("a", 2)
+        second = cache.get("a", "a", encoder)
+        assert len(encoded) == 4 and second.version > first.version
+        assert second.etag != first.etag
+        assert second.etag == cache.get("b", "a", encoder).etag
+
+    def test_lazy_priming(self):
+        """Test that the collectors are primed by their first runs, not at creation."""
+        start = time.perf_counter()
+        task = MonitorTask(history_size=8)
+        assert time.perf_counter() - start < 0.5
+        assert not task.ready
+        assert task.cpu_percent == [] and task.total_ram == 0.0
+        task.sample()
+        # The first CPU collection only reads the CPU times
+        assert task.registry.latest("cpu") is None and task.registry.latest("ram") is not None
+        assert not task.ready
+        task.sample()
+        assert task.ready
+        assert len(task.cpu_percent) == len(task.cpu_history.series)
+        assert len(task.cpu_history) == 1 and len(task.ram_history) == 2
+
+
+class FakeScheduler:
+    """Scheduler counting the calls to `reschedule`."""
+
+    def __init__(self):
+        self.reschedules = 0
+
+    def reschedule(self):
+        self.reschedules += 1
+
+
+class TestAdaptiveSampling:
+    def test_backoff_and_speed_up(self):
+        """Test that the intervals double while stable and drop to the floor under load."""
+        fast = CountingCollector("fast", 1.0)
+        slow = CountingCollector("slow", 5.0)
+        rare = CountingCollector("rare", 30.0)
+        scheduler = FakeScheduler()
+        sampling = AdaptiveSampling(floor=1.0, ceiling=8.0)
+        sampling.govern([fast, slow, rare], scheduler)
+        ram = RamSnapshot(50.0, 1024.0, 512.0, 512.0, 256.0)
+        intervals = []
+        for timestamp in (0.0, 1.0, 3.0, 7.0, 15.0):
+            sampling(CPU_COLLECTOR, timestamp, CpuSnapshot([10.0, 20.0]))
+            sampling(RAM_COLLECTOR, timestamp + 0.01, ram)
+            intervals.append(sampling.interval)
+        assert intervals == [1.0, 2.0, 4.0, 8.0, 8.0]
+        # Slower collectors are slowed down up to the ceiling, or keep their own interval
+        assert (fast.interval, slow.interval, rare.interval) == (8.0, 8.0, 30.0)
+        assert sampling.rate == 0.125 and scheduler.reschedules == 0
+        # The RAM usage moves quickly
+        sampling(RAM_COLLECTOR, 23.0, ram._replace(percent=65.0))
+        assert (fast.interval, slow.interval, rare.interval) == (1.0, 5.0, 30.0)
+        assert scheduler.reschedules == 1
+        sampling(CPU_COLLECTOR, 24.0, CpuSnapshot([15.0, 15.0]))
+        assert sampling.interval == 2.0
+        # The CPU usage crosses its threshold
+        sampling(CPU_COLLECTOR, 26.0, CpuSnapshot([90.0, 80.0]))
+        assert sampling.interval == 1.0 and scheduler.reschedules == 2
+        with pytest.raises(ValueError):
+            AdaptiveSampling(floor=2.0, ceiling=1.0)
+
+    def test_reschedule(self):
+        """Test that a collector whose interval shortened runs before its previous due time."""
+        registry = CollectorRegistry()
+        fast = registry.register(CountingCollector("fast", 0.02))
+        slow = registry.register(CountingCollector("slow", 10.0))
+        registry.store("slow", 0)
+        scheduler = CollectorScheduler(registry)
+
+        def speed_up(name, _timestamp, snapshot):
+            if name == "fast" and snapshot == 2:
+                slow.interval = 0.02
+                scheduler.reschedule()
+
+        registry.add_listener(speed_up)
+        stop = threading.Event()
+        thread = threading.Thread(target=scheduler.run, args=(stop,))
+        thread.start()
+        time.sleep(0.3)
+        stop.set()
+        thread.join(timeout=5)
+        assert fast.count >= 5 and slow.count >= 5
+
+    def test_monitor_governs_local_collectors(self):
+        """Test that the monitor governs its collectors and adapts to their snapshots."""
+        sampling = AdaptiveSampling(floor=1.0, ceiling=4.0)
+        monitortask = MonitorTask(history_size=8, sampling=sampling)
+        assert monitortask.sampling is sampling
+        monitortask.registry.publish(CPU_COLLECTOR, CpuSnapshot([10.0]), 0.0)
+        monitortask.registry.publish(CPU_COLLECTOR, CpuSnapshot([10.0]), 1.0)
+        assert monitortask.registry.get(CPU_COLLECTOR).interval == 2.0
+
+
+class TestDiskCollectors:
+    def test_io_rates(self, monkeypatch):
+        """Test that the disk activity is computed from the counter deltas."""
+        counters = iter([
+            {"sda": DiskCounters(1000, 2000, 10, 20)},
+            {"sda": DiskCounters(3000, 2000, 14, 20), "sdb": DiskCounters(0, 0, 0, 0)},
+            {"sda": DiskCounters(0, 0, 0, 0), "sdb": DiskCounters(500, 0, 5, 0)},
+        ])
+        clock = iter([10.0, 12.0, 13.0])
+        monkeypatch.setattr(disk.psutil, "disk_io_counters", lambda perdisk: next(counters))
+        monkeypatch.setattr(disk.time, "monotonic", lambda: next(clock))
+        collector = DiskIoCollector()
+        assert collector.collect() is None
+        assert collector.collect().devices == {"sda": (1000.0, 0.0, 2.0, 0.0)}
+        # The counters of sda were reset, sdb appeared at the previous collection
+        assert collector.collect().devices == {"sdb": (500.0, 0.0, 5.0, 0.0)}
+
+    def test_hung_mount(self, monkeypatch):
+        """Test that a hung filesystem is reported unavailable without being probed again."""
+        release = threading.Event()
+        probes = []
+
+        def disk_usage(path):
+            probes.append(path)
+            if path == "/hung":
+                release.wait()
+            return DiskUsage(100, 40, 60, 40.0)
+
+        partitions = [DiskPartition("/dev/sda1", "/", "ext4"),
+                      DiskPartition("server:/share", "/hung", "nfs")]
+        monkeypatch.setattr(disk.psutil, "disk_partitions", lambda all: partitions)
+        monkeypatch.setattr(disk.psutil, "disk_usage", disk_usage)
+        collector = DiskUsageCollector(timeout=0.1)
+        try:
+            snapshot = collector.collect()
+            assert [mount.mountpoint for mount in snapshot.mounts] == ["/"]
+            assert snapshot.mounts[0].percent == 40.0 and snapshot.unavailable == ["/hung"]
+            # The pending probe is neither resubmitted nor waited for
+            start = time.perf_counter()
+            assert collector.collect().unavailable == ["/hung"]
+            assert time.perf_counter() - start < 0.1
+            assert probes.count("/hung") == 1
+        finally:
+            release.set()
+        time.sleep(0.05)
+        snapshot = collector.collect()
+        assert len(snapshot.mounts) == 2 and snapshot.unavailable == []
+        assert probes.count("/hung") == 2
+
+
+    def test_hung_mounts_hold_every_worker(self, monkeypatch):
+        """Test that mounts hung in every probe thread do not starve the other mounts."""
+        release = threading.Event()
+        hung = [f"/hung{index}" for index in range(disk.DISK_USAGE_WORKERS)]
+
+        def disk_usage(path):
+            if path in hung:
+                release.wait()
+            return DiskUsage(100, 40, 60, 40.0)
+
+        partitions = [DiskPartition("server:/share", path, "nfs") for path in hung]
+        partitions.append(DiskPartition("/dev/sda1", "/", "ext4"))
+        monkeypatch.setattr(disk.psutil, "disk_partitions", lambda all: partitions)
+        monkeypatch.setattr(disk.psutil, "disk_usage", disk_usage)
+        collector = DiskUsageCollector(timeout=0.1)
+        try:
+            for _ in range(3):
+                snapshot = collector.collect()
+                assert [mount.mountpoint for mount in snapshot.mounts] == ["/"]
+                assert snapshot.unavailable == hung
+        finally:
+            release.set()
+
+
+class TestCpuTimesCollector:
+    def test_breakdown(self, monkeypatch):
+        """Test the share of each state per core and over all the cores."""
+        times = iter([
+            [CpuTimes(10, 0, 5, 80, 5, 0, 0), CpuTimes(0, 0, 0, 100, 0, 0, 0)],
+            [CpuTimes(60, 0, 15, 100, 25, 0, 0), CpuTimes(0, 0, 0, 150, 0, 50, 0)],
+            [CpuTimes(60, 0, 15, 100, 25, 0, 0)],
+        ])
+        monkeypatch.setattr(system.psutil, "cpu_times", lambda percpu=False: (
+            next(times) if percpu else CpuTimes(0, 0, 0, 0, 0, 0, 0)
+        ))
+        collector = CpuTimesCollector()
+        # States missing on the platform are left out
+        assert collector.states == ("user", "nice", "system", "idle", "iowait", "steal")
+        assert collector.collect() is None
+        snapshot = collector.collect()
+        assert snapshot.percent == [
+            [50.0, 0.0, 10.0, 20.0, 20.0, 0.0],
+            [0.0, 0.0, 0.0, 50.0, 0.0, 50.0],
+        ]
+        assert snapshot.average == [25.0, 0.0, 5.0, 35.0, 10.0, 25.0]
+        # A core went offline
+        assert collector.collect() is None
+
+    def test_real_cpu_times(self):
+        """Test that the shares of each core add up to 100 percent."""
+        collector = CpuTimesCollector()
+        collector.collect()
+        time.sleep(0.05)
+        snapshot = collector.collect()
+        assert len(snapshot.percent) == len(psutil.cpu_times(percpu=True))
+        for row in snapshot.percent:
+            assert sum(row) == pytest.approx(100, abs=1) or sum(row) == 0
+
+
+class TestNetCollector:
+    def test_rates(self, monkeypatch):
+        """Test that the throughput is computed from the counter deltas, across wraps."""
+        counters = iter([
+            {"eth0": NetCounters(1000, 500, 10, 5, 0, 0, 0, 0),
+             "eth1": NetCounters(2**32 - 100, 0, 0, 0, 0, 0, 0, 0),
+             "eth2": NetCounters(2**40, 0, 0, 0, 0, 0, 0, 0)},
+            {"eth0": NetCounters(3000, 1500, 30, 15, 2, 0, 4, 0),
+             "eth1": NetCounters(300, 0, 0, 0, 0, 0, 0, 0),
+             "eth2": NetCounters(100, 0, 0, 0, 0, 0, 0, 0),
+             "eth3": NetCounters(0, 0, 0, 0, 0, 0, 0, 0)},
+        ])
+        clock = iter([5.0, 7.0])
+        monkeypatch.setattr(net.psutil, "net_io_counters", lambda pernic: next(counters))
+        monkeypatch.setattr(net.time, "monotonic", lambda: next(clock))
+        collector = NetIoCollector()
+        assert collector.collect() is None
+        interfaces = collector.collect().interfaces
+        # eth1 wrapped around 32 bits, eth2 was reset and eth3 appeared
+        assert set(interfaces) == {"eth0", "eth1"}
+        assert interfaces["eth0"] == (1000.0, 500.0, 10.0, 5.0, 1.0, 0.0, 2.0, 0.0)
+        assert interfaces["eth1"].rx_bytes == 200.0
+
+
+class FakeProcess:
+    """Process as yielded by psutil.process_iter, with the attributes of the collector."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.info = {}
+
+    def read(self, name, cpu_time, rss):
+        """Set the attributes read by the next collection."""
+        self.info = {
+            "name": name,
+            "cpu_times": namedtuple("CpuTimes", "user system")(cpu_time / 2, cpu_time / 2),
+            "memory_info": namedtuple("MemoryInfo", "rss")(rss),
+        }
+        return self
+
+
+class TestProcessCollector:
+    def test_top_processes(self, monkeypatch):
+        """Test that the top processes are selected from the CPU time deltas."""
+        init, busy, big, reused = FakeProcess(1), FakeProcess(2), FakeProcess(3), FakeProcess(2)
+        cycles = iter([
+            lambda: [init.read("init", 1.0, 10), busy.read("busy", 5.0, 20),
+                     big.read("big", 0.0, 1000)],
+            lambda: [init.read("init", 1.1, 10), busy.read("busy", 7.0, 20), big],
+            lambda: [init, reused.read("new", 9.0, 5), big],
+        ])
+        clock = iter([0.0, 2.0, 4.0])
+        monkeypatch.setattr(processes.psutil, "process_iter", lambda attrs: next(cycles)())
+        monkeypatch.setattr(processes.time, "monotonic", lambda: next(clock))
+        collector = ProcessCollector(top=2)
+        assert collector.collect() is None
+        snapshot = collector.collect()
+        assert snapshot.count == 3
+        assert [(usage.name, usage.cpu_percent) for usage in snapshot.by_cpu] == [
+            ("busy", 100.0), ("init", 5.0)
+        ]
+        assert [usage.name for usage in snapshot.by_memory] == ["big", "busy"]
+        # A new process reusing a PID gets a new Process, its CPU time is not a delta
+        snapshot = collector.collect()
+        assert [usage.name for usage in snapshot.by_memory] == ["big", "init"]
+        assert max(usage.cpu_percent for usage in snapshot.by_cpu) == 0.0
+
+    def test_real_processes(self):
+        """Test that the processes of the host are read."""
+        collector = ProcessCollector()
+        collector.collect()
+        snapshot = collector.collect()
+        assert snapshot.count > 1 and 0 < len(snapshot.by_memory) <= collector.top
+        rss = [usage.rss for usage in snapshot.by_memory]
+        assert rss == sorted(rss, reverse=True)
+
+
+def write_cgroup(path, **files):
+    """Write the interface files of a fake cgroup."""
+    for name, content in files.items():
+        (path / name.replace("_", ".", 1)).write_text(content)
+
+
+@pytest.fixture
+def cgroup_root(tmp_path):
+    """Fake cgroup v2 hierarchy, the agent being in the "/agent" cgroup."""
+    (tmp_path / "cgroup.controllers").write_text("cpu memory\n")
+    (tmp_path / "agent").mkdir()
+    write_cgroup(
+        tmp_path / "agent",
+        cpu_stat="usage_usec 1000000\nuser_usec 800000\nsystem_usec 200000\n"
+                 "nr_periods 10\nnr_throttled 2\nthrottled_usec 5000\n",
+        cpu_max="200000 100000\n",
+        memory_current=str(300 * 1024 * 1024),
+        memory_max=str(1024 * 1024 * 1024),
+        memory_stat="anon 104857600\ninactive_file 104857600\nactive_file 0\n",
+    )
+    (tmp_path / "self").write_text("0::/agent\n")
+    return tmp_path
+
+
+class TestCgroup:
+    def test_detect(self, cgroup_root, tmp_path_factory):
+        """Test that the cgroup of the agent is found only on a cgroup v2 hierarchy."""
+        cgroup = Cgroup.detect(str(cgroup_root), str(cgroup_root / "self"))
+        assert cgroup.path == str(cgroup_root / "agent")
+        assert cgroup.cpu_limit() == 2.0 and cgroup.memory_limit() == 1024 * 1024 * 1024
+        cgroup.close()
+        assert Cgroup.detect(str(tmp_path_factory.mktemp("v1"))) is None
+
+    def test_container_usage(self, cgroup_root, monkeypatch):
+        """Test that the usage is relative to the limits and re-read from the open files."""
+        cgroup = Cgroup.detect(str(cgroup_root), str(cgroup_root / "self"))
+        clock = iter([10.0, 12.0, 13.0])
+        monkeypatch.setattr("monitor.collectors.cgroup.time.monotonic", lambda: next(clock))
+        cpu = ContainerCpuCollector(cgroup)
+        assert cpu.collect() is None
+        # 2 s of CPU time in 2 s is half of the 2 cores quota
+        write_cgroup(cgroup_root / "agent", cpu_stat="usage_usec 3000000\nnr_throttled 3\n")
+        snapshot = cpu.collect()
+        assert snapshot.percent == [50.0] and snapshot.limit == 2.0
+        assert snapshot.throttled == 3
+        write_cgroup(cgroup_root / "agent", cpu_stat="usage_usec 3500000\n", cpu_max="max 100000\n")
+        assert cpu.collect().limit == psutil.cpu_count()
+
+        ram = ContainerRamCollector(cgroup).collect()
+        # The working set leaves the inactive file cache out
+        assert ram.total == 1024.0 and ram.used == 200.0 and ram.percent == 19.5
+        assert ram.available == 824.0 and ram.free == 724.0
+        write_cgroup(cgroup_root / "agent", memory_max="max\n")
+        assert ContainerRamCollector(cgroup).collect().total == (
+            psutil.virtual_memory().total / (1024 * 1024)
+        )
+        cgroup.close()
+
+
+class TestPressureCollector:
+    def test_stall_deltas(self, tmp_path):
+        """Test that the averages are read and the stall times are computed from deltas."""
+        (tmp_path / "cpu").write_text("some avg10=1.50 avg60=0.75 avg300=0.25 total=1000\n")
+        (tmp_path / "memory").write_text(
+            "some avg10=0.00 avg60=0.00 avg300=0.00 total=500\n"
+            "full avg10=0.00 avg60=0.00 avg300=0.00 total=200\n"
+        )
+        paths = {resource: str(tmp_path / resource) for resource in ("cpu", "memory", "io")}
+        collector = PressureCollector(paths=paths)
+        assert collector.collect() is None
+        (tmp_path / "cpu").write_text("some avg10=2.00 avg60=1.00 avg300=0.50 total=4000\n")
+        resources = collector.collect().resources
+        # The io file is missing, and the CPU has no full line on older kernels
+        assert set(resources) == {"cpu", "memory"}
+        assert resources["cpu"].some == (2.0, 1.0, 0.5, 3000)
+        assert resources["cpu"].full is None
+        assert resources["memory"].full.stall_usec == 0
+        collector.close()
+        with pytest.raises(OSError):
+            PressureCollector(paths={"cpu": str(tmp_path / "missing")})
+
+    def test_container_pressure(self, cgroup_root):
+        """Test that the pressure of a cgroup is read from its pressure files."""
+        cgroup = Cgroup.detect(str(cgroup_root), str(cgroup_root / "self"))
+        with pytest.raises(OSError):
+            ContainerPressureCollector(cgroup)
+        write_cgroup(
+            cgroup_root / "agent",
+            io_pressure="some avg10=5.00 avg60=0.00 avg300=0.00 total=10\n"
+                        "full avg10=4.00 avg60=0.00 avg300=0.00 total=5\n",
+        )
+        collector = ContainerPressureCollector(cgroup)
+        collector.collect()
+        assert collector.collect().resources["io"].full.avg10 == 4.0
+        collector.close()
+        cgroup.close()
+
+
+class TestProcCollectors:
+    def test_cpu_jiffies(self, tmp_path):
+        """Test that the usage of each core is computed from the jiffy deltas."""
+        stat = tmp_path / "stat"
+        stat.write_text(
+            "cpu  300 0 100 1000 0 0 0 0 0 0\n"
+            "cpu0 100 0 50 500 0 0 0 0 0 0\n"
+            "cpu1 200 0 50 500 0 0 0 0 0 0\n"
+            "intr 1 2 3\n"
+        )
+        collector = ProcCpuCollector(path=str(stat))
+        assert collector.collect() is None
+        # cpu0: 60 busy jiffies out of 100, iowait is idle and guest is already in user
+        stat.write_text(
+            "cpu  0 0 0 0 0 0 0 0 0 0\n"
+            "cpu0 150 0 60 520 20 0 0 0 40 0\n"
+            "cpu1 200 0 50 600 0 0 0 0 0 0\n"
+        )
+        assert collector.collect().percent == [60.0, 0.0]
+        # A core went offline, the jiffies are read again
+        stat.write_text("cpu0 150 0 60 520 20 0 0 0 40 0\n")
+        assert collector.collect() is None
+        assert collector.collect().percent == [0.0]
+
+    def test_meminfo(self, tmp_path):
+        """Test that the RAM usage matches psutil, with and without MemAvailable."""
+        snapshot = ProcRamCollector().collect()
+        expected = RamCollector().collect()
+        assert snapshot.total == expected.total
+        assert abs(snapshot.percent - expected.percent) < 5
+        meminfo = tmp_path / "meminfo"
+        meminfo.write_text(
+            "MemTotal: 4096000 kB\nMemFree: 1024000 kB\nBuffers: 102400 kB\n"
+            "Cached: 512000 kB\nSReclaimable: 409600 kB\n"
+        )
+        snapshot = ProcRamCollector(path=str(meminfo)).collect()
+        assert snapshot.total == 4000.0 and snapshot.available == 2000.0
+        assert snapshot.used == 2000.0 and snapshot.free == 1000.0 and snapshot.percent == 50.0
+
+    def test_fallback(self, monkeypatch):
+        """Test that the psutil collectors are used when /proc cannot be read."""
+        assert isinstance(procfs.make_cpu_collector(), ProcCpuCollector)
+
+        def unreadable(*_args):
+            raise PermissionError("/proc")
+
+        monkeypatch.setattr(procfs, "ProcCpuCollector", unreadable)
+        monkeypatch.setattr(procfs, "ProcRamCollector", unreadable)
+        assert isinstance(procfs.make_cpu_collector(), procfs.CpuCollector)
+        assert isinstance(procfs.make_ram_collector(0.5), RamCollector)
+
+
+class TestOpenMetrics:
+    def test_render(self):
+        """Test the rendering of the metric families."""
+        text = render_openmetrics([
+            MetricFamily("a_seconds", "counter", "A.", "seconds").add(1.5, path='x"\\\n'),
+            MetricFamily("b", "gauge", "B.").add(float("nan")).add(2),
+        ])
+        assert text.decode().splitlines() == [
+            "# TYPE a_seconds counter",
+            "# UNIT a_seconds seconds",
+            "# HELP a_seconds A.",
+            'a_seconds_total{path="x\\"\\\\\\n"} 1.5',
+            "# TYPE b gauge",
+            "# HELP b B.",
+            "b NaN",
+            "b 2",
+            "# EOF",
+        ]
+
+    def test_exposition_cache(self):
+        """Test that the exposition text is rendered once per state."""
+        cache = ExpositionCache()
+        renders = []
+
+        def render():
+            renders.append(None)
+            return b"# EOF\n"
+
+        first = cache.get((1, 2), render)
+        assert cache.get((1, 2), render) is first and len(renders) == 1
+        assert gzip.decompress(first.gzipped) == first.text
+        cache.get((2, 2), render)
+        assert len(renders) == 2
+
+
+class TestBroadcaster:
+    def test_fan_out(self):
+        """Test that each message is encoded once and slow subscribers drop old ones."""
+        broadcaster = Broadcaster()
+        encoded = []
+
+        def encode():
+            encoded.append(None)
+            return str(len(encoded)).encode()
+
+        async def run():
+            slow = broadcaster.subscribe({"a": encode}, maxsize=2)
+            fast = broadcaster.subscribe({"a": encode, "b": lambda: None})
+            assert (await fast.get()).data == b"2"
+            # Notifications are coalesced until the event loop handles them
+            broadcaster.notify("a")
+            broadcaster.notify("a")
+            broadcaster.notify("b")
+            await asyncio.sleep(0)
+            assert (await fast.get()).data == b"3"
+            for _ in range(2):
+                broadcaster.notify("a")
+                await asyncio.sleep(0)
+            assert [(await slow.get()).data for _ in range(2)] == [b"4", b"5"]
+            assert slow.dropped == 2
+            broadcaster.unsubscribe(slow)
+            broadcaster.unsubscribe(fast)
+            broadcaster.notify("a")
+            await asyncio.sleep(0)
+
+        asyncio.run(run())
+        assert len(encoded) == 5 and broadcaster.subscribers() == 0
+
+
+@pytest.fixture
+def shared():
+    """Shared metrics segment with 2 CPU values, destroyed after the test."""
+    metrics = SharedMetrics.create(f"agent-test-{os.getpid()}", cpu_count=2)
+    yield metrics
+    metrics.close()
+    metrics.unlink()
+
+
+class TestSharedMetrics:
+    def test_seqlock_record(self, shared):
+        """Test reading the records written by the sampler."""
+        assert shared.cpu.read() is None
+        shared.cpu.write(1.0, [10.0, 20.0, 30.0])
+        record = shared.cpu.read()
+        assert record.sequence == 2 and record.timestamp == 1.0
+        assert record.values == [10.0, 20.0]
+        shared.cpu.write(2.0, [5.0])
+        assert shared.cpu.read().values == [5.0, 0.0]
+        # A record being written is not read
+        shared.cpu.write(3.0, [1.0, 1.0])
+        buffer = shared._segment.buf
+        buffer[shared.cpu._offset] += 1
+        assert shared.cpu.read() is None
+        buffer[shared.cpu._offset] += 1
+        assert shared.cpu.read().sequence == 8
+        attached = SharedMetrics.attach(shared.name)
+        try:
+            assert attached.cpu_count == 2 and attached.cpu.read().values == [1.0, 1.0]
+        finally:
+            attached.close()
+
+    def test_seqlock_blob(self, shared):
+        """Test reading the records of bytes written by the sampler."""
+        record = shared.snapshots[PRESSURE_COLLECTOR]
+        assert record.read() is None and record.sequence == 0
+        record.write(1.0, b"snapshot")
+        assert record.read() == (2, 1.0, b"snapshot")
+        record.write(2.0, b"")
+        assert record.read() == (4, 2.0, b"")
+        with pytest.raises(ValueError):
+            record.write(3.0, bytes(SHARED_SNAPSHOT_SIZE + 1))
+        assert record.sequence == 4
+
+    def test_workers_read_shared_snapshots(self, shared):
+        """Test that a worker MonitorTask serves the snapshots of the sampler."""
+        shared.declare([CPU_COLLECTOR, PRESSURE_COLLECTOR])
+        assert shared.collectors == [PRESSURE_COLLECTOR]
+        registry = CollectorRegistry()
+        registry.add_listener(SharedMetricsWriter(shared))
+        task = MonitorTask(history_size=8, shared=shared)
+        assert task.cpu_history.series == ["core0", "core1"]
+        # The collectors run by the sampler are not run by the worker
+        assert isinstance(task.registry.get(PRESSURE_COLLECTOR), SharedSnapshotCollector)
+        task.sample()
+        assert task.registry.latest(PRESSURE_COLLECTOR) is None
+        registry.publish("cpu", CpuSnapshot([10.0, 12.0]), 1000.0)
+        registry.publish("ram", RamSnapshot(25.0, 4000.0, 3000.0, 1000.0, 3000.0), 1001.0)
+        stall = PressureStall(1.0, 0.5, 0.25, 100)
+        pressure = PressureSnapshot({"cpu": ResourcePressure(stall, None)})
+        registry.publish(PRESSURE_COLLECTOR, pressure, 1002.0)
+        task.sample()
+        assert task.cpu_percent == [10.0, 12.0] and task.total_ram == 4000.0
+        assert task.registry.latest(PRESSURE_COLLECTOR) == pressure
+        # The snapshots keep the time the sampler took them
+        assert task.registry.latest_time(CPU_COLLECTOR) == 1000.0
+        assert task.registry.latest_time(RAM_COLLECTOR) == 1001.0
+        assert task.registry.latest_time(PRESSURE_COLLECTOR) == 1002.0
+        assert task.cpu_history.query()[1][0].timestamp.timestamp() == 1000.0
+        # Unchanged records are not published again
+        version = task.registry.latest_version(PRESSURE_COLLECTOR)
+        task.sample()
+        assert len(task.cpu_history) == 1 and len(task.ram_history) == 1
+        assert task.registry.latest_version(PRESSURE_COLLECTOR) == version
+
+    def test_shared_container_view(self, shared):
+        """Test that workers serve the container view collected by the sampler."""
+        assert not MonitorTask(history_size=8, shared=shared).has_view(CONTAINER_VIEW)
+        shared.declare([CONTAINER_CPU_COLLECTOR, CONTAINER_RAM_COLLECTOR])
+        task = MonitorTask(history_size=8, shared=shared)
+        assert task.has_view(CONTAINER_VIEW)
+        assert isinstance(task.registry.get(CONTAINER_CPU_COLLECTOR), SharedSnapshotCollector)
+
+    def test_sampler_process(self):
+        """Test that the sampler process writes the metrics until it is stopped."""
+        with SharedSampler(f"agent-test-sampler-{os.getpid()}") as sampler:
+            task = MonitorTask(history_size=8, shared=SharedMetrics.attach(sampler.name))
+            deadline = time.monotonic() + 30
+            while not task.ready and time.monotonic() < deadline:
+                time.sleep(0.05)
+                task.sample()
+            assert task.ready
+            assert len(task.cpu_percent) == len(task.cpu_history.series)
+            assert task.total_ram > 0
+            # The worker runs no collector of the sampler itself
+            for collector in task.registry.collectors():
+                assert (collector.name not in SHARED_COLLECTORS
+                        or isinstance(collector, SharedCollector))
+        with pytest.raises(FileNotFoundError):
+            SharedMetrics.attach(sampler.name)